@@ -0,0 +1,201 @@
+# admission.py
+"""
+Admission control for the webhook.
+
+- Per-sender rate limit: each WhatsApp `from` id has a token bucket
+  (rate_limit.KeyedRateLimiter, bounded, idle buckets dropped). A flooding
+  number is told once per ADMIT_NOTICE_S to slow down. The rest of its
+  messages are dropped before they reach the pipeline or the LLM.
+- LLM gate: at most LLM_GATE_CONCURRENCY Groq calls at a time. Further
+  callers wait in a priority queue. Conversations with an order or a
+  reservation in progress (an open cart, or a booking still ahead) go
+  first, then ongoing chats, then new chit-chat. A past order alone does
+  not count. When the queue is full, a newcomer bumps the newest waiter
+  of a lower priority, if there is one. A caller that is bumped, finds the
+  queue full, or waits longer than LLM_GATE_MAX_WAIT_S gets BUSY_REPLY
+  without calling the LLM. The gate only has work to do when
+  PIPELINE_WORKERS exceeds LLM_GATE_CONCURRENCY, so the concurrency
+  defaults to half the pipeline workers.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from cart import carts
+from conversation import conversation_memory
+from llm_cache import STATEFUL
+from metrics import LatencyRecorder
+from pipeline import PIPELINE_WORKERS
+from rate_limit import KeyedRateLimiter
+from reservations import reservation_book
+
+ADMIT_USER_RATE = float(os.getenv("ADMIT_USER_RATE", "0.2"))      # sustained messages/s per sender
+ADMIT_USER_BURST = float(os.getenv("ADMIT_USER_BURST", "10"))
+ADMIT_MAX_USERS = int(os.getenv("ADMIT_MAX_USERS", "50000"))
+ADMIT_NOTICE_S = float(os.getenv("ADMIT_NOTICE_S", "60"))
+
+LLM_GATE_CONCURRENCY = int(os.getenv("LLM_GATE_CONCURRENCY", str(max(1, PIPELINE_WORKERS // 2))))
+LLM_GATE_QUEUE = int(os.getenv("LLM_GATE_QUEUE", "200"))
+LLM_GATE_MAX_WAIT_S = float(os.getenv("LLM_GATE_MAX_WAIT_S", "5"))
+
+PRIORITY_TRANSACTION, PRIORITY_CONVERSATION, PRIORITY_NEW = 0, 1, 2
+PRIORITY_NAMES = ("transaction", "conversation", "new")
+
+RATE_LIMITED_REPLY = "⏳ Aap bohat tezi se messages bhej rahe hain. Thori dair baad dobara koshish karein 🙏"
+BUSY_REPLY = "🙏 Abhi bohat rush hai, thori dair mein dobara message karein. Menu dekhne ke liye 'menu' likhein."
+
+
+def message_priority(user: str, text: str) -> int:
+    """Lower is served first."""
+    if STATEFUL.search(text or ""):
+        return PRIORITY_TRANSACTION
+    if conversation_memory.has_history(user):
+        # order_state keeps confirmed orders forever; only open work counts
+        if user in carts or reservation_book.latest_for(user) is not None:
+            return PRIORITY_TRANSACTION
+        return PRIORITY_CONVERSATION
+    return PRIORITY_NEW
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class PriorityGate:
+    """
+    Counting semaphore whose waiters are served by priority, then arrival order.
+    A released slot goes straight to the next waiter, so a newcomer can never
+    overtake the queue. With the queue full, a newcomer takes the place of the
+    newest lower-priority waiter, which is turned away. Waiters that give up
+    or are bumped stay in the heap, flagged, until they reach the top, and
+    the heap is rebuilt if they pile up.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_GATE_CONCURRENCY, max_queue: int = LLM_GATE_QUEUE,
+                 max_wait: float = LLM_GATE_MAX_WAIT_S, priorities: int = len(PRIORITY_NAMES)):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._heap = []                 # (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = [0] * priorities  # live waiters per priority
+        self._cancelled = 0
+
+        self.admitted = [0] * priorities
+        self.rejected = [0] * priorities
+        self.timed_out = [0] * priorities
+        self.waits = [LatencyRecorder() for _ in range(priorities)]
+
+    @property
+    def depth(self) -> int:
+        return sum(self.queued)
+
+    def acquire(self, priority: int = PRIORITY_NEW, timeout: float = None) -> bool:
+        """Take a slot, waiting up to `timeout` (default max_wait). False on full queue or timeout."""
+        started = time.monotonic()
+        with self._lock:
+            if self.active < self.max_concurrency and not self.depth:
+                self.active += 1
+                self.admitted[priority] += 1
+                self.waits[priority].record(0.0)
+                return True
+            if self.depth >= self.max_queue and not self._shed_below(priority):
+                self.rejected[priority] += 1
+                return False
+            waiter = _Waiter()
+            heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+            self.queued[priority] += 1
+
+        waiter.event.wait(self.max_wait if timeout is None else timeout)
+        with self._lock:
+            if waiter.granted:
+                self.admitted[priority] += 1
+                self.waits[priority].record(time.monotonic() - started)
+                return True
+            if not waiter.cancelled:
+                # timed out (a bumped waiter was already counted as rejected)
+                self._cancel(priority, waiter)
+                self.timed_out[priority] += 1
+            return False
+
+    def _cancel(self, priority: int, waiter: _Waiter):
+        """Called with the lock held."""
+        waiter.cancelled = True
+        self.queued[priority] -= 1
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _shed_below(self, priority: int) -> bool:
+        """Full queue: turn away the newest waiter of the lowest priority below `priority`."""
+        if not any(self.queued[priority + 1:]):
+            return False
+        worst = max((entry for entry in self._heap if not entry[2].cancelled), key=lambda e: (e[0], e[1]))
+        victim_priority, _, victim = worst
+        self._cancel(victim_priority, victim)
+        self.rejected[victim_priority] += 1
+        victim.event.set()
+        return True
+
+    def release(self):
+        with self._lock:
+            while self._heap:
+                priority, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    self._cancelled -= 1
+                    continue
+                # hand the slot over; `active` stays the same
+                self.queued[priority] -= 1
+                waiter.granted = True
+                waiter.event.set()
+                return
+            self.active -= 1
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NEW, timeout: float = None):
+        """`with gate.slot(p) as admitted:`; the slot is released on exit when admitted."""
+        admitted = self.acquire(priority, timeout)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_wait_s": self.max_wait,
+                "active": self.active,
+                "queue_depth": self.depth,
+                "by_priority": {
+                    name: {
+                        "queued": self.queued[i],
+                        "admitted": self.admitted[i],
+                        "rejected": self.rejected[i],
+                        "timed_out": self.timed_out[i],
+                        "wait": self.waits[i].summary(),
+                    }
+                    for i, name in enumerate(PRIORITY_NAMES)
+                },
+            }
+
+
+# Shared instances used by app.py
+user_limiter = KeyedRateLimiter(ADMIT_USER_RATE, ADMIT_USER_BURST, max_keys=ADMIT_MAX_USERS,
+                                notice_interval=ADMIT_NOTICE_S)
+llm_gate = PriorityGate()
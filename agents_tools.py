@@ -2,22 +2,161 @@
 
 """
 Wrap the tool classes defined in tools.py into a simple structure the app expects.
+
+Every tool has a JSON-schema for its arguments. `tool_schemas()` hands them to
+Groq's native function calling, and `run_tool_calls()` executes the calls the
+model returns. The same calls can be written as text, one
+`TOOL_CALL:<name> <json args>` line each. That is how they are cached, and the
+plain `TOOL_CALL:<name>` lines of the old prompt still dispatch.
 """
 
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry
 from tools import MenuTool, OrderTool, ReservationTool, DeliveryTool, UpsellTool, ComplaintTool
 
+TOOL_SECONDS = registry.histogram("zk_tool_dispatch_seconds", "Tool execution time, by tool")
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "4"))
+MAX_TOOL_CALLS = int(os.getenv("MAX_TOOL_CALLS", "4"))     # per model turn
+
+
 class ToolWrapper:
-    def __init__(self, name, func, description: str = ""):
+    def __init__(self, name, func, description: str = "", parameters: dict = None, call=None):
         self.name = name
         self.func = func
         self.description = description
+        self.parameters = parameters or {"type": "object", "properties": {}}
+        # typed entry point: call(args, user, text)
+        self.call = call
+
+    def schema(self) -> dict:
+        """OpenAI-style function definition, the format Groq's `tools=` expects."""
+        return {"type": "function",
+                "function": {"name": self.name, "description": self.description, "parameters": self.parameters}}
+
+
+def _wrap(name, tool, description):
+    return ToolWrapper(name, tool.func, description, tool.parameters, tool.call)
+
 
 # All tools must be correctly passed with their .func reference
 tools = [
-    ToolWrapper("menu", MenuTool().func, "Show the restaurant menu"),
-    ToolWrapper("order", OrderTool().func, "Place an order"),  # CORRECT
-    ToolWrapper("reserve", ReservationTool().func, "Book a table"),
-    ToolWrapper("delivery", DeliveryTool().func, "Delivery check"),
-    ToolWrapper("upsell", UpsellTool().func, "Suggest add-ons"),
-    ToolWrapper("complaint", ComplaintTool().func, "Log a complaint"),
+    _wrap("menu", MenuTool(), "Show the restaurant menu"),
+    _wrap("order", OrderTool(), "Add to, change, show or confirm the cart"),
+    _wrap("reserve", ReservationTool(), "Book, check or cancel a table"),
+    _wrap("delivery", DeliveryTool(), "Delivery check"),
+    _wrap("upsell", UpsellTool(), "Suggest add-ons"),
+    _wrap("complaint", ComplaintTool(), "Log a complaint"),
 ]
+
+TOOL_LOOKUP = {tool.name: tool for tool in tools}
+
+# Tools that read or keep per-user state and therefore need the sender id
+TOOLS_REQUIRING_USER = {"order", "reserve", "complaint", "upsell", "delivery"}
+
+# Calls touching the same per-user state run in the model's order (upsell reads the
+# cart an order call may have just filled, delivery sets its zone); everything else
+# is independent and runs concurrently
+STATE_OF = {"order": "order", "upsell": "order", "delivery": "order", "reserve": "reservation"}
+
+_pool = ThreadPoolExecutor(max_workers=max(1, TOOL_WORKERS), thread_name_prefix="tool")
+
+
+def tool_schemas() -> list:
+    return [tool.schema() for tool in tools]
+
+
+def call_tool(name: str, text: str, user: str = None):
+    """Run a tool by name with the arguments it expects. Returns None for unknown tools."""
+    tool = TOOL_LOOKUP.get(name)
+    if tool is None:
+        return None
+    with TOOL_SECONDS.time(tool=name):
+        if name in TOOLS_REQUIRING_USER:
+            return tool.func(text, user)
+        try:
+            return tool.func(text)
+        except TypeError:
+            return tool.func()
+
+
+def call_tool_args(name: str, args: dict, user: str = None, text: str = ""):
+    """Run a tool with typed arguments from a model tool call. Returns None for unknown tools."""
+    tool = TOOL_LOOKUP.get(name)
+    if tool is None:
+        return None
+    with TOOL_SECONDS.time(tool=name):
+        return tool.call(args if isinstance(args, dict) else {}, user, text)
+
+
+# ==========================
+# Tool calls as text (cache entries, old prompt format)
+# ==========================
+_TOOL_LINE = re.compile(r"TOOL_CALL:\s*(\w+)[ \t]*(\{.*\})?")
+
+
+def format_tool_calls(calls) -> str:
+    return "\n".join(f"TOOL_CALL:{name} {json.dumps(args, ensure_ascii=False)}" if args else f"TOOL_CALL:{name}"
+                     for name, args in calls)
+
+
+def parse_tool_calls(text: str) -> list:
+    """[(name, args)] for every TOOL_CALL line in text; args is None for the bare form."""
+    calls = []
+    for m in _TOOL_LINE.finditer(text or ""):
+        args = None
+        if m.group(2):
+            try:
+                args = json.loads(m.group(2))
+            except ValueError:
+                args = None
+        calls.append((m.group(1), args))
+    return calls
+
+
+def tool_calls_of(generation) -> list:
+    """[(name, args)] from a chat generation's native tool calls (langchain AIMessage.tool_calls)."""
+    message = getattr(generation, "message", None)
+    return [(call["name"], call.get("args") or {}) for call in (getattr(message, "tool_calls", None) or [])]
+
+
+# ==========================
+# Dispatch
+# ==========================
+def _run_chain(chain, user, text):
+    replies = []
+    for i, (name, args) in chain:
+        # bare TOOL_CALL:<name> lines carry no arguments: the tool reads the message itself
+        reply = call_tool(name, text, user) if args is None else call_tool_args(name, args, user, text)
+        replies.append((i, reply))
+    return replies
+
+
+def run_tool_calls(calls, user: str = None, text: str = ""):
+    """
+    Execute one model turn's tool calls and join their replies in call order.
+    Calls on different state run concurrently; unknown tools are skipped.
+    Returns None when no call named a known tool.
+    """
+    calls = [(name, args) for name, args in calls if name in TOOL_LOOKUP][:MAX_TOOL_CALLS]
+    if not calls:
+        return None
+    if len(calls) == 1:
+        name, args = calls[0]
+        return _run_chain([(0, (name, args))], user, text)[0][1]
+
+    chains = {}
+    for i, (name, args) in enumerate(calls):
+        # stateless tools each get their own chain
+        chains.setdefault(STATE_OF.get(name, ("call", i)), []).append((i, (name, args)))
+    first, *rest = chains.values()
+    futures = [_pool.submit(_run_chain, chain, user, text) for chain in rest]
+    results = _run_chain(first, user, text)
+    for future in futures:
+        results.extend(future.result())
+    replies = [reply for _, reply in sorted(results) if reply]
+    return "\n\n".join(replies) if replies else None
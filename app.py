@@ -1,28 +1,66 @@
 # app.py
 import os
 import json
-import requests
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import PlainTextResponse, JSONResponse
-from langchain_core.messages import HumanMessage
-from langchain_groq import ChatGroq
+from fastapi.responses import PlainTextResponse, JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
-from agents_tools import tools
+from admission import BUSY_REPLY, PRIORITY_NAMES, RATE_LIMITED_REPLY, llm_gate, message_priority, user_limiter
+from agents_tools import format_tool_calls, parse_tool_calls, run_tool_calls, tool_calls_of, tool_schemas
+from cart import carts
+from conversation import conversation_memory
+from dedup import seen_messages
+from delivery_zones import delivery_zones
+from events import event_bus
+from intent_router import intent_router
+from log_utils import get_logger, log_event
+from llm_cache import prompt_version, response_cache
+from menu_service import menu_service
+from metrics import registry
+from offline_llm import OfflineLLM, OfflineMessage
+from order_index import OrderIndex
 from order_state import order_state, reservation_state
+from orders import orders_db
+from pipeline import PIPELINE_WORKERS, WebhookPipeline
+from resilient_llm import LLM_DEADLINE_S, STATE_CODES, LLMUnavailable, ResilientLLM
+from storage import store
+from upsell import upsell_recommender
+
+logger = get_logger("app")
 
 
 # ==========================
-# In-Memory Order Database
+# Metrics (scraped at /metrics)
 # ==========================
-orders_db = []   # <<=== NEW
-reservations_db = []
+PARSE_SECONDS = registry.histogram("zk_webhook_parse_seconds", "Time to read and extract a webhook payload")
+WEBHOOK_MESSAGES = registry.counter("zk_webhook_messages_total", "Inbound webhook messages by outcome")
+LLM_SECONDS = registry.histogram("zk_llm_request_seconds", "Groq call latency by result")
+LLM_TOKENS = registry.counter("zk_llm_tokens_total", "Tokens used by Groq calls, by kind")
+REPLY_SECONDS = registry.histogram("zk_reply_seconds", "Time to produce a reply, by path")
+LLM_GATE_WAIT = registry.histogram("zk_llm_gate_wait_seconds", "Time waiting for an LLM slot, by priority and result")
+PROMPT_TOKENS = registry.histogram("zk_prompt_tokens", "Estimated LLM prompt size, uncompacted vs sent",
+                                   buckets=(128, 256, 512, 768, 1024, 1536, 2048, 4096, 8192))
 
 
 # ==========================
 # FastAPI app
 # ==========================
-app = FastAPI(title="ZK Restaurant Chatbot")
+@asynccontextmanager
+async def lifespan(_app):
+    # start_workers/stop_workers are defined below, next to the pipeline they run
+    await start_workers()
+    try:
+        yield
+    finally:
+        await stop_workers()
+
+
+app = FastAPI(title="ZK Restaurant Chatbot", lifespan=lifespan)
 
 
 # ==========================
@@ -37,21 +75,77 @@ VERIFY_TOKEN = os.getenv("VERIFY_TOKEN")
 
 GROQ_MODEL = "llama-3.1-8b-instant"
 
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY is not set. Please configure it in .env")
+# Pipeline mode: /webhook acks immediately instead of waiting for the worker pool
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "0").lower() in ("1", "true", "yes")
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "500"))
+PIPELINE_DRAIN_TIMEOUT = float(os.getenv("PIPELINE_DRAIN_TIMEOUT", "30"))
+
+# Outbound WhatsApp sender (pooled client, retries, rate limit)
+WA_API_BASE = os.getenv("WA_API_BASE", "https://graph.facebook.com")
+WA_SEND_CONCURRENCY = int(os.getenv("WA_SEND_CONCURRENCY", "8"))
+WA_SEND_RATE = float(os.getenv("WA_SEND_RATE", "80"))
+WA_SEND_QUEUE_SIZE = int(os.getenv("WA_SEND_QUEUE_SIZE", "1000"))
+
+# Offline mode answers from offline_llm.OfflineLLM instead of Groq (tests, demos, no key)
+LLM_OFFLINE = os.getenv("LLM_OFFLINE", "0").lower() in ("1", "true", "yes") or not GROQ_API_KEY
+# One small Groq request at startup, so the first customer does not pay for connection setup
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0").lower() in ("1", "true", "yes")
+# "native": tools are sent as Groq function definitions and come back as structured calls
+# (several per turn); "text": only the TOOL_CALL:<name> line protocol of the prompt
+TOOL_MODE = os.getenv("TOOL_MODE", "native").lower()
+
+if LLM_OFFLINE:
+    log_event(logger, "llm.offline", logging.WARNING,
+              reason="GROQ_API_KEY is not set" if not GROQ_API_KEY else "LLM_OFFLINE is set")
 
 if not WA_TOKEN or not WA_PHONE_ID:
-    print("⚠️ WhatsApp credentials missing, sending disabled.")
+    log_event(logger, "whatsapp.disabled", logging.WARNING, reason="credentials missing")
 
 
 # ==========================
-# LLM Client
+# LLM Client (deadline + circuit breaker; see resilient_llm.py)
 # ==========================
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model=GROQ_MODEL,
-    temperature=0.2
-)
+def build_llm_client():
+    """ChatGroq, imported here rather than at module load, or OfflineLLM in offline mode."""
+    if LLM_OFFLINE:
+        return OfflineLLM()
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        api_key=GROQ_API_KEY,
+        model=GROQ_MODEL,
+        temperature=0.2,
+        # calls past the deadline are abandoned; this just frees their thread soon after
+        timeout=LLM_DEADLINE_S + 2,
+        max_retries=0,
+    )
+
+
+# built in start_workers() (or on the first call when the app runs without the lifespan)
+llm = ResilientLLM(client_factory=build_llm_client)
+
+
+def llm_messages(prompt: str):
+    """Single-prompt batch for llm.generate(); langchain is only imported when Groq is used."""
+    if LLM_OFFLINE:
+        return [[OfflineMessage(prompt)]]
+    from langchain_core.messages import HumanMessage
+
+    return [[HumanMessage(content=prompt)]]
+
+
+# extra llm.generate() arguments: Groq's native function calling
+LLM_TOOL_KWARGS = {"tools": tool_schemas(), "tool_choice": "auto"} if TOOL_MODE == "native" else {}
+
+
+def warm_up_llm():
+    """Send one tiny request through the wrapper so TLS and the connection pool are ready."""
+    started = time.perf_counter()
+    try:
+        llm.generate(llm_messages("Say OK."))
+        log_event(logger, "llm.warmed_up", ms=round((time.perf_counter() - started) * 1000, 1))
+    except LLMUnavailable as e:
+        log_event(logger, "llm.warmup_failed", logging.WARNING, reason=e.reason, error=str(e))
 
 
 # ==========================
@@ -62,6 +156,9 @@ You are ZK Restaurant AI Agent...
 (unchanged)
 """
 
+# cache entries are tied to this exact prompt + model
+CACHE_VERSION = prompt_version(system_prompt, GROQ_MODEL)
+
 
 # ==========================
 # Root
@@ -88,137 +185,454 @@ async def verify_webhook(request: Request):
 # ==========================
 # WhatsApp Send Message Helper
 # ==========================
+whatsapp_sender = None
+if WA_TOKEN and WA_PHONE_ID:
+    # httpx is only needed when replies are actually sent
+    from whatsapp import WhatsAppSender
+
+    whatsapp_sender = WhatsAppSender(
+        WA_TOKEN,
+        WA_PHONE_ID,
+        base_url=WA_API_BASE,
+        concurrency=WA_SEND_CONCURRENCY,
+        rate=WA_SEND_RATE,
+        max_queue=WA_SEND_QUEUE_SIZE,
+    )
+
+
 def send_whatsapp(to: str, text: str) -> bool:
-    if not WA_TOKEN or not WA_PHONE_ID:
-        print("Skipping WhatsApp send; no credentials.")
+    """Hand a reply to the outbound queue; sender tasks deliver it concurrently."""
+    if whatsapp_sender is None:
+        log_event(logger, "whatsapp.skipped", sample=True, to=to, reason="no credentials")
         return False
+    return whatsapp_sender.enqueue(to, text)
 
-    url = f"https://graph.facebook.com/v18.0/{WA_PHONE_ID}/messages"
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "text": {"body": text}
-    }
-    headers = {
-        "Authorization": f"Bearer {WA_TOKEN}",
-        "Content-Type": "application/json"
-    }
 
-    try:
-        r = requests.post(url, json=payload, headers=headers, timeout=10)
-        r.raise_for_status()
-        print("WhatsApp sent:", text[:60], "...")
-        return True
-    except Exception as e:
-        print("WhatsApp send error:", e)
-        return False
+@app.get("/whatsapp/stats")
+def whatsapp_stats():
+    if whatsapp_sender is None:
+        return {"enabled": False}
+    return {"enabled": True, **whatsapp_sender.stats()}
 
 
 # ==========================
 # Payload Extractor
 # ==========================
-def extract_message_payload(payload: dict):
+def extract_messages(payload: dict):
+    """
+    Collect every inbound text and location message in a (possibly batched)
+    delivery. Returns (messages, skipped, error); status updates and other
+    message types are only counted in `skipped`. A shared location becomes
+    the text "lat,lon", which the router sends to the delivery tool.
+    """
+    messages = []
+    skipped = 0
     try:
-        entry_list = payload.get("entry") or []
-        for entry in entry_list:
+        for entry in payload.get("entry") or []:
             for change in entry.get("changes", []):
                 value = change.get("value", {})
-                msgs = value.get("messages", [])
-                if not msgs:
-                    continue
-                msg = msgs[0]
-
-                user = msg.get("from")
-                text = msg.get("text", {}).get("body", "")
-                return user, text.strip(), None
-        return None, None, "no_message"
+                # delivery/read receipts: nothing to do
+                skipped += len(value.get("statuses") or [])
+
+                for msg in value.get("messages") or []:
+                    if msg.get("type") == "location" and msg.get("location"):
+                        loc = msg["location"]
+                        text = f"{loc.get('latitude')},{loc.get('longitude')}"
+                    else:
+                        text = (msg.get("text") or {}).get("body", "").strip()
+                    if not text or not msg.get("from"):
+                        skipped += 1
+                        continue
+                    messages.append({"id": msg.get("id"), "user": msg.get("from"), "text": text})
+        return messages, skipped, None
     except Exception:
-        return None, None, "parse_error"
+        return messages, skipped, "parse_error"
 
 
 # ==========================
-# NEW: Save Order Function
+# Menu cache reload (after editing menu.json)
 # ==========================
-def save_order(user_id: str, item: str, status="confirmed"):
-    order = {
-        "user": user_id,
-        "item": item,
-        "status": status
-    }
-    orders_db.append(order)
-    print("💾 Order Saved:", order)
-    return order
+@app.post("/menu/reload")
+def reload_menu():
+    return menu_service.reload()
+
+
+# ==========================
+# Delivery zones reload (after editing delivery_zones.json)
+# ==========================
+@app.post("/delivery/reload")
+def reload_delivery_zones():
+    return delivery_zones.reload()
+
+
+@app.get("/delivery/stats")
+def delivery_stats():
+    return delivery_zones.stats()
+
+
+@app.get("/upsell/stats")
+def upsell_stats():
+    return upsell_recommender.stats()
 
 
 # ==========================
 # NEW: Latest Orders API
 # ==========================
 @app.get("/orders/latest")
-def latest_orders():
-    return {"orders": orders_db}
+def latest_orders(
+    request: Request,
+    limit: int = 20,
+    cursor: int = None,
+    since: int = None,
+    user: str = None,
+    status: str = None,
+    start: float = None,
+    end: float = None,
+):
+    """
+    Newest orders first, `limit` per page (max 200). Follow `next_cursor` for older pages.
+    Pass `since=<last_seq>` to poll only for orders added after that point.
+    `start`/`end` are unix timestamps. Unchanged pages answer 304 via ETag.
+    """
+    params = {"limit": min(max(limit, 1), 200), "cursor": cursor, "since": since,
+              "user": user, "status": status, "start": start, "end": end}
+    result = orders_db.query(
+        limit=params["limit"], cursor=cursor, since=since, user=user,
+        status=status, start_time=start, end_time=end,
+    )
+
+    etag = OrderIndex.etag(params, result)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=result, headers={"ETag": etag})
+
+
+@app.get("/complaints/latest")
+def latest_complaints(limit: int = 20):
+    return {"complaints": store.latest("complaints", limit=min(limit, 200))}
 
 
 # ==========================
-# Main Webhook Handler
+# Live events (Server-Sent Events)
 # ==========================
-@app.post("/webhook")
-async def webhook(request: Request):
-    try:
-        data = await request.json()
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
-
-    user, text, status = extract_message_payload(data)
-    if status or not text:
-        return {"status": status or "empty"}
+@app.get("/events")
+async def events(request: Request, types: str = None, last_event_id: str = None):
+    """
+    Live order/reservation/complaint events as text/event-stream.
+    Resumes after the Last-Event-ID header (or ?last_event_id=). `types` filters,
+    e.g. ?types=order,reservation. A `reset` event means events were missed:
+    reload /orders/latest, then keep reading.
+    """
+    # only a check: the stream takes its slot when it starts, so an abandoned response holds none
+    if not event_bus.has_room():
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+    kinds = set(types.split(",")) if types else None
+    resume = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        event_bus.sse(resume, kinds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/events/stats")
+def events_stats():
+    return event_bus.stats()
 
-    # Build LLM Query
-    prompt = f"{system_prompt}\nUser: {text}\nAgent:"
-    try:
-        result = llm.generate([[HumanMessage(content=prompt)]])
-        ai_text = result.generations[0][0].text
-    except:
-        ai_text = "Sorry, mein abhi jawab generate nahi kar paa raha."
 
-    print(f"User({user}):", text)
-    print("AI:", ai_text)
+# ==========================
+# Message Handler (LLM -> Tool -> Reply)
+# ==========================
+def generate_reply(user: str, text: str) -> str:
+    """Blocking part of a webhook turn; runs in a worker thread."""
+    started = time.perf_counter()
+    log_event(logger, "message.received", sample=True, user=user, text=text[:200])
 
     # ==========================
-    # ORDER DETECTION LOGIC
+    # Fast path: obvious intents skip the LLM
     # ==========================
-    text_lower = text.lower()
+    routed = intent_router.route(text, user)
+    if routed is not None:
+        conversation_memory.add_turn(user, text, routed)
+        REPLY_SECONDS.observe(time.perf_counter() - started, path="fast_path")
+        log_event(logger, "reply.fast_path", sample=True, user=user)
+        return routed
+
+    # Repeated FAQ-style questions are answered from the response cache, but only
+    # to users without history: mid-chat "haan" or "2" depends on the earlier turns
+    context_free = not conversation_memory.has_history(user)
+    ai_text = response_cache.get(text, CACHE_VERSION) if context_free else None
+    path = "cache"
+
+    if ai_text is None:
+        path = "llm"
+        # Build LLM Query: earlier turns are added, compacted to fit the token budget
+        prompt, raw_tokens, sent_tokens = conversation_memory.build_prompt(user, system_prompt, text)
+        PROMPT_TOKENS.observe(raw_tokens, stage="uncompacted")
+        PROMPT_TOKENS.observe(sent_tokens, stage="sent")
+
+        # bounded LLM concurrency: orders/reservations in progress queue ahead of chit-chat
+        priority = message_priority(user, text)
+        gate_started = time.perf_counter()
+        admitted = llm_gate.acquire(priority)
+        LLM_GATE_WAIT.observe(time.perf_counter() - gate_started, priority=PRIORITY_NAMES[priority],
+                              result="admitted" if admitted else "overflow")
+        if not admitted:
+            log_event(logger, "llm.overflow", sample=True, user=user, priority=PRIORITY_NAMES[priority])
+            REPLY_SECONDS.observe(time.perf_counter() - started, path="overflow")
+            return BUSY_REPLY
+
+        llm_started = time.perf_counter()
+        try:
+            result = llm.generate(llm_messages(prompt), **LLM_TOOL_KWARGS)
+            generation = result.generations[0][0]
+            # native tool calls are kept in their text form, so cache and dispatch share one path
+            calls = tool_calls_of(generation)
+            ai_text = format_tool_calls(calls) if calls else generation.text
+            llm_elapsed = time.perf_counter() - llm_started
+            LLM_SECONDS.observe(llm_elapsed, result="ok")
+            usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+            LLM_TOKENS.inc(usage.get("prompt_tokens", 0), kind="prompt")
+            LLM_TOKENS.inc(usage.get("completion_tokens", 0), kind="completion")
+            intent_router.record_llm_latency(llm_elapsed)
+            # a reply that may lean on this user's history is not shared with others
+            if context_free:
+                response_cache.put(text, CACHE_VERSION, ai_text)
+        except LLMUnavailable as e:
+            # Groq is down, slow or the breaker is open: answer from the local rules instead
+            LLM_SECONDS.observe(time.perf_counter() - llm_started, result=e.reason)
+            if e.reason == "circuit_open":
+                log_event(logger, "llm.skipped", sample=True, user=user, reason=e.reason)
+            else:
+                log_event(logger, "llm.unavailable", logging.WARNING, user=user, reason=e.reason, error=str(e))
+            llm.record_fallback()
+            reply = intent_router.fallback(text, user)
+            conversation_memory.add_turn(user, text, reply)
+            REPLY_SECONDS.observe(time.perf_counter() - started, path="fallback")
+            return reply
+        finally:
+            llm_gate.release()
 
-    if "order" in text_lower and "confirm" in text_lower:
-        if "burger" in text_lower:
-            save_order(user, "ZK Burger")
-        elif "pizza" in text_lower:
-            save_order(user, "ZK Pizza")
-        elif "biryani" in text_lower:
-            save_order(user, "Biryani")
-        # add more items as needed
+    log_event(logger, "reply.generated", sample=True, user=user, path=path, text=ai_text[:200])
 
     # ==========================
     # Tool Calls
     # ==========================
     if "TOOL_CALL:" in ai_text:
-        tool_name = ai_text.split("TOOL_CALL:")[1].splitlines()[0].strip()
-        matched = [t for t in tools if getattr(t, "name", None) == tool_name]
-
-        if matched:
-            tool = matched[0].func
-
-            if tool_name in ["order", "reserve", "complaint"]:
-                reply = tool(text, user)
-            else:
-                try:
-                    reply = tool(text)
-                except:
-                    reply = tool()
-        else:
+        # every call of the turn, independent ones concurrently
+        reply = run_tool_calls(parse_tool_calls(ai_text), user, text)
+        if reply is None:
             reply = "❌ Invalid tool."
     else:
         reply = ai_text
 
+    conversation_memory.add_turn(user, text, reply)
+    REPLY_SECONDS.observe(time.perf_counter() - started, path=path)
+    return reply
+
+
+# a thread per pipeline worker: the default executor (min(32, cpus + 4) threads) would
+# cap replies in flight below the worker count, and the LLM gate would never queue
+# (it lives as long as the process, like the LLM and tool pools, so a restarted lifespan can use it)
+reply_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="reply")
+
+
+async def process_message(job: dict):
+    """Run one queued webhook job off the event loop."""
+    user, text = job["user"], job["text"]
+    reply = await asyncio.get_running_loop().run_in_executor(reply_executor, generate_reply, user, text)
     send_whatsapp(user, reply)
 
-    return {"status": "ok"}
+
+# ==========================
+# Webhook Pipeline (bounded worker pool)
+# ==========================
+pipeline = WebhookPipeline(
+    process_message,
+    workers=PIPELINE_WORKERS,
+    max_queue=PIPELINE_QUEUE_SIZE,
+)
+
+
+async def start_workers():
+    # reopen the store's writer if an earlier lifespan closed it
+    store.open()
+    # the Groq SDK import and client construction happen here, off the event loop
+    await asyncio.to_thread(llm.ensure_client)
+    if LLM_WARMUP and not LLM_OFFLINE:
+        await asyncio.to_thread(warm_up_llm)
+    if whatsapp_sender is not None:
+        await whatsapp_sender.start()
+    # the pool always runs: it keeps each user's messages in order; PIPELINE_MODE only
+    # decides whether /webhook waits for the replies
+    await pipeline.start()
+    log_event(logger, "pipeline.started", workers=PIPELINE_WORKERS, max_queue=PIPELINE_QUEUE_SIZE)
+
+
+async def stop_workers():
+    await pipeline.stop(timeout=PIPELINE_DRAIN_TIMEOUT)
+    log_event(logger, "pipeline.drained", **pipeline.stats())
+    # flush replies produced by the drained jobs before closing the pool
+    if whatsapp_sender is not None:
+        await whatsapp_sender.stop(timeout=PIPELINE_DRAIN_TIMEOUT)
+    # commit any batched order/reservation/complaint rows
+    store.close()
+
+
+# ==========================
+# Prometheus metrics
+# ==========================
+registry.gauge_callback("zk_pipeline_pending_jobs", "Jobs queued or running in the webhook pipeline",
+                        lambda: pipeline.pending)
+registry.gauge_callback("zk_pipeline_busy_workers", "Pipeline workers currently running a job",
+                        lambda: pipeline.busy)
+registry.gauge_callback("zk_whatsapp_queue_depth", "Replies waiting in the outbound WhatsApp queue",
+                        lambda: whatsapp_sender.stats()["queue_depth"] if whatsapp_sender else 0)
+registry.gauge_callback("zk_llm_cache_events", "LLM response cache counters",
+                        lambda: {(("event", k),): v for k, v in response_cache.stats().items()
+                                 if k in ("hits", "misses", "bypassed", "evictions", "expirations", "size")})
+registry.gauge_callback("zk_llm_breaker_state", "Groq circuit breaker: 0 closed, 1 half-open, 2 open",
+                        lambda: STATE_CODES[llm.breaker.state])
+registry.gauge_callback("zk_llm_calls", "Groq calls by outcome, including fallback replies",
+                        lambda: {(("outcome", k),): v for k, v in llm.stats().items()
+                                 if k in ("ok", "errors", "timeouts", "overloaded", "hedged", "hedge_wins", "fallbacks")})
+registry.gauge_callback("zk_event_subscribers", "Open /events streams",
+                        lambda: event_bus.subscribers)
+registry.gauge_callback("zk_events_published", "Events published to /events subscribers",
+                        lambda: event_bus.published)
+registry.gauge_callback("zk_conversations", "Users with conversation memory in this process",
+                        lambda: conversation_memory.stats()["users"])
+registry.gauge_callback("zk_llm_gate_active", "LLM calls holding a gate slot",
+                        lambda: llm_gate.active)
+registry.gauge_callback("zk_llm_gate_queue_depth", "Callers waiting for an LLM slot, by priority",
+                        lambda: {(("priority", name),): n for name, n in zip(PRIORITY_NAMES, llm_gate.queued)})
+registry.gauge_callback("zk_rate_limit_buckets", "Per-sender rate-limit buckets in memory",
+                        lambda: user_limiter.stats()["keys"])
+registry.gauge_callback("zk_open_carts", "Carts with items that are not confirmed yet", lambda: len(carts))
+registry.gauge_callback("zk_fast_path_hits", "Messages answered without an LLM call",
+                        lambda: intent_router.stats()["fast_path_hits"])
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    return {"offline": LLM_OFFLINE, "tool_mode": TOOL_MODE, **llm.stats()}
+
+
+@app.get("/state/stats")
+def state_stats():
+    return {
+        "orders_index": orders_db.stats(),
+        "order_state": order_state.stats(),
+        "reservation_state": reservation_state.stats(),
+    }
+
+
+@app.get("/dedup/stats")
+def dedup_stats():
+    return seen_messages.stats()
+
+
+@app.get("/store/stats")
+def store_stats():
+    return store.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return {"rate_limit": user_limiter.stats(), "llm_gate": llm_gate.stats()}
+
+
+@app.get("/carts/stats")
+def carts_stats():
+    return carts.stats()
+
+
+@app.get("/conversations/stats")
+def conversations_stats():
+    return conversation_memory.stats()
+
+
+@app.get("/router/stats")
+def router_stats():
+    return intent_router.stats()
+
+
+@app.get("/pipeline/stats")
+def pipeline_stats():
+    return {"ack_before_processing": PIPELINE_MODE, **pipeline.stats()}
+
+
+# ==========================
+# Main Webhook Handler
+# ==========================
+@app.post("/webhook")
+async def webhook(request: Request):
+    parse_started = time.perf_counter()
+    try:
+        data = await request.json()
+    except Exception:
+        WEBHOOK_MESSAGES.inc(outcome="invalid_json")
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    messages, skipped, status = extract_messages(data)
+    PARSE_SECONDS.observe(time.perf_counter() - parse_started)
+    if skipped:
+        WEBHOOK_MESSAGES.inc(skipped, outcome="skipped")
+    if not messages:
+        return {"status": status or ("skipped" if skipped else "no_message"), "skipped": skipped}
+
+    # Users run concurrently; each user's messages run one at a time, in order.
+    loop = asyncio.get_running_loop()
+    accepted, duplicates, rejected, limited = [], 0, 0, 0
+    for msg in messages:
+        # WhatsApp redelivers slow-acked messages with the same id; drop repeats before any work
+        if not seen_messages.first_time(msg["id"]):
+            duplicates += 1
+            WEBHOOK_MESSAGES.inc(outcome="duplicate")
+            continue
+
+        # per-sender token bucket: a flooding number is told once, then dropped quietly
+        if not user_limiter.allow(msg["user"]):
+            limited += 1
+            WEBHOOK_MESSAGES.inc(outcome="rate_limited")
+            if user_limiter.notify(msg["user"]):
+                send_whatsapp(msg["user"], RATE_LIMITED_REPLY)
+            continue
+
+        job = {"user": msg["user"], "text": msg["text"]}
+        if not PIPELINE_MODE:
+            job["done"] = loop.create_future()
+        if not pipeline.submit(job):
+            seen_messages.forget(msg["id"])
+            rejected += 1
+            WEBHOOK_MESSAGES.inc(outcome="rejected")
+            continue
+        accepted.append(job)
+        WEBHOOK_MESSAGES.inc(outcome="accepted")
+
+    if not PIPELINE_MODE and accepted:
+        await asyncio.gather(*(job["done"] for job in accepted), return_exceptions=True)
+
+    result = {
+        "status": "queued" if PIPELINE_MODE else "ok",
+        "accepted": len(accepted),
+        "duplicates": duplicates,
+        "skipped": skipped,
+    }
+    if limited:
+        result["rate_limited"] = limited
+    if rejected:
+        # A full pipeline answers 503 so WhatsApp redelivers; accepted ids are deduped on retry.
+        result.update(status="busy", rejected=rejected)
+        return JSONResponse(status_code=503, content=result)
+    return result
@@ -0,0 +1,176 @@
+# benchmarks/bench_admission.py
+"""
+Admission control under a burst.
+
+1. Per-sender rate limiter: --senders distinct numbers send a message each
+   while one number floods. Reports allow() throughput, how much of the flood
+   got through, and that the bucket count stays bounded (idle + LRU eviction).
+2. LLM gate: --callers threads arrive in a burst, more than the gate admits.
+   Each holds its slot for a simulated LLM call (--llm-ms). Priorities are
+   mixed: 20% order/reservation in progress, 30% ongoing chat, 50% new
+   chit-chat. Reports wait percentiles and overflow per priority against
+   the same burst through a FIFO gate (every caller at one priority).
+3. Pipeline: the shipped defaults. PIPELINE_WORKERS threads take the same
+   messages off a queue, as the webhook pipeline does, and call through a
+   gate of LLM_GATE_CONCURRENCY slots.
+
+Exits non-zero unless transactions overtake new chit-chat in both (2) and
+(3): a lower median wait and no larger a share turned away.
+
+    python benchmarks/bench_admission.py --senders 200000 --callers 400
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import LLM_GATE_CONCURRENCY, PRIORITY_NAMES, PriorityGate  # noqa: E402
+from pipeline import PIPELINE_WORKERS  # noqa: E402
+from rate_limit import KeyedRateLimiter  # noqa: E402
+
+
+def bench_limiter(args) -> dict:
+    limiter = KeyedRateLimiter(rate=0.2, burst=10, max_keys=args.max_keys, idle_s=args.idle_s)
+    flood_allowed = flood_sent = 0
+    peak_keys = 0
+    started = time.perf_counter()
+    for i in range(args.senders):
+        limiter.allow(f"92300{i:07d}")
+        if i % 10 == 0:
+            # one number sending ten times faster than everyone else combined would notice
+            flood_sent += 1
+            flood_allowed += limiter.allow("923009999999")
+        if i % 1000 == 0:
+            peak_keys = max(peak_keys, len(limiter._buckets))
+    elapsed = time.perf_counter() - started
+    calls = args.senders + flood_sent
+    return {
+        "allow_calls": calls,
+        "allow_per_s": round(calls / elapsed),
+        "flood_sent": flood_sent,
+        "flood_allowed": flood_allowed,
+        "peak_buckets": peak_keys,
+        **{k: v for k, v in limiter.stats().items() if k in ("keys", "idle_evictions", "lru_evictions")},
+    }
+
+
+def bench_gate(args, fifo: bool, workers: int = None) -> dict:
+    """One thread per caller, or `workers` threads draining the callers like pipeline workers."""
+    concurrency = args.concurrency if workers is None else LLM_GATE_CONCURRENCY
+    gate = PriorityGate(max_concurrency=concurrency, max_queue=args.queue, max_wait=args.max_wait)
+    rng = random.Random(args.seed)
+    priorities = [0 if r < 0.2 else 1 if r < 0.5 else 2 for r in (rng.random() for _ in range(args.callers))]
+    waits = {name: [] for name in PRIORITY_NAMES}
+    overflow = {name: 0 for name in PRIORITY_NAMES}
+    lock = threading.Lock()
+    go = threading.Event()
+
+    def caller(priority):
+        go.wait()
+        if workers is None:
+            # arrivals spread over --spread-ms
+            time.sleep(rng.random() * args.spread_ms / 1000)
+        t0 = time.perf_counter()
+        with gate.slot(1 if fifo else priority) as admitted:
+            waited = time.perf_counter() - t0
+            if admitted:
+                time.sleep(args.llm_ms / 1000)
+        with lock:
+            if admitted:
+                waits[PRIORITY_NAMES[priority]].append(waited)
+            else:
+                overflow[PRIORITY_NAMES[priority]] += 1
+
+    started = time.perf_counter()
+    if workers is None:
+        threads = [threading.Thread(target=caller, args=(p,)) for p in priorities]
+        for t in threads:
+            t.start()
+        started = time.perf_counter()
+        go.set()
+        for t in threads:
+            t.join()
+    else:
+        go.set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(caller, priorities))
+    elapsed = time.perf_counter() - started
+
+    def pct(values, p):
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 1) if values else None
+
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "by_priority": {
+            name: {
+                "callers": priorities.count(i),
+                "served": len(waits[name]),
+                "overflow": overflow[name],
+                "wait_p50_ms": pct(waits[name], 50),
+                "wait_p99_ms": pct(waits[name], 99),
+            }
+            for i, name in enumerate(PRIORITY_NAMES)
+        },
+        "final": {k: gate.stats()[k] for k in ("active", "queue_depth")},
+    }
+
+
+def run(args) -> dict:
+    return {
+        "rate_limiter": bench_limiter(args),
+        "llm_gate": {
+            "concurrency": args.concurrency,
+            "queue": args.queue,
+            "max_wait_s": args.max_wait,
+            "callers": args.callers,
+            "llm_ms": args.llm_ms,
+            "priority": bench_gate(args, fifo=False),
+            "fifo": bench_gate(args, fifo=True),
+        },
+        "pipeline": {
+            "workers": PIPELINE_WORKERS,
+            "gate_concurrency": LLM_GATE_CONCURRENCY,
+            "priority": bench_gate(args, fifo=False, workers=PIPELINE_WORKERS),
+        },
+    }
+
+
+def check(result) -> list:
+    """Failures: places where transactions did not overtake new chit-chat."""
+    failures = []
+    if LLM_GATE_CONCURRENCY >= PIPELINE_WORKERS:
+        failures.append(f"gate ({LLM_GATE_CONCURRENCY} slots) never queues with {PIPELINE_WORKERS} workers")
+    for name, gate in (("burst", result["llm_gate"]["priority"]), ("pipeline", result["pipeline"]["priority"])):
+        tx, new = gate["by_priority"]["transaction"], gate["by_priority"]["new"]
+        if tx["wait_p50_ms"] is None or new["wait_p50_ms"] is not None and tx["wait_p50_ms"] >= new["wait_p50_ms"]:
+            failures.append(f"{name}: transaction p50 wait {tx['wait_p50_ms']} ms, new {new['wait_p50_ms']} ms")
+        if tx["overflow"] * new["callers"] > new["overflow"] * tx["callers"]:
+            failures.append(f"{name}: transactions turned away more often than new chats")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--senders", type=int, default=200_000)
+    parser.add_argument("--max-keys", type=int, default=50_000)
+    parser.add_argument("--idle-s", type=float, default=50.0)
+    parser.add_argument("--callers", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=200)
+    parser.add_argument("--max-wait", type=float, default=2.0)
+    parser.add_argument("--llm-ms", type=float, default=80.0)
+    parser.add_argument("--spread-ms", type=float, default=500.0)
+    parser.add_argument("--seed", type=int, default=3)
+    result = run(parser.parse_args())
+    result["failures"] = check(result)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["failures"] else 0)
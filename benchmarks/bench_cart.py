@@ -0,0 +1,167 @@
+# benchmarks/bench_cart.py
+"""
+Carts at scale.
+
+Opens --carts carts with 1-5 menu items each. A third of them deliver to a
+zone. With all of them open, it plays --ops random cart operations: add,
+change qty, remove, set delivery, and read the total. Reports:
+
+- memory per open cart (tracemalloc; the user ids are allocated before
+  tracing starts) for the CartBook against the same carts kept as lists of
+  matcher-style dicts, the shape order_state held before the cart existed,
+- latency percentiles per operation, with every cart still open,
+- reading the total from the running subtotal against summing the lines.
+
+    python benchmarks/bench_cart.py --carts 100000 --ops 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cart import CartBook  # noqa: E402
+from delivery_zones import delivery_zones  # noqa: E402
+from menu_service import menu_service  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+
+def match(item, qty):
+    """What menu_matcher.match() returns for one item."""
+    return {"id": item["id"], "item": item["name"], "qty": qty, "price": item["price"],
+            "total": qty * item["price"], "score": 1.0, "confident": True}
+
+
+def baskets(args, items):
+    rng = random.Random(args.seed)
+    return [[match(item, rng.randint(1, 4)) for item in rng.sample(items, rng.randint(1, 5))]
+            for _ in range(args.carts)]
+
+
+def fill(book, users, carts, zones, rng):
+    for user, basket in zip(users, carts):
+        book.add(user, basket)
+        if rng.random() < 1 / 3:
+            book.set_zone(user, rng.choice(zones))
+
+
+def memory(args, users, carts, items, zones) -> dict:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    book = CartBook(max_carts=args.carts, idle_s=3600)
+    fill(book, users, carts, zones, random.Random(args.seed))
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    slots_bytes = after - before
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    plain = {}
+    for user, basket in zip(users, carts):
+        # fresh dicts per cart, as order_state kept them
+        plain[user] = {"items": [dict(m) for m in basket], "total": sum(m["total"] for m in basket)}
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    dict_bytes = after - before
+    del plain
+
+    lines = sum(len(b) for b in carts)
+    return {
+        "open_carts": len(book),
+        "lines_per_cart": round(lines / len(carts), 2),
+        "bytes_per_cart": round(slots_bytes / len(book)),
+        "bytes_per_cart_dict_lines": round(dict_bytes / len(carts)),
+        "total_mb": round(slots_bytes / 2**20, 1),
+    }
+
+
+def latency(args, users, carts, items, zones) -> dict:
+    rng = random.Random(args.seed + 1)
+    book = CartBook(max_carts=args.carts, idle_s=3600)
+    fill(book, users, carts, zones, rng)
+    by_id = {item["id"]: item for item in items}
+
+    # each op builds its arguments and returns the cart call; only the call is timed
+    def op_add(user):
+        matches = [match(rng.choice(items), rng.randint(1, 3))]
+        return lambda: book.add(user, matches)
+
+    def op_set(user):
+        line = rng.choice(book.get(user).lines)
+        matches = [match(by_id[line.item_id], rng.randint(1, 6))]
+        return lambda: book.set_qty(user, matches)
+
+    def op_remove(user):
+        cart = book.get(user)
+        if len(cart) == 1:
+            # keep every cart open
+            return lambda: None
+        line = rng.choice(cart.lines)
+        matches = [match(by_id[line.item_id], line.qty)]
+        return lambda: book.remove(user, matches)
+
+    def op_zone(user):
+        zone = rng.choice(zones)
+        return lambda: book.set_zone(user, zone)
+
+    def op_total(user):
+        return lambda: book.get(user).total()
+
+    ops = {"add": op_add, "set_qty": op_set, "remove": op_remove, "set_zone": op_zone, "total": op_total}
+    samples = {name: [] for name in ops}
+    names = list(ops)
+    for _ in range(args.ops):
+        name = rng.choice(names)
+        call = ops[name](rng.choice(users))
+        started = time.perf_counter()
+        call()
+        samples[name].append(time.perf_counter() - started)
+
+    # total from the running subtotal against re-summing the lines
+    sample_users = rng.sample(users, min(len(users), 20000))
+    started = time.perf_counter()
+    for user in sample_users:
+        book.get(user).total()
+    incremental = time.perf_counter() - started
+    started = time.perf_counter()
+    for user in sample_users:
+        cart = book.get(user)
+        sum(line.qty * line.price for line in cart.lines) + cart.fee()
+    rescan = time.perf_counter() - started
+
+    def us(values, p):
+        return round(percentile(sorted(values), p) * 1e6, 2)
+
+    return {
+        "ops": args.ops,
+        "open_carts": len(book),
+        "by_op_us": {name: {"count": len(v), "p50": us(v, 50), "p99": us(v, 99)} for name, v in samples.items()},
+        "total_incremental_us": round(incremental / len(sample_users) * 1e6, 2),
+        "total_rescan_us": round(rescan / len(sample_users) * 1e6, 2),
+    }
+
+
+def run(args) -> dict:
+    items = [item for item in menu_service.all_items() if item["price"] is not None]
+    delivery_zones.reload()
+    zones = delivery_zones.zones
+    users = [f"92300{i:07d}" for i in range(args.carts)]
+    carts = baskets(args, items)
+    return {
+        "carts": args.carts,
+        "memory": memory(args, users, carts, items, zones),
+        "latency": latency(args, users, carts, items, zones),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carts", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=11)
+    print(json.dumps(run(parser.parse_args()), indent=2))
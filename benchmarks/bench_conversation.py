@@ -0,0 +1,142 @@
+# benchmarks/bench_conversation.py
+"""
+Prompt size with per-user conversation memory.
+
+Plays long chats for many users through ConversationMemory, with a mix of
+short answers and long tool replies such as the menu. Reports:
+
+- the prompt-token distribution with the full history kept (uncompacted)
+  against what is actually sent after compaction, overall and at a few
+  turn numbers,
+- build_prompt() + add_turn() cost per turn,
+- memory per remembered user, and LRU evictions once --users exceeds
+  --max-users.
+
+    python benchmarks/bench_conversation.py --users 2000 --turns 30 --budget 1200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation import ConversationMemory, count_tokens  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+# about the size of the system prompt in streamlit_app.py
+SYSTEM_PROMPT = (
+    "You are ZK Restaurant AI Agent — a friendly, helpful, and professional virtual assistant "
+    "for ZK Restaurant. Reply in polite Roman Urdu when the user writes Urdu. Keep answers short, "
+    "clear and customer-friendly, never use code or technical formatting, and recommend "
+    "best-sellers politely. Tools: menu, order, reserve, delivery, upsell, complaint. "
+    "Format for tool calls: TOOL_CALL:<tool_name>\n"
+) * 3
+
+MESSAGES = [
+    "Assalam o alaikum, kya haal hai?",
+    "menu dikhao",
+    "2 chicken karahi aur 4 naan order karna hai",
+    "Model Town mein delivery hoti hai?",
+    "kal raat 8 baje 6 logon ke liye table book kar do",
+    "kitni dair lagegi order aane mein?",
+    "kya aap ke paas koi deal hai family ke liye?",
+    "khana thanda tha, complaint likhwani hai",
+    "bill kitna bana total?",
+    "shukriya!",
+]
+SHORT_REPLIES = [
+    "Ji zaroor! Aap ka order note kar liya gaya hai 🍽️",
+    "Delivery Model Town mein available hai, 35-45 minute lagenge.",
+    "Aap ki table kal raat 8 baje confirm hai ✨",
+    "Bohat maazrat, aap ki complaint register ho gayi hai.",
+]
+MENU_REPLY = "\n".join(f"• Item {i}: Rs {200 + i * 35}" for i in range(60))
+
+
+def summarize(samples) -> dict:
+    ordered = sorted(samples)
+    return {"p50": percentile(ordered, 50), "p95": percentile(ordered, 95), "max": ordered[-1] if ordered else 0}
+
+
+def make_memory(args) -> ConversationMemory:
+    return ConversationMemory(max_users=args.max_users, max_turns=args.max_turns,
+                              token_budget=args.budget, summary_tokens=args.summary_tokens,
+                              samples=args.users * args.turns)
+
+
+def play(args, memory, on_prompt=None) -> float:
+    """Run every chat through `memory`; returns the seconds spent inside it."""
+    rng = random.Random(args.seed)
+    users = [f"92300{i:07d}" for i in range(args.users)]
+    elapsed = 0.0
+    for turn in range(1, args.turns + 1):
+        # round-robin over users, as interleaved chats would arrive
+        for user in users:
+            text = rng.choice(MESSAGES)
+            reply = MENU_REPLY if text.startswith("menu") else rng.choice(SHORT_REPLIES)
+            started = time.perf_counter()
+            prompt, raw, sent = memory.build_prompt(user, SYSTEM_PROMPT, text)
+            memory.add_turn(user, text, reply)
+            elapsed += time.perf_counter() - started
+            if on_prompt is not None:
+                on_prompt(turn, prompt, raw, sent)
+    return elapsed
+
+
+def run(args) -> dict:
+    by_turn = {t: {"uncompacted": [], "sent": []} for t in (1, 5, 10, args.turns)}
+    over_budget = [0]
+
+    def check(turn, prompt, raw, sent):
+        if count_tokens(prompt) > args.budget:
+            over_budget[0] += 1
+        if turn in by_turn:
+            by_turn[turn]["uncompacted"].append(raw)
+            by_turn[turn]["sent"].append(sent)
+
+    memory = make_memory(args)
+    play(args, memory, check)
+    elapsed = play(args, make_memory(args))
+
+    # same chats again under tracemalloc, for the resident size only
+    tracemalloc.start()
+    traced = make_memory(args)
+    play(args, traced)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = memory.stats()
+    remembered = traced.stats()["users"]
+    return {
+        "users": args.users,
+        "turns_per_user": args.turns,
+        "token_budget": args.budget,
+        "system_prompt_tokens": count_tokens(SYSTEM_PROMPT),
+        "prompt_tokens_uncompacted": stats["prompt_tokens_uncompacted"],
+        "prompt_tokens_sent": stats["prompt_tokens_sent"],
+        "by_turn": {t: {k: summarize(v) for k, v in d.items()} for t, d in by_turn.items()},
+        "prompts_over_budget": over_budget[0],
+        "per_turn_us": round(elapsed / (args.users * args.turns) * 1e6, 1),
+        "bytes_per_user": round(current / max(1, remembered)),
+        "remembered_users": remembered,
+        "evictions": stats["evictions"],
+        "compactions": stats["compactions"],
+        "summary_drops": stats["summary_drops"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=1200)
+    parser.add_argument("--max-users", type=int, default=10000)
+    parser.add_argument("--max-turns", type=int, default=8)
+    parser.add_argument("--summary-tokens", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=7)
+    print(json.dumps(run(parser.parse_args()), indent=2))
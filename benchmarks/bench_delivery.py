@@ -0,0 +1,147 @@
+# benchmarks/bench_delivery.py
+"""
+Latency and accuracy benchmark for delivery zone lookups.
+
+Generates a synthetic city with thousands of zones (made-up Roman Urdu area
+names, one jittered polygon per grid square), then measures:
+
+- find() on messages naming an area exactly, with a typo, and with no area,
+- locate() on points inside a zone and on points outside every zone.
+
+    python benchmarks/bench_delivery.py --zones 5000 --lookups 20000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delivery_zones import DeliveryZones, normalize_area  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+SYLLABLES = ["sha", "baz", "gul", "berg", "mil", "lat", "faro", "qabad", "jinn", "ah", "noor", "pur",
+             "raza", "abad", "sar", "go", "dha", "iqbal", "zaf", "ar", "kha", "lid", "nis", "ar"]
+SUFFIXES = ["town", "nagar", "colony", "road", "chowk", "block", "market", "park"]
+TEMPLATES = [
+    "delivery to {area}",
+    "kya aap {area} deliver karte hain?",
+    "{area} mein delivery hoti hai?",
+    "{area}, near masjid",
+    "ghar {area} mein hai, kitne charges?",
+]
+FILLER = ["salam bhai menu bhejo", "order status kya hai", "aaj ki deal kya hai", "thanks"]
+
+ORIGIN = (31.30, 72.95)
+
+
+def area_name(rng: random.Random, used: set) -> str:
+    while True:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        name = f"{name} {rng.choice(SUFFIXES).capitalize()}"
+        if normalize_area(name) not in used:
+            used.add(normalize_area(name))
+            return name
+
+
+def polygon(row: int, col: int, cell: float, rng: random.Random):
+    """Irregular hexagon inside grid square (row, col)."""
+    cy = ORIGIN[0] + (row + 0.5) * cell
+    cx = ORIGIN[1] + (col + 0.5) * cell
+    ring = []
+    for k in range(6):
+        angle = 2 * math.pi * k / 6
+        r = cell * rng.uniform(0.35, 0.48)
+        ring.append([round(cy + r * math.sin(angle), 6), round(cx + r * math.cos(angle), 6)])
+    return ring, (cy, cx)
+
+
+def build(n: int, cell: float, seed: int):
+    rng = random.Random(seed)
+    side = math.ceil(math.sqrt(n))
+    used, zones, centers = set(), [], []
+    for i in range(n):
+        row, col = divmod(i, side)
+        ring, center = polygon(row, col, cell, rng)
+        name = area_name(rng, used)
+        zones.append({"id": f"z{i}", "name": name, "fee": rng.choice([50, 70, 90, 120]),
+                      "eta_min": rng.randint(20, 60), "polygon": ring})
+        centers.append(center)
+    return {"defaults": {"fee": 70, "eta_min": 40}, "zones": zones}, centers, side
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def timed(fn, cases):
+    samples, correct = [], 0
+    for arg, expected in cases:
+        t0 = time.perf_counter()
+        zone = fn(*arg)
+        samples.append(time.perf_counter() - t0)
+        correct += (zone["id"] if zone else None) == expected
+    samples.sort()
+    return {
+        "lookups": len(cases),
+        "accuracy": round(correct / len(cases), 4),
+        "avg_us": round(sum(samples) / len(samples) * 1e6, 1),
+        **{f"p{p}_us": round(percentile(samples, p) * 1e6, 1) for p in (50, 95, 99)},
+    }
+
+
+def run(args):
+    data, centers, side = build(args.zones, args.cell, args.seed)
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    try:
+        started = time.perf_counter()
+        dz = DeliveryZones(path, cell_deg=args.cell)
+        dz.reload()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(args.seed + 1)
+        zones = data["zones"]
+        exact, fuzzy, miss, inside, outside = [], [], [], [], []
+        for _ in range(args.lookups):
+            i = rng.randrange(len(zones))
+            z = zones[i]
+            exact.append(((rng.choice(TEMPLATES).format(area=z["name"]),), z["id"]))
+            head, tail = z["name"].split(" ", 1)
+            fuzzy.append(((rng.choice(TEMPLATES).format(area=f"{typo(head, rng)} {tail}"),), z["id"]))
+            miss.append(((rng.choice(FILLER),), None))
+            cy, cx = centers[i]
+            inside.append(((cy + rng.uniform(-0.2, 0.2) * args.cell, cx + rng.uniform(-0.2, 0.2) * args.cell), z["id"]))
+            # grid-square corners are outside every hexagon
+            outside.append(((ORIGIN[0] + rng.randrange(side) * args.cell + 0.01 * args.cell,
+                             ORIGIN[1] + rng.randrange(side) * args.cell + 0.01 * args.cell), None))
+
+        return {
+            "zones": args.zones,
+            "load_ms": round(load_ms, 1),
+            "index": dz.stats(),
+            "find_exact": timed(dz.find, exact),
+            "find_typo": timed(dz.find, fuzzy),
+            "find_no_area": timed(dz.find, miss),
+            "locate_inside": timed(dz.locate, inside),
+            "locate_outside": timed(dz.locate, outside),
+        }
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--cell", type=float, default=0.01, help="grid cell size in degrees")
+    parser.add_argument("--seed", type=int, default=3)
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,97 @@
+# benchmarks/bench_events.py
+"""
+Fan-out check for the /events broadcast buffer.
+
+Runs many SSE subscribers on one event loop (a few of them deliberately slow)
+while a producer thread publishes orders. Reports publish() latency (which
+must stay flat however slow the readers are), delivery lag for the fast
+subscribers, and how many slow subscribers were told to reset and dropped.
+
+    python benchmarks/bench_events.py --subscribers 200 --slow 5 --events 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import EventBus  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+
+async def subscriber(bus, slow_s, lags, counts):
+    received = 0
+    async for frame in bus.sse(None, heartbeat=1.0):
+        if "event: reset" in frame:
+            counts["reset"] += 1
+            return
+        events = frame.count("\nevent: ")
+        received += events
+        if events and not slow_s:
+            # lag of the newest event in this write
+            lags.append(time.time() - json.loads(frame.rsplit("data: ", 1)[1])["ts"])
+        if slow_s:
+            await asyncio.sleep(slow_s)
+        if received >= counts["expected"]:
+            counts["complete"] += 1
+            return
+
+
+def produce(bus, n, rate, samples):
+    gap = 1.0 / rate if rate else 0
+    for i in range(n):
+        t0 = time.perf_counter()
+        bus.publish("order", {"user": f"u{i % 500}", "item": "Chicken Karahi", "qty": 1, "total": 1200})
+        samples.append(time.perf_counter() - t0)
+        if gap:
+            time.sleep(gap)
+
+
+async def run(args):
+    bus = EventBus(capacity=args.buffer, max_subscribers=args.subscribers)
+    lags, publish = [], []
+    counts = {"expected": args.events, "reset": 0, "complete": 0}
+    tasks = []
+    for i in range(args.subscribers):
+        slow = args.slow_delay if i < args.slow else 0
+        tasks.append(asyncio.create_task(subscriber(bus, slow, lags, counts)))
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    producer = threading.Thread(target=produce, args=(bus, args.events, args.rate, publish))
+    producer.start()
+    await asyncio.to_thread(producer.join)
+    await asyncio.wait(tasks, timeout=10)
+    elapsed = time.perf_counter() - started
+    for t in tasks:
+        t.cancel()
+
+    publish.sort()
+    lags.sort()
+    return {
+        "subscribers": args.subscribers,
+        "slow_subscribers": args.slow,
+        "events": args.events,
+        "elapsed_s": round(elapsed, 2),
+        "publish_us": {f"p{p}": round(percentile(publish, p) * 1e6, 1) for p in (50, 99, 100)},
+        "delivery_lag_ms": {f"p{p}": round(percentile(lags, p) * 1e3, 2) for p in (50, 99)} if lags else {},
+        "fast_complete": counts["complete"],
+        "slow_reset_and_dropped": counts["reset"],
+        "bus": bus.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--slow", type=int, default=5, help="subscribers that sleep after every write")
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=5000, help="events per second (0 = as fast as possible)")
+    parser.add_argument("--buffer", type=int, default=2000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,126 @@
+# benchmarks/bench_matcher.py
+"""
+Accuracy and latency benchmark for the fuzzy menu matcher.
+
+Builds a corpus of realistic order messages from menu.json (Roman Urdu
+spelling variants, typos, quantities in digits/words, filler text) and
+reports per-message latency percentiles and top-1 item accuracy.
+
+    python benchmarks/bench_matcher.py --messages 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import VARIANTS, MenuMatcher, canonical_tokens  # noqa: E402
+from menu_service import menu_service  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+TEMPLATES = [
+    "{qty} {item}",
+    "{item} {qty}",
+    "mujhe {qty} {item} chahiye",
+    "order confirm {qty} {item} please",
+    "bhai {qty} {item} bhej do",
+    "{qty}x {item}",
+    "i want {qty} {item}",
+    "{item} order karna hai",
+]
+QTY_FORMS = [("1", 1), ("2", 2), ("3", 3), ("ek", 1), ("do", 2), ("teen", 3), ("", 1)]
+
+# canonical token -> spellings customers actually use
+SPELLINGS = {}
+for variant, canonical in VARIANTS.items():
+    SPELLINGS.setdefault(canonical, []).append(variant)
+
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.choice(["drop", "swap", "double"])
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "swap":
+        return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    return word[:i] + word[i] + word[i:]
+
+
+def mangle(name: str, rng: random.Random) -> str:
+    words = []
+    for tok in canonical_tokens(name):
+        if tok in ("2", "pcs"):
+            continue
+        roll = rng.random()
+        if roll < 0.3 and tok in SPELLINGS:
+            tok = rng.choice(SPELLINGS[tok])
+        elif roll < 0.45:
+            tok = typo(tok, rng)
+        words.append(tok)
+    return " ".join(words)
+
+
+def build_corpus(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    items = menu_service.all_items()
+    corpus = []
+    for _ in range(n):
+        item = rng.choice(items)
+        qty_text, qty = rng.choice(QTY_FORMS)
+        template = rng.choice(TEMPLATES)
+        if "{qty}" not in template:
+            qty_text, qty = "", 1
+        elif template.startswith("{qty}x") and not qty_text.isdigit():
+            qty_text, qty = "2", 2
+        message = template.format(qty=qty_text, item=mangle(item["name"], rng)).strip()
+        corpus.append((message, item["name"], qty))
+    return corpus
+
+
+def run(args):
+    corpus = build_corpus(args.messages, args.seed)
+
+    started = time.perf_counter()
+    matcher = MenuMatcher()
+    matcher.match("warm up")
+    build_ms = (time.perf_counter() - started) * 1000
+
+    samples = []
+    correct_item = correct_qty = 0
+    misses = []
+    for message, expected, qty in corpus:
+        t0 = time.perf_counter()
+        found = matcher.match(message)
+        samples.append(time.perf_counter() - t0)
+        if found and found[0]["item"] == expected:
+            correct_item += 1
+            correct_qty += found[0]["qty"] == qty
+        elif len(misses) < args.show_misses:
+            misses.append({"message": message, "expected": expected, "got": found[0]["item"] if found else None})
+
+    samples.sort()
+    return {
+        "messages": len(corpus),
+        "index_build_ms": round(build_ms, 2),
+        "item_accuracy": round(correct_item / len(corpus), 4),
+        "qty_accuracy": round(correct_qty / len(corpus), 4),
+        "latency_us": {
+            "avg": round(sum(samples) / len(samples) * 1e6, 1),
+            **{f"p{p}": round(percentile(samples, p) * 1e6, 1) for p in (50, 95, 99)},
+        },
+        "sample_misses": misses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--show-misses", type=int, default=10)
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,125 @@
+# benchmarks/bench_reservations.py
+"""
+Query latency and double-booking check for the reservation engine.
+
+Fills the book with months of random bookings, then times availability
+queries and bookings, and finally lets many threads race for the same slots
+to confirm no table is ever given to two parties at once.
+
+    python benchmarks/bench_reservations.py --days 120 --fill 0.6 --threads 32
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ZK_DB_PATH", os.path.join(tempfile.gettempdir(), f"zk_bench_res_{os.getpid()}.db"))
+
+from metrics import percentile  # noqa: E402
+from reservations import TABLES_PATH, ReservationBook, _minutes  # noqa: E402
+
+
+def timed(fn, calls) -> dict:
+    samples = []
+    for args in calls:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "avg_us": round(sum(samples) / len(samples) * 1e6, 1),
+        **{f"p{p}_us": round(percentile(samples, p) * 1e6, 1) for p in (50, 95, 99)},
+    }
+
+
+def random_slot(rng, book, base, days):
+    day = base + timedelta(days=rng.randrange(days))
+    minute = book.open_min + rng.randrange((book.last_seating_min - book.open_min) // book.step + 1) * book.step
+    return day.replace(hour=minute // 60, minute=minute % 60)
+
+
+def overlaps(book) -> int:
+    """Pairs of bookings sharing a table and overlapping in time (must be 0)."""
+    bad = 0
+    by_table = {}
+    for b in book.bookings.values():
+        s = _minutes(datetime.strptime(b["start"], "%Y-%m-%d %H:%M"))
+        by_table.setdefault(b["table"], []).append((s, s + b["duration_min"]))
+    for spans in by_table.values():
+        spans.sort()
+        bad += sum(1 for a, b in zip(spans, spans[1:]) if b[0] < a[1])
+    return bad
+
+
+def run(args):
+    book = ReservationBook.from_file(args.tables)
+    rng = random.Random(args.seed)
+    base = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    party_sizes = [2, 2, 2, 3, 4, 4, 4, 5, 6, 6, 8, 10]
+
+    slots_per_day = (book.last_seating_min - book.open_min) // book.step + 1
+    capacity = len(book._schedules) * args.days * slots_per_day * book.step // book.duration
+    target = int(capacity * args.fill)
+    started = time.perf_counter()
+    attempts = 0
+    while book.booked < target and attempts < target * 4:
+        attempts += 1
+        book.book(f"u{attempts}", rng.choice(party_sizes), random_slot(rng, book, base, args.days))
+    fill_s = time.perf_counter() - started
+
+    queries = [(rng.choice(party_sizes), random_slot(rng, book, base, args.days)) for _ in range(args.queries)]
+    result = {
+        "days": args.days,
+        "tables": len(book._schedules),
+        "bookings": book.booked,
+        "fill_s": round(fill_s, 2),
+        "available": timed(book.available, queries),
+        "alternatives": timed(book.alternatives, queries[: args.queries // 10]),
+    }
+
+    # concurrent webhooks racing for the same few evenings
+    race_slots = [random_slot(rng, book, base + timedelta(days=args.days), 3) for _ in range(20)]
+    before = book.booked
+    barrier = threading.Barrier(args.threads)
+
+    def worker(i):
+        local = random.Random(i)
+        barrier.wait()
+        for _ in range(args.race_attempts):
+            book.book(f"race{i}", local.choice(party_sizes), local.choice(race_slots))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result["race"] = {
+        "threads": args.threads,
+        "attempts": args.threads * args.race_attempts,
+        "booked": book.booked - before,
+        "rejected_full": book.rejected,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "overlapping_bookings": overlaps(book),
+    }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", default=TABLES_PATH)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--fill", type=float, default=0.6, help="fraction of table-time to book up front")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--race-attempts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=9)
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,152 @@
+# benchmarks/bench_startup.py
+"""
+Import-time and cold-start budget for app.py.
+
+Each run starts fresh interpreters (no warm sys.modules) and measures:
+
+- `python -X importtime -c "import app"`: total import time and the slowest
+  top-level imports,
+- that no module in --forbid (langchain, groq) is loaded by the import
+  itself, in offline mode or with a Groq key set,
+- cold start: import plus the lifespan startup and shutdown (offline LLM,
+  no WhatsApp), as wall-clock time.
+
+Exits 1 when the median import time exceeds --budget-ms or a forbidden module
+was imported, so CI can track it:
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import asyncio, time
+t0 = time.perf_counter()
+import {module} as m
+imported = time.perf_counter()
+
+async def main():
+    async with m.app.router.lifespan_context(m.app):
+        pass
+
+if hasattr(m, "app"):
+    asyncio.run(main())
+print(round((imported - t0) * 1000, 1), round((time.perf_counter() - t0) * 1000, 1))
+"""
+
+LOADED = """
+import sys, json
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def child_env(tmp: str, offline: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "ZK_DB_PATH": os.path.join(tmp, "zk.db"),
+        "STATE_DB_PATH": os.path.join(tmp, "state.db"),
+        "WA_TOKEN": "", "WA_PHONE_ID": "",
+        "LOG_SAMPLE_RATE": "0",
+    })
+    if offline:
+        env["LLM_OFFLINE"] = "1"
+    else:
+        env.pop("LLM_OFFLINE", None)
+        env["GROQ_API_KEY"] = env.get("GROQ_API_KEY") or "bench-startup-key"
+    return env
+
+
+def import_profile(module: str, env: dict) -> dict:
+    """Parse -X importtime output: total for `module` and the cumulative time of its direct imports."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+    # children are printed before their parent, indented two spaces per level
+    children, total, top = [], 0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us)))
+        elif depth == 0:
+            if name.strip() == module:
+                total, top = int(cumulative_us), sorted(children, key=lambda r: -r[1])
+            children = []
+    return {"total_ms": total / 1000, "top": top}
+
+
+def loaded_modules(module: str, env: dict) -> list:
+    out = subprocess.check_output([sys.executable, "-c", LOADED.format(module=module)], cwd=ROOT, env=env, text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def cold_start(module: str, env: dict):
+    out = subprocess.check_output([sys.executable, "-c", COLD_START.format(module=module)],
+                                  cwd=ROOT, env=env, text=True)
+    imported_ms, ready_ms = out.strip().splitlines()[-1].split()
+    return float(imported_ms), float(ready_ms)
+
+
+def run(args) -> dict:
+    forbid = [f.strip() for f in args.forbid.split(",") if f.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        offline = child_env(tmp, offline=True)
+        online = child_env(tmp, offline=False)
+
+        profiles = [import_profile(args.module, offline) for _ in range(args.runs)]
+        totals = sorted(p["total_ms"] for p in profiles)
+        slowest = {}
+        for p in profiles:
+            for name, us in p["top"]:
+                slowest.setdefault(name, []).append(us / 1000)
+
+        forbidden = {}
+        for label, env in (("offline", offline), ("with_key", online)):
+            mods = loaded_modules(args.module, env)
+            forbidden[label] = sorted(m for m in mods if m.split(".")[0] in forbid)
+
+        starts = [cold_start(args.module, offline) for _ in range(args.runs)]
+
+    median = statistics.median(totals)
+    result = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": {"median": round(median, 1), "min": round(totals[0], 1), "max": round(totals[-1], 1)},
+        "cold_start_ms": {
+            "import_median": round(statistics.median(s[0] for s in starts), 1),
+            "ready_median": round(statistics.median(s[1] for s in starts), 1),
+        },
+        "slowest_imports_ms": {
+            name: round(statistics.median(v), 1)
+            for name, v in sorted(slowest.items(), key=lambda kv: -statistics.median(kv[1]))[: args.top]
+        },
+        "forbidden_at_import": forbidden,
+        "budget_ms": args.budget_ms,
+    }
+    result["ok"] = median <= args.budget_ms and not any(forbidden.values())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="max median import time")
+    parser.add_argument("--forbid", default="langchain,langchain_core,langchain_groq,groq",
+                        help="top-level packages that must not be imported by `import app`")
+    parser.add_argument("--top", type=int, default=10)
+    result = run(parser.parse_args())
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
@@ -0,0 +1,75 @@
+# benchmarks/bench_storage.py
+"""
+Insert throughput and latest-N query latency for the SQLite store.
+
+    python benchmarks/bench_storage.py --rows 1000000 --users 20000
+
+Uses a throwaway database file (removed afterwards unless --keep).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ZK_DB_PATH", os.path.join(tempfile.gettempdir(), "zk_bench_default.db"))
+
+from metrics import percentile  # noqa: E402
+from storage import Store  # noqa: E402
+
+STATUSES = ["confirmed"] * 8 + ["delivered", "cancelled"]
+
+
+def timed_queries(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {f"p{p}_us": round(percentile(samples, p) * 1e6, 1) for p in (50, 95, 99)}
+
+
+def run(args):
+    path = args.path or os.path.join(tempfile.gettempdir(), f"zk_bench_{os.getpid()}.db")
+    store = Store(path, batch_size=args.batch_size)
+    rng = random.Random(1)
+    users = [f"92300{i:07d}" for i in range(args.users)]
+
+    started = time.perf_counter()
+    for i in range(args.rows):
+        store.add_order(rng.choice(users), "Chapli Kebab (2 pcs)", qty=2, total=600, status=rng.choice(STATUSES))
+    enqueued = time.perf_counter() - started
+    store.flush(timeout=3600)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "rows": args.rows,
+        "enqueue_per_sec": round(args.rows / enqueued),
+        "committed_per_sec": round(args.rows / elapsed),
+        **store.stats(),
+        "latest_20_global": timed_queries(lambda: store.latest("orders", 20), args.queries),
+        "latest_20_by_user": timed_queries(lambda: store.latest("orders", 20, user=rng.choice(users)), args.queries),
+        "latest_20_by_status": timed_queries(lambda: store.latest("orders", 20, status="delivered"), args.queries),
+    }
+    store.close()
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--path", default="")
+    parser.add_argument("--keep", action="store_true")
+    print(json.dumps(run(parser.parse_args()), indent=2))
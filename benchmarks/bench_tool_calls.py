@@ -0,0 +1,188 @@
+# benchmarks/bench_tool_calls.py
+"""
+Native tool calling against the old "TOOL_CALL:<name>" string protocol.
+
+Plays the same messages through both protocols, with one, two and three
+intents per message. A scripted model stands in for Groq, and its latency
+grows with prompt and completion tokens (--base-ms, --prefill-us-per-token,
+--decode-ms-per-token). Both protocols carry the same system prompt and
+--history-tokens of earlier conversation:
+
+- text: the model answers one "TOOL_CALL:<name>" line per turn and the tool
+  re-parses the raw message. Every further intent costs a follow-up round
+  trip with the earlier exchange in the prompt.
+- native: one call with the tool schemas attached. The model returns every
+  tool call with typed arguments, and independent calls run concurrently
+  (agents_tools.run_tool_calls).
+
+An intent counts as resolved when its tool answers with its success reply.
+Reports LLM calls, tokens and wall time per resolved intent.
+
+    python benchmarks/bench_tool_calls.py --rounds 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ZK_DB_PATH", os.path.join(tempfile.gettempdir(), f"zk_bench_tools_{os.getpid()}.db"))
+
+from agents_tools import call_tool, format_tool_calls, run_tool_calls, tool_schemas  # noqa: E402
+from conversation import count_tokens  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+TOOL_PROSE = (
+    "You can use the following tools when needed:\n"
+    "menu, order, reserve, delivery, upsell, complaint.\n"
+    "Format for tool calls:\nTOOL_CALL:<tool_name>\n"
+)
+# about the size of the system prompt in streamlit_app.py, minus its tool section
+PERSONA = (
+    "You are ZK Restaurant AI Agent — a friendly, helpful, and professional virtual assistant "
+    "for ZK Restaurant. Your goal is to give clear, attractive, and engaging responses that make "
+    "customers feel welcomed.\n"
+    "Rules for replying:\n- If the user speaks in Urdu, always reply in clean and polite Roman Urdu.\n"
+    "- Keep answers short, clear, and customer-friendly.\n- Add a warm and welcoming tone.\n"
+    "- NEVER use code, symbols, or technical formatting.\n"
+    "- When suggesting items, recommend best-sellers politely.\n"
+    "Your personality:\n- Friendly, respectful, polite.\n- Professional like a trained restaurant "
+    "customer-service agent.\n- Always helpful and positive.\n- Use emojis lightly when appropriate.\n"
+)
+TEXT_PROMPT = PERSONA + TOOL_PROSE
+NATIVE_PROMPT = PERSONA
+FILLER = "User: kya aap ke paas family deal hai?\nAgent: Ji haan, hamari family deal mein karahi, naan aur drinks hain.\n"
+
+
+def scenarios(round_no: int):
+    """(message, [(tool, args the model would extract)]); bookings move a day per round."""
+    day = datetime.now() + timedelta(days=1 + round_no)
+    return [
+        ("menu dikhao", [("menu", {})]),
+        ("2 chapli kebab order karna hai", [("order", {"items": [{"name": "chapli kebab", "qty": 2}]})]),
+        ("Model Town mein delivery hoti hai?", [("delivery", {"location": "Model Town"})]),
+        ("2 chicken karahi order karo aur Model Town delivery kitne ki hai?",
+         [("order", {"items": [{"name": "chicken karahi", "qty": 2}]}), ("delivery", {"location": "Model Town"})]),
+        (f"{day.day}/{day.month} ko raat 9 baje 4 logon ke liye table book karo, aur menu bhi bhej do",
+         [("reserve", {"action": "book", "party_size": 4, "time": "21:00", "date": day.strftime("%Y-%m-%d")}),
+          ("menu", {})]),
+        ("ek afghani kabab aur 3 naan order, saath kya acha lagega? aur City Center delivery?",
+         [("order", {"items": [{"name": "afghani kabab", "qty": 1}, {"name": "naan", "qty": 3}]}),
+          ("upsell", {}), ("delivery", {"location": "City Center"})]),
+    ]
+
+
+SUCCESS = {"menu": "", "order": "🛒", "delivery": "🚚", "reserve": "📅", "upsell": "🔥", "complaint": "🙏"}
+
+
+class ScriptedModel:
+    """Answers from SCENARIOS; sleeps like a hosted model would for the tokens involved."""
+
+    def __init__(self, args):
+        self.args = args
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+    def complete(self, prompt: str, completion: str, schemas=None):
+        prompt_tokens = count_tokens(prompt) + (count_tokens(json.dumps(schemas)) if schemas else 0)
+        completion_tokens = count_tokens(completion)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        a = self.args
+        time.sleep((a.base_ms + prompt_tokens * a.prefill_us_per_token / 1000
+                    + completion_tokens * a.decode_ms_per_token) / 1000 * a.time_scale)
+
+
+def resolved(name, reply) -> bool:
+    return bool(reply) and reply.lstrip().startswith(SUCCESS[name]) and not reply.lstrip().startswith("❌")
+
+
+def run_text(model, text, intents, user, history):
+    """One intent per round trip; the tool gets the whole message."""
+    ok = 0
+    for name, _ in intents:
+        prompt = f"{TEXT_PROMPT}{history}User: {text}\nAgent:"
+        completion = f"TOOL_CALL:{name}"
+        model.complete(prompt, completion)
+        reply = call_tool(name, text, user)
+        ok += resolved(name, reply)
+        history += f"User: {text}\nAgent: {reply[:400]}\n"
+    return ok
+
+
+def run_native(model, text, intents, user, history, schemas):
+    prompt = f"{NATIVE_PROMPT}{history}User: {text}\nAgent:"
+    completion = json.dumps([{"name": n, "arguments": a} for n, a in intents])
+    model.complete(prompt, completion, schemas)
+    joined = run_tool_calls(intents, user, text) or ""
+    # replies are joined in call order; check each tool's reply is among them
+    parts = joined.split("\n\n")
+    return sum(any(resolved(n, p) for p in parts) for n, _ in intents)
+
+
+def run(args) -> dict:
+    schemas = tool_schemas()
+    history = FILLER * max(0, round(args.history_tokens / count_tokens(FILLER)))
+    results = {}
+    for mode in ("text", "native"):
+        model = ScriptedModel(args)
+        by_size = {}
+        for r in range(args.rounds):
+            for i, (text, intents) in enumerate(scenarios(r)):
+                user = f"{mode}-{r}-{i}"
+                started = time.perf_counter()
+                calls_before = model.calls
+                if mode == "text":
+                    ok = run_text(model, text, intents, user, history)
+                else:
+                    ok = run_native(model, text, intents, user, history, schemas)
+                row = by_size.setdefault(len(intents), {"messages": 0, "intents": 0, "resolved": 0,
+                                                        "llm_calls": 0, "latency": []})
+                row["messages"] += 1
+                row["intents"] += len(intents)
+                row["resolved"] += ok
+                row["llm_calls"] += model.calls - calls_before
+                row["latency"].append(time.perf_counter() - started)
+
+        total_resolved = sum(r["resolved"] for r in by_size.values())
+        total_latency = sum(sum(r["latency"]) for r in by_size.values())
+        results[mode] = {
+            "llm_calls": model.calls,
+            "prompt_tokens": model.prompt_tokens,
+            "completion_tokens": model.completion_tokens,
+            "resolved_intents": total_resolved,
+            "intents": sum(r["intents"] for r in by_size.values()),
+            "tokens_per_resolved_intent": round((model.prompt_tokens + model.completion_tokens)
+                                                / max(1, total_resolved), 1),
+            "ms_per_resolved_intent": round(total_latency / max(1, total_resolved) * 1000
+                                            / args.time_scale, 1),
+            "by_intents_per_message": {
+                size: {
+                    "resolved": f"{r['resolved']}/{r['intents']}",
+                    "llm_calls_per_message": round(r["llm_calls"] / r["messages"], 2),
+                    "p50_ms": round(percentile(sorted(r["latency"]), 50) * 1000 / args.time_scale, 1),
+                }
+                for size, r in sorted(by_size.items())
+            },
+        }
+    results["system_prompt_tokens"] = {"text": count_tokens(TEXT_PROMPT), "native": count_tokens(NATIVE_PROMPT)}
+    results["history_tokens"] = count_tokens(history)
+    results["tool_schema_tokens"] = count_tokens(json.dumps(schemas))
+    results["example_native_turn"] = format_tool_calls(scenarios(0)[-1][1])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--history-tokens", type=int, default=400, help="earlier conversation in every prompt")
+    parser.add_argument("--base-ms", type=float, default=180.0, help="per-request overhead (network, queueing)")
+    parser.add_argument("--prefill-us-per-token", type=float, default=60.0)
+    parser.add_argument("--decode-ms-per-token", type=float, default=1.5)
+    parser.add_argument("--time-scale", type=float, default=0.1,
+                        help="sleep this fraction of the modelled latency; reported numbers are rescaled")
+    print(json.dumps(run(parser.parse_args()), indent=2, ensure_ascii=False))
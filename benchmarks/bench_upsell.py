@@ -0,0 +1,132 @@
+# benchmarks/bench_upsell.py
+"""
+Upsell recommender at scale: 100k orders over a menu of a few hundred items.
+
+Builds a synthetic menu.json, generates orders in which every "main" has a
+few planted partner items, and measures:
+
+- record(): per-order update cost (matrix bump + ranked-list fix-ups),
+- recommend(): latency for 1- and 3-item carts, against a full recompute
+  (argsort of the cart rows) on every request,
+- recall: how many planted partners of the popular items show up in
+  their top-3 suggestions.
+
+    python benchmarks/bench_upsell.py --items 300 --orders 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ZK_DB_PATH", os.path.join(tempfile.gettempdir(), f"zk_bench_upsell_{os.getpid()}.db"))
+
+from menu_service import MenuService, normalize_name  # noqa: E402
+from metrics import percentile  # noqa: E402
+from upsell import UpsellRecommender  # noqa: E402
+
+
+def build_menu(n_items: int, path: str):
+    categories = ["Karahi", "BBQ", "Rice", "Fast Food", "Bread & Extras", "Kahwa & Drinks", "Desserts"]
+    menu = {c: [] for c in categories}
+    for i in range(n_items):
+        cat = categories[i % len(categories)]
+        menu[cat].append({"name": f"{cat} Item {i}", "price": 30 + (i * 37) % 2500})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(menu, f)
+
+
+def timed(fn, calls) -> dict:
+    samples = []
+    for args in calls:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "avg_us": round(sum(samples) / len(samples) * 1e6, 1),
+        **{f"p{p}_us": round(percentile(samples, p) * 1e6, 1) for p in (50, 99)},
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    tmp = tempfile.mkdtemp(prefix="zk_upsell_")
+    menu_path = os.path.join(tmp, "menu.json")
+    build_menu(args.items, menu_path)
+    menu = MenuService(menu_path)
+    items = [i["name"] for i in menu.all_items()]
+
+    # every item gets 3 planted partners that come along 60% / 40% / 25% of the time
+    partners = {name: rng.sample(items, 3) for name in items}
+    hot = items[: max(10, len(items) // 5)]   # skewed popularity
+
+    def make_order():
+        base = rng.choice(hot) if rng.random() < 0.6 else rng.choice(items)
+        order = {base}
+        for p, prob in zip(partners[base], (0.6, 0.4, 0.25)):
+            if rng.random() < prob:
+                order.add(p)
+        for _ in range(rng.randrange(0, 3)):
+            order.add(rng.choice(items))
+        return list(order)
+
+    orders = [make_order() for _ in range(args.orders)]
+    rec = UpsellRecommender(menu=menu, store=None, rank_size=args.rank_size, min_support=args.min_support)
+
+    started = time.perf_counter()
+    for order in orders:
+        rec.record(order)
+    record_s = time.perf_counter() - started
+
+    singles = [([rng.choice(items)],) for _ in range(args.queries)]
+    triples = [(rng.sample(items, 3),) for _ in range(args.queries)]
+
+    # planted partners of the often-ordered items recovered in their top 3
+    hits = sum(len({r["item"] for r in rec.recommend([name], k=3)} & set(partners[name])) for name in hot)
+
+    index = rec._index
+
+    def baseline(cart):
+        """Full recompute on every request: score all items from the raw matrix rows."""
+        ids = [index[normalize_name(n)] for n in cart]
+        counts = rec._counts
+        support = np.maximum(counts[ids, ids].astype(np.float64), 1)
+        scores = (counts[ids].astype(np.float64) / support[:, None]).sum(axis=0)
+        scores[ids] = -1
+        return np.argsort(-scores)[:args.k]
+
+    return {
+        "items": len(items),
+        "orders": args.orders,
+        "record": {
+            "total_s": round(record_s, 2),
+            "per_order_us": round(record_s / args.orders * 1e6, 1),
+            "avg_items_per_order": round(sum(map(len, orders)) / len(orders), 2),
+        },
+        "recommend_1_item": timed(lambda cart: rec.recommend(cart, k=args.k), singles),
+        "recommend_3_items": timed(lambda cart: rec.recommend(cart, k=args.k), triples),
+        "full_recompute_1_item": timed(baseline, singles[: args.queries // 5]),
+        "full_recompute_3_items": timed(baseline, triples[: args.queries // 5]),
+        "planted_partner_recall_top3": round(hits / (3 * len(hot)), 3),
+        "stats": rec.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rank-size", type=int, default=16)
+    parser.add_argument("--min-support", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=4)
+    print(json.dumps(run(parser.parse_args()), indent=2))
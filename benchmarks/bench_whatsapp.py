@@ -0,0 +1,56 @@
+# benchmarks/bench_whatsapp.py
+"""
+Throughput/latency benchmark for WhatsAppSender against the local fake Graph API.
+
+    python benchmarks/bench_whatsapp.py --messages 2000 --concurrency 16 --rate 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_graph import create_app, serve_in_thread  # noqa: E402
+from whatsapp import WhatsAppSender  # noqa: E402
+
+
+async def run(args):
+    sender = WhatsAppSender(
+        "fake-token",
+        "123456",
+        base_url=f"http://127.0.0.1:{args.port}",
+        concurrency=args.concurrency,
+        max_queue=args.messages,
+        rate=args.rate,
+        backoff_base=0.05,
+    )
+    await sender.start()
+
+    started = time.perf_counter()
+    for i in range(args.messages):
+        sender.enqueue(f"92300{i % 500:07d}", f"Benchmark reply #{i}")
+    await sender.stop(timeout=600)
+    elapsed = time.perf_counter() - started
+
+    stats = sender.stats()
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["sends_per_sec"] = round(stats["sent"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=80.0)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    serve_in_thread(create_app(args.latency_ms, error_rate=args.error_rate), args.port)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
@@ -0,0 +1,116 @@
+# benchmarks/check_multiworker.py
+"""
+Multi-worker check for the SQLite state backend.
+
+Starts several worker processes on one STATE_DB_PATH (like uvicorn --workers N)
+that fill and confirm carts through OrderTool (which records each order in the
+shared order index via orders.save_order), while the
+parent follows order_state through a ChangeFeed the way a dashboard would.
+Fails if any order is lost or duplicated, if two orders get the same seq, if a
+user's latest state is missing or stale, or if the feed misses an update.
+
+    python benchmarks/check_multiworker.py --workers 6 --orders 300
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="zk_multiworker_")
+os.environ["STATE_BACKEND"] = "sqlite"
+os.environ.setdefault("STATE_DB_PATH", os.path.join(TMP, "state.db"))
+os.environ.setdefault("ZK_DB_PATH", os.path.join(TMP, "orders.db"))
+
+ITEMS = ["chapli kebab", "afghani naan", "chicken karahi", "afghani kabab"]
+
+
+def worker(index: int, orders: int, users: int, start_evt):
+    from storage import store
+    from tools import OrderTool
+
+    tool = OrderTool()
+    start_evt.wait()
+    for n in range(orders):
+        # each user is owned by one worker, as the per-user pipeline guarantees
+        user = f"w{index}-u{n % users}"
+        tool.func(f"{n % 50 + 1} {ITEMS[n % len(ITEMS)]}", user)
+        tool.func("order confirm", user)
+    store.close()
+
+
+def run(args):
+    from order_state import order_state
+    from shared_state import ChangeFeed, make_order_index
+
+    seen = {}
+
+    def on_change(version, changed, removed):
+        for user, entry in changed.items():
+            seen[user] = entry["item"]
+
+    feed = ChangeFeed(order_state, on_change).start()
+    ctx = multiprocessing.get_context("spawn")
+    start_evt = ctx.Event()
+    procs = [ctx.Process(target=worker, args=(i, args.orders, args.users, start_evt)) for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    t0 = time.perf_counter()
+    start_evt.set()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t0
+
+    deadline = time.monotonic() + 5
+    while feed.version < order_state.version and time.monotonic() < deadline:
+        time.sleep(0.05)
+    feed.stop()
+
+    expected = args.workers * args.orders
+    orders_db = make_order_index(capacity=expected * 2)
+    rows = orders_db.query(limit=expected + 10, since=0)["orders"]
+    seqs = [o["seq"] for o in rows]
+    placed = Counter(o["user"] for o in rows)
+    wanted = Counter(f"w{i}-u{n % args.users}" for i in range(args.workers) for n in range(args.orders))
+
+    # rows are oldest first and a user's orders all come from one worker, so the last row wins
+    latest = {o["user"]: o["item"] for o in rows}
+    stale = [u for u, item in latest.items() if order_state.get(u, {}).get("item") != item]
+    feed_missed = [u for u, item in latest.items() if seen.get(u) != item]
+
+    from storage import store
+    stored = store.count("orders")
+
+    result = {
+        "workers": args.workers,
+        "orders_expected": expected,
+        "orders_indexed": len(rows),
+        "orders_stored": stored,
+        "duplicate_seqs": len(seqs) - len(set(seqs)),
+        "missing_orders": sum((wanted - placed).values()),
+        "users": len(latest),
+        "stale_user_state": len(stale),
+        "feed_missed_users": len(feed_missed),
+        "state_version": order_state.version,
+        "elapsed_s": round(elapsed, 2),
+        "orders_per_s": round(expected / elapsed, 1),
+    }
+    result["ok"] = (len(rows) == expected and stored == expected and not result["duplicate_seqs"]
+                    and not result["missing_orders"] and not stale and not feed_missed)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--orders", type=int, default=300, help="orders per worker")
+    parser.add_argument("--users", type=int, default=20, help="users per worker")
+    result = run(parser.parse_args())
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
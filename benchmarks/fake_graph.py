@@ -0,0 +1,78 @@
+# benchmarks/fake_graph.py
+"""
+Local stand-in for the WhatsApp Graph API `/messages` endpoint.
+
+    python benchmarks/fake_graph.py --port 8089 --latency-ms 40 --error-rate 0.05
+
+Point the app at it with WA_API_BASE=http://127.0.0.1:8089.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 30.0, jitter_ms: float = 20.0, error_rate: float = 0.0):
+    """
+    latency_ms / jitter_ms: simulated processing time per request.
+    error_rate: fraction of requests answered with 429 or 503 (to exercise retries).
+    """
+    app = FastAPI(title="Fake Graph API")
+    app.state.received = 0
+    app.state.errors = 0
+
+    @app.post("/{version}/{phone_id}/messages")
+    async def messages(version: str, phone_id: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+        if error_rate and random.random() < error_rate:
+            app.state.errors += 1
+            status = random.choice([429, 503])
+            return JSONResponse(status_code=status, content={"error": {"code": status}}, headers={"Retry-After": "0"})
+
+        app.state.received += 1
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": body.get("to"), "wa_id": body.get("to")}],
+            "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"received": app.state.received, "errors": app.state.errors}
+
+    return app
+
+
+def serve_in_thread(app, port: int):
+    """Start uvicorn in a daemon thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,80 @@
+# benchmarks/fake_llm.py
+"""
+Local stand-in for the ChatGroq client used by app.py / streamlit_app.py.
+
+OfflineLLM (offline_llm.py) with a configurable latency distribution and
+error rate on top, so load tests see Groq-like timings without touching the
+real Groq API.
+"""
+
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from offline_llm import _WORDS, OfflineLLM, _Chunk, approx_tokens  # noqa: E402
+
+
+class FakeLLM(OfflineLLM):
+    def __init__(self, p50_ms: float = 400.0, p99_ms: float = 1500.0, error_rate: float = 0.0,
+                 tokens_per_sec: float = 500.0, seed: int = None):
+        """
+        Latency is lognormal with the given median and 99th percentile.
+        error_rate: fraction of calls that raise, to exercise error handling.
+        tokens_per_sec: pacing of stream() chunks after the first token.
+        """
+        self.mu = math.log(max(p50_ms, 0.001) / 1000)
+        self.sigma = max(0.0, (math.log(max(p99_ms, p50_ms) / 1000) - self.mu) / 2.326)
+        super().__init__()
+        self.error_rate = error_rate
+        self.tokens_per_sec = tokens_per_sec
+        self._rng = random.Random(seed)
+
+        self.errors = 0
+        self.latencies = []
+
+    def _sample(self) -> float:
+        with self._lock:
+            return self._rng.lognormvariate(self.mu, self.sigma)
+
+    def _account(self, prompt, text, latency=None):
+        super()._account(prompt, text)
+        if latency is not None:
+            with self._lock:
+                self.latencies.append(latency)
+
+    def _maybe_fail(self):
+        with self._lock:
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if fail:
+            raise RuntimeError("fake Groq error")
+
+    def generate(self, batches, tools=None, **kwargs):
+        latency = self._sample()
+        time.sleep(latency)
+        self._maybe_fail()
+        result = super().generate(batches, tools=tools, **kwargs)
+        with self._lock:
+            self.latencies.append(latency)
+        return result
+
+    def stream(self, messages, **kwargs):
+        prompt = self._prompt_of(messages)
+        first = self._sample()
+        time.sleep(first)
+        self._maybe_fail()
+        text = self.reply_for(prompt)
+        words = _WORDS.findall(text) or [text]
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(approx_tokens(word) / self.tokens_per_sec)
+            yield _Chunk(word)
+        self._account(prompt, text, first)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "errors": self.errors}
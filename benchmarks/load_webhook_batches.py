@@ -0,0 +1,146 @@
+# benchmarks/load_webhook_batches.py
+"""
+Load test for batched webhook deliveries.
+
+Posts multi-message WhatsApp payloads (several users, several messages each,
+all mixed together plus status receipts) straight into the FastAPI app over
+ASGI, with the Groq client swapped for a fake that sleeps for a fixed
+latency. Checks that every message is processed exactly once and that each
+user's messages were handled in exactly the order the webhook accepted
+them, and reports throughput.
+
+    python benchmarks/load_webhook_batches.py --payloads 200 --per-payload 20 --users 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_OFFLINE", "1")
+os.environ.setdefault("PIPELINE_MODE", "1")
+os.environ.setdefault("PIPELINE_WORKERS", "32")
+os.environ.setdefault("PIPELINE_QUEUE_SIZE", "100000")
+os.environ.setdefault("ZK_DB_PATH", os.path.join(tempfile.gettempdir(), f"zk_load_{os.getpid()}.db"))
+
+import httpx  # noqa: E402
+
+import app as app_module  # noqa: E402
+from fake_llm import FakeLLM  # noqa: E402
+
+
+def build_payloads(n_payloads: int, per_payload: int, n_users: int, seed: int = 3):
+    rng = random.Random(seed)
+    counters = {}
+    payloads = []
+    for p in range(n_payloads):
+        messages = []
+        for _ in range(per_payload):
+            user = f"92300{rng.randrange(n_users):07d}"
+            counters[user] = counters.get(user, 0) + 1
+            messages.append({
+                "from": user,
+                "id": f"wamid.{p}.{len(messages)}",
+                "type": "text",
+                # unique text per message so neither the router nor the cache short-circuits it
+                "text": {"body": f"salam seq {counters[user]} ref {rng.random():.6f}"},
+            })
+        payloads.append({
+            "object": "whatsapp_business_account",
+            "entry": [{
+                "id": "WABA",
+                "changes": [
+                    {"field": "messages", "value": {"messages": messages[: per_payload // 2]}},
+                    {"field": "messages", "value": {
+                        "messages": messages[per_payload // 2:],
+                        "statuses": [{"id": f"wamid.out.{p}", "status": "delivered"}],
+                    }},
+                ],
+            }],
+        })
+    return payloads, sum(counters.values())
+
+
+async def run(args):
+    app_module.llm.client = FakeLLM(p50_ms=args.llm_ms, p99_ms=args.llm_ms)
+
+    submitted, seen = {}, {}
+    lock = threading.Lock()
+    original_reply = app_module.generate_reply
+    original_submit = app_module.pipeline.submit
+
+    def recording_submit(job):
+        ok = original_submit(job)
+        if ok:
+            submitted.setdefault(job["user"], []).append(job["text"])
+        return ok
+
+    def recording_reply(user, text):
+        with lock:
+            seen.setdefault(user, []).append(text)
+        return original_reply(user, text)
+
+    app_module.pipeline.submit = recording_submit
+    app_module.generate_reply = recording_reply
+    payloads, expected = build_payloads(args.payloads, args.per_payload, args.users)
+
+    await app_module.start_workers()
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def post(payload):
+            async with sem:
+                r = await client.post("/webhook", json=payload)
+                return r.status_code
+
+        # payloads are posted in order, but acks overlap up to --concurrency
+        statuses = []
+        for payload in payloads:
+            statuses.append(asyncio.create_task(post(payload)))
+            await asyncio.sleep(0)
+        statuses = await asyncio.gather(*statuses)
+        acked = time.perf_counter() - started
+
+        await app_module.pipeline.stop(timeout=600)
+        elapsed = time.perf_counter() - started
+
+    processed = sum(len(v) for v in seen.values())
+    out_of_order = [u for u, texts in seen.items() if texts != submitted.get(u)]
+    app_module.store.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(app_module.store.path + suffix):
+            os.remove(app_module.store.path + suffix)
+
+    return {
+        "payloads": len(payloads),
+        "messages": expected,
+        "processed": processed,
+        "http_errors": sum(1 for s in statuses if s >= 400),
+        "users": len(seen),
+        "users_out_of_order": len(out_of_order),
+        "ack_time_s": round(acked, 3),
+        "total_time_s": round(elapsed, 3),
+        "messages_per_sec": round(processed / elapsed, 1) if elapsed else 0.0,
+        "pipeline": app_module.pipeline.stats(),
+        "ok": processed == expected and not out_of_order,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payloads", type=int, default=100)
+    parser.add_argument("--per-payload", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-ms", type=float, default=50.0)
+    result = asyncio.run(run(parser.parse_args()))
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
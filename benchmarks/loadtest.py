@@ -0,0 +1,288 @@
+# benchmarks/loadtest.py
+"""
+Offline load test for app.py.
+
+Replays generated WhatsApp webhook payloads against the FastAPI app (over
+ASGI, in process) at a target request rate. The Groq client is replaced by
+benchmarks/fake_llm.FakeLLM and replies go to the local fake Graph API from
+benchmarks/fake_graph.py, so nothing leaves the machine.
+
+Reports throughput, p50/p95/p99 per stage, error rates and memory growth,
+and writes everything to benchmarks/results/<time>-<commit>.json so runs
+can be compared between commits:
+
+    python benchmarks/loadtest.py --rps 50 --duration 30
+    python benchmarks/loadtest.py --rps 50 --duration 30 --compare benchmarks/results/<baseline>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+MESSAGES = [
+    "menu",
+    "menu dikhao",
+    "delivery to Model Town",
+    "kya aap Millat Road deliver karte hain?",
+    "2 chapli kebab order karna hai",
+    "mujhe ek chicken karahi aur 4 naan chahiye",
+    "order confirm zinger burger",
+    "book a table for 4 at 9pm",
+    "complaint: khana thanda tha",
+    "aaj ki best deal kya hai?",
+    "salam, kaise ho?",
+    "timing kya hai?",
+]
+
+
+class StageTimer:
+    """Collects per-stage latencies from wrapped functions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, stage: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+            if not ok:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                name = stage(*args) if callable(stage) else stage
+                self.record(name, time.perf_counter() - started, ok)
+        return timed
+
+    def summary(self) -> dict:
+        from metrics import percentile
+
+        out = {}
+        with self._lock:
+            for stage, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                out[stage] = {
+                    "count": len(ordered),
+                    "errors": self.errors.get(stage, 0),
+                    **{f"p{p}_ms": round(percentile(ordered, p) * 1000, 2) for p in (50, 95, 99)},
+                }
+        return out
+
+
+def build_payload(i: int, rng: random.Random, users: int) -> dict:
+    user = f"92300{rng.randrange(users):07d}"
+    text = rng.choice(MESSAGES)
+    if rng.random() < 0.3:
+        # unique small talk so part of the traffic always reaches the LLM
+        text = f"{text} #{i}"
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "WABA",
+            "changes": [{"field": "messages", "value": {
+                "messages": [{"from": user, "id": f"wamid.load.{i}", "type": "text", "text": {"body": text}}],
+            }}],
+        }],
+    }
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    os.environ.setdefault("LLM_OFFLINE", "1")
+    os.environ["WA_TOKEN"] = "fake-token"
+    os.environ["WA_PHONE_ID"] = "123456"
+    os.environ["WA_API_BASE"] = f"http://127.0.0.1:{args.graph_port}"
+    os.environ["WA_SEND_RATE"] = str(args.send_rate)
+    os.environ["PIPELINE_MODE"] = "1"
+    os.environ.setdefault("PIPELINE_WORKERS", str(args.workers))
+    os.environ.setdefault("PIPELINE_QUEUE_SIZE", "100000")
+    db_path = os.path.join(tempfile.gettempdir(), f"zk_loadtest_{os.getpid()}.db")
+    os.environ["ZK_DB_PATH"] = db_path
+
+    import httpx
+    from fake_graph import create_app, serve_in_thread
+    from fake_llm import FakeLLM
+
+    serve_in_thread(create_app(args.graph_latency_ms, error_rate=args.graph_error_rate), args.graph_port)
+
+    tracemalloc.start()
+    rss_before = rss_kb()
+
+    import app as app_module
+    import intent_router as router_module
+
+    timer = StageTimer()
+    fake = FakeLLM(p50_ms=args.llm_p50_ms, p99_ms=args.llm_p99_ms, error_rate=args.llm_error_rate, seed=11)
+    fake.generate = timer.wrap("llm", fake.generate)
+    # keep the deadline/breaker wrapper, swap only the client underneath
+    app_module.llm.client = fake
+    app_module.generate_reply = timer.wrap("generate_reply", app_module.generate_reply)
+    app_module.call_tool = timer.wrap(lambda name, *a: f"tool:{name}", app_module.call_tool)
+    router_module.call_tool = timer.wrap(lambda name, *a: f"tool:{name}", router_module.call_tool)
+
+    await app_module.start_workers()
+    heap_start = tracemalloc.get_traced_memory()[0]
+
+    rng = random.Random(5)
+    total = int(args.rps * args.duration)
+    interval = 1.0 / args.rps
+    statuses = []
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+
+        async def post(i):
+            started = time.perf_counter()
+            try:
+                r = await client.post("/webhook", json=build_payload(i, rng, args.users))
+                statuses.append(r.status_code)
+                timer.record("webhook_ack", time.perf_counter() - started, r.status_code < 400)
+            except Exception:
+                statuses.append(0)
+                timer.record("webhook_ack", time.perf_counter() - started, False)
+
+        started = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            # open-loop arrivals: keep the schedule even if the app falls behind
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(post(i)))
+        await asyncio.gather(*tasks)
+        offered = time.perf_counter() - started
+
+        await app_module.stop_workers()
+        elapsed = time.perf_counter() - started
+
+    heap_end, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pipeline = app_module.pipeline.stats()
+    sender = app_module.whatsapp_sender.stats()
+    stages = timer.summary()
+    stages["whatsapp_send"] = {"count": sender["sent"], "errors": sender["failed"], **{
+        k: v for k, v in sender["latency"].items() if k.startswith("p")}}
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "requests": total,
+        "offered_rps": round(total / offered, 2) if offered else 0.0,
+        "completed_per_sec": round(pipeline["processed"] / elapsed, 2) if elapsed else 0.0,
+        "total_time_s": round(elapsed, 3),
+        "error_rates": {
+            "http": round(sum(1 for s in statuses if s >= 400 or s == 0) / max(1, total), 4),
+            "pipeline": round(pipeline["failed"] / max(1, pipeline["submitted"]), 4),
+            "llm": round(fake.errors / max(1, fake.calls + fake.errors), 4),
+            "whatsapp": round(sender["failed"] / max(1, sender["sent"] + sender["failed"]), 4),
+        },
+        "stages": stages,
+        "llm_calls": fake.stats(),
+        "llm_resilience": app_module.llm.stats(),
+        "fast_path": app_module.intent_router.stats(),
+        "memory": {
+            "rss_growth_kb": rss_kb() - rss_before,
+            "heap_growth_kb": round((heap_end - heap_start) / 1024, 1),
+            "heap_peak_kb": round(heap_peak / 1024, 1),
+        },
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Print stage-by-stage deltas; return the list of regressions beyond threshold (fraction)."""
+    regressions = []
+    print(f"\nComparing {current['commit']} against {baseline.get('commit')}:")
+
+    def check(label, new, old, higher_is_better=False):
+        if not old:
+            return
+        delta = (new - old) / old
+        worse = -delta if higher_is_better else delta
+        flag = "  <-- regression" if worse > threshold else ""
+        print(f"  {label:<40} {old:>10} -> {new:>10} ({delta:+.1%}){flag}")
+        if flag:
+            regressions.append(label)
+
+    check("completed_per_sec", current["completed_per_sec"], baseline.get("completed_per_sec"), True)
+    for stage, values in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if key in values and key in old:
+                check(f"{stage}.{key}", values[key], old[key])
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--llm-p50-ms", type=float, default=400.0)
+    parser.add_argument("--llm-p99-ms", type=float, default=1500.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--graph-port", type=int, default=8089)
+    parser.add_argument("--graph-latency-ms", type=float, default=40.0)
+    parser.add_argument("--graph-error-rate", type=float, default=0.0)
+    parser.add_argument("--send-rate", type=float, default=80.0)
+    parser.add_argument("--compare", default="", help="baseline results JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print("Saved", path)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        sys.exit(1 if regressions else 0)
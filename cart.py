@@ -0,0 +1,264 @@
+# cart.py
+"""
+Per-user shopping carts.
+
+Order messages add to the sender's open cart instead of replacing their last
+order. Items can be removed or changed, a delivery area can be set, and
+nothing is stored as an order until the cart is confirmed (see OrderTool).
+
+- LineItem: one __slots__ record per menu item in the cart. It holds the menu
+  item id, the name, the qty, and the unit price at the time the item was
+  added. The name and price are the menu's own objects, so nothing is copied.
+  Lines are looked up by name, which stays valid after a menu reload
+  renumbers the ids.
+- Cart: the lines plus a running subtotal and item count, updated on every
+  change. Totals never rescan the lines. The delivery fee comes from the
+  chosen zone (delivery_zones.quote), so a zone's free_above tracks the
+  subtotal.
+- CartBook: the open carts in one LRU under a single lock. A cart left alone
+  for CART_IDLE_S is dropped, and beyond CART_MAX_OPEN the least recently
+  touched cart goes too.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from delivery_zones import delivery_zones
+from metrics import LatencyRecorder
+
+CART_MAX_OPEN = int(os.getenv("CART_MAX_OPEN", "200000"))
+CART_IDLE_S = float(os.getenv("CART_IDLE_S", "7200"))
+CART_MAX_LINES = int(os.getenv("CART_MAX_LINES", "25"))
+CART_MAX_QTY = int(os.getenv("CART_MAX_QTY", "50"))       # per line
+
+# what an order message does to the cart; a message naming items with none of these adds them
+CART_CLEAR = re.compile(
+    r"\b(?:cart|order)\s+(?:clear|empty|khali|cancel)\b|\b(?:clear|empty|cancel)\s+(?:the\s+|my\s+)?(?:cart|order)\b",
+    re.IGNORECASE,
+)
+CART_REMOVE = re.compile(r"\b(?:remove|delete|minus|cancel|hata\w*|nikal\w*)\b", re.IGNORECASE)
+CART_SET = re.compile(r"\b(?:sirf|only|change|update|instead|badal\w*)\b", re.IGNORECASE)
+CART_VIEW = re.compile(r"\b(?:cart|bill|total)\b", re.IGNORECASE)
+CART_CONFIRM = re.compile(r"\b(?:confirm|checkout|check\s+out|pakka|place\s+(?:the\s+|my\s+)?order)\b", re.IGNORECASE)
+
+
+class LineItem:
+    __slots__ = ("item_id", "name", "qty", "price")
+
+    def __init__(self, item_id: int, name: str, qty: int, price: int):
+        self.item_id = item_id
+        self.name = name
+        self.qty = qty
+        self.price = price
+
+
+class Cart:
+    __slots__ = ("lines", "subtotal", "count", "zone", "updated")
+
+    def __init__(self, now: float = None):
+        self.lines = []         # [LineItem], in the order they were added
+        self.subtotal = 0
+        self.count = 0          # items, summed over line quantities
+        self.zone = None        # delivery_zones zone dict; None for pickup
+        self.updated = time.monotonic() if now is None else now
+
+    def __len__(self):
+        return len(self.lines)
+
+    def find(self, name: str):
+        for line in self.lines:
+            if line.name == name:
+                return line
+        return None
+
+    def set(self, item_id: int, name: str, price: int, qty: int, max_lines: int = CART_MAX_LINES) -> int:
+        """
+        Set an item's quantity (0 removes it), keeping the totals current.
+        Returns the quantity now in the cart; a new line beyond max_lines is refused (0).
+        """
+        return self._apply(self.find(name), item_id, name, price, qty, max_lines)
+
+    def add(self, item_id: int, name: str, price: int, qty: int = 1, max_lines: int = CART_MAX_LINES) -> int:
+        line = self.find(name)
+        return self._apply(line, item_id, name, price, qty + (line.qty if line else 0), max_lines)
+
+    def _apply(self, line, item_id, name, price, qty, max_lines):
+        qty = min(max(0, qty), CART_MAX_QTY)
+        if line is None:
+            if qty == 0 or len(self.lines) >= max_lines:
+                return 0
+            self.lines.append(LineItem(item_id, name, qty, price))
+            self.subtotal += qty * price
+            self.count += qty
+            return qty
+        delta = qty - line.qty
+        self.subtotal += delta * line.price
+        self.count += delta
+        if qty == 0:
+            self.lines.remove(line)
+        else:
+            line.qty = qty
+        return qty
+
+    def quote(self):
+        """delivery_zones.quote() for the chosen zone at the current subtotal, or None for pickup."""
+        return delivery_zones.quote(self.zone, self.subtotal) if self.zone is not None else None
+
+    def fee(self) -> int:
+        quote = self.quote()
+        return quote["fee"] if quote else 0
+
+    def total(self) -> int:
+        return self.subtotal + self.fee()
+
+    def describe(self) -> str:
+        return ", ".join(f"{line.qty} x {line.name}" for line in self.lines)
+
+    def details(self) -> list:
+        """Lines in the {id, item, qty, price, total} shape menu_matcher returns."""
+        return [{"id": line.item_id, "item": line.name, "qty": line.qty, "price": line.price,
+                 "total": line.qty * line.price} for line in self.lines]
+
+
+class CartBook:
+    def __init__(self, max_carts: int = CART_MAX_OPEN, idle_s: float = CART_IDLE_S,
+                 max_lines: int = CART_MAX_LINES):
+        self.max_carts = max(1, max_carts)
+        self.idle_s = idle_s
+        self.max_lines = max_lines
+        self._carts = OrderedDict()     # user -> Cart, least recently touched first
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.confirmed = 0
+        self.cleared = 0
+        self.idle_evictions = 0
+        self.lru_evictions = 0
+        self.ops = LatencyRecorder()
+
+    def __len__(self):
+        return len(self._carts)
+
+    def __contains__(self, user):
+        return self.get(user) is not None
+
+    def _evict(self, now: float):
+        carts = self._carts
+        while carts:
+            user, cart = next(iter(carts.items()))
+            if now - cart.updated > self.idle_s:
+                self.idle_evictions += 1
+            elif len(carts) > self.max_carts:
+                self.lru_evictions += 1
+            else:
+                break
+            del carts[user]
+
+    def _live(self, user, now: float):
+        """The user's cart if it has not gone idle. Called with the lock held."""
+        cart = self._carts.get(user)
+        if cart is not None and now - cart.updated > self.idle_s:
+            del self._carts[user]
+            self.idle_evictions += 1
+            return None
+        return cart
+
+    def _touch(self, user, cart: Cart, now: float):
+        cart.updated = now
+        self._carts.move_to_end(user)
+
+    def get(self, user):
+        """The user's open cart, or None. Does not count as activity."""
+        with self._lock:
+            return self._live(user, time.monotonic())
+
+    def _update(self, user, matches, create: bool, apply):
+        """Run apply(cart, match) for every match; returns (cart, [names it changed])."""
+        started = time.perf_counter()
+        now = time.monotonic()
+        with self._lock:
+            cart = self._live(user, now)
+            if cart is None:
+                if not create:
+                    return None, []
+                cart = self._carts[user] = Cart(now)
+                self.opened += 1
+            changed = [m["item"] for m in matches if apply(cart, m)]
+            if cart.lines:
+                self._touch(user, cart, now)
+            else:
+                del self._carts[user]
+            self._evict(now)
+            self.ops.record(time.perf_counter() - started)
+        return cart, changed
+
+    def add(self, user, matches):
+        """Add menu_matcher matches; returns (cart, [names added]). Items past max_lines are left out."""
+        def apply(cart, m):
+            return cart.add(m["id"], m["item"], m["price"], m["qty"], self.max_lines) > 0
+        return self._update(user, matches, True, apply)
+
+    def set_qty(self, user, matches):
+        """Set each matched item to the match's qty, adding it if missing; returns (cart, [names set])."""
+        def apply(cart, m):
+            return cart.set(m["id"], m["item"], m["price"], m["qty"], self.max_lines) > 0
+        return self._update(user, matches, True, apply)
+
+    def remove(self, user, matches):
+        """Take matched items out of the cart; returns (cart or None, [names removed])."""
+        def apply(cart, m):
+            if cart.find(m["item"]) is None:
+                return False
+            cart.set(m["id"], m["item"], m["price"], 0)
+            return True
+        return self._update(user, matches, False, apply)
+
+    def set_zone(self, user, zone):
+        """Deliver the open cart to `zone` (None for pickup). Returns the cart, or None without one."""
+        now = time.monotonic()
+        with self._lock:
+            cart = self._live(user, now)
+            if cart is not None:
+                cart.zone = zone
+                self._touch(user, cart, now)
+            return cart
+
+    def checkout(self, user):
+        """Close and return the user's cart for confirmation, or None when there is nothing in it."""
+        with self._lock:
+            cart = self._live(user, time.monotonic())
+            if cart is None:
+                return None
+            del self._carts[user]
+            self.confirmed += 1
+            return cart
+
+    def clear(self, user) -> bool:
+        with self._lock:
+            cart = self._live(user, time.monotonic())
+            if cart is None:
+                return False
+            del self._carts[user]
+            self.cleared += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._carts),
+                "max_open": self.max_carts,
+                "idle_s": self.idle_s,
+                "opened": self.opened,
+                "confirmed": self.confirmed,
+                "cleared": self.cleared,
+                "idle_evictions": self.idle_evictions,
+                "lru_evictions": self.lru_evictions,
+                "ops": self.ops.summary(),
+            }
+
+
+# Shared instance used by OrderTool, UpsellTool and DeliveryTool
+carts = CartBook()
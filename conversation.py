@@ -0,0 +1,230 @@
+# conversation.py
+"""
+Per-user conversation memory for the LLM prompt, shared by app.py and
+streamlit_app.py.
+
+Each user gets a ring buffer of their last CONV_MAX_TURNS exchanges
+(customer text + agent reply). Users sit in one LRU with at most
+CONV_MAX_USERS entries, and a conversation idle for CONV_IDLE_S starts over.
+
+`build_prompt()` counts tokens and keeps every prompt under
+CONV_TOKEN_BUDGET. Exchanges that no longer fit, or that drop off the ring,
+are folded oldest first into a short summary: one clipped line per exchange,
+capped at CONV_SUMMARY_TOKENS. The summary is extractive, so compacting never
+costs an LLM call.
+
+Memory lives in each process. With several workers, a user's turns only
+share context while they land on the same worker.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import percentile
+
+CONV_MAX_USERS = int(os.getenv("CONV_MAX_USERS", "10000"))
+CONV_MAX_TURNS = int(os.getenv("CONV_MAX_TURNS", "8"))            # exchanges kept verbatim
+CONV_TOKEN_BUDGET = int(os.getenv("CONV_TOKEN_BUDGET", "1200"))   # whole prompt, system prompt included
+CONV_SUMMARY_TOKENS = int(os.getenv("CONV_SUMMARY_TOKENS", "150"))
+CONV_REPLY_CHARS = int(os.getenv("CONV_REPLY_CHARS", "400"))      # long tool replies (menu) are clipped
+CONV_IDLE_S = float(os.getenv("CONV_IDLE_S", "1800"))
+
+SUMMARY_HEADER = "Earlier in this chat (summary):"
+SUMMARY_CLIP = 60
+
+# a word piece is ~4 characters; punctuation and emoji are a token each
+_TOKENS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SPACE = re.compile(r"\s+")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokenizer-free estimate for Llama-style BPE. It runs a little high on
+    Roman Urdu, which is the safe side for a budget.
+    """
+    return sum((len(t) + 3) // 4 for t in _TOKENS.findall(text or ""))
+
+
+_MARKER_TOKENS = count_tokens("User: \nAgent:")
+_HEADER_TOKENS = count_tokens(SUMMARY_HEADER)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = _SPACE.sub(" ", text or "").strip()
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+class _Exchange:
+    __slots__ = ("text", "tokens")
+
+    def __init__(self, user_text: str, reply: str):
+        self.text = f"User: {user_text.strip()}\nAgent: {_clip(reply, CONV_REPLY_CHARS)}"
+        self.tokens = count_tokens(self.text)
+
+
+class _Conversation:
+    __slots__ = ("exchanges", "turn_tokens", "summary", "summary_tokens", "raw_tokens", "last_seen")
+
+    def __init__(self, max_turns: int):
+        self.exchanges = deque(maxlen=max_turns)
+        self.turn_tokens = 0
+        self.summary = deque()          # (line, tokens), oldest first
+        self.summary_tokens = 0
+        self.raw_tokens = 0             # every exchange ever added: the prompt without compaction
+        self.last_seen = time.monotonic()
+
+
+class ConversationMemory:
+    def __init__(self, max_users: int = CONV_MAX_USERS, max_turns: int = CONV_MAX_TURNS,
+                 token_budget: int = CONV_TOKEN_BUDGET, summary_tokens: int = CONV_SUMMARY_TOKENS,
+                 idle_s: float = CONV_IDLE_S, samples: int = 2048):
+        self.max_users = max(1, max_users)
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.idle_s = idle_s
+        self._users = OrderedDict()     # user -> _Conversation, least recently used first
+        self._lock = threading.Lock()
+        self._system = ("", 0)          # last system prompt seen and its token count
+
+        # prompt sizes with the full history vs what was actually sent
+        self._raw = deque(maxlen=samples)
+        self._sent = deque(maxlen=samples)
+        self.prompts = 0
+        self.compactions = 0
+        self.summary_drops = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ==========================
+    # LRU of users
+    # ==========================
+    def _get(self, user: str, create: bool = True):
+        now = time.monotonic()
+        conv = self._users.get(user)
+        if conv is not None and now - conv.last_seen > self.idle_s:
+            del self._users[user]
+            self.expirations += 1
+            conv = None
+        if conv is None:
+            if not create:
+                return None
+            conv = self._users[user] = _Conversation(self.max_turns)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._users.move_to_end(user)
+        conv.last_seen = now
+        return conv
+
+    def forget(self, user: str):
+        with self._lock:
+            self._users.pop(user, None)
+
+    # ==========================
+    # Compaction
+    # ==========================
+    def _compact(self, conv: _Conversation):
+        """Fold the oldest verbatim exchange into the summary."""
+        exchange = conv.exchanges.popleft()
+        conv.turn_tokens -= exchange.tokens
+        customer, _, agent = exchange.text.partition("\nAgent: ")
+        line = f"- customer: {_clip(customer[len('User: '):], SUMMARY_CLIP)} / agent: {_clip(agent, SUMMARY_CLIP)}"
+        tokens = count_tokens(line)
+        conv.summary.append((line, tokens))
+        conv.summary_tokens += tokens
+        self.compactions += 1
+
+    def _trim_summary(self, conv: _Conversation, limit: int):
+        while conv.summary and conv.summary_tokens > limit:
+            _, tokens = conv.summary.popleft()
+            conv.summary_tokens -= tokens
+            self.summary_drops += 1
+
+    # ==========================
+    # Prompt building
+    # ==========================
+    def build_prompt(self, user: str, system_prompt: str, text: str):
+        """
+        The LLM prompt for `text` with as much of `user`'s history as fits the budget.
+        Returns (prompt, raw_tokens, sent_tokens). raw_tokens is the size the prompt
+        would have with the full uncompacted history.
+        """
+        text = text.strip()
+        with self._lock:
+            if self._system[0] is not system_prompt:
+                self._system = (system_prompt, count_tokens(system_prompt))
+            fixed = self._system[1] + count_tokens(text) + _MARKER_TOKENS
+            conv = self._get(user)
+
+            # history room; the summary header only counts once there is a summary
+            room = self.token_budget - fixed
+            while conv.exchanges and conv.turn_tokens + conv.summary_tokens + _HEADER_TOKENS > room:
+                self._compact(conv)
+            self._trim_summary(conv, min(self.summary_tokens, room - conv.turn_tokens - _HEADER_TOKENS))
+
+            parts = [system_prompt.rstrip("\n")]
+            if conv.summary:
+                parts.append(SUMMARY_HEADER)
+                parts.extend(line for line, _ in conv.summary)
+            parts.extend(e.text for e in conv.exchanges)
+            parts.append(f"User: {text}\nAgent:")
+
+            summary_tokens = conv.summary_tokens + (_HEADER_TOKENS if conv.summary else 0)
+            sent = fixed + summary_tokens + conv.turn_tokens
+            raw = fixed + conv.raw_tokens
+            self.prompts += 1
+            self._raw.append(raw)
+            self._sent.append(sent)
+        return "\n".join(parts), raw, sent
+
+    def has_history(self, user: str) -> bool:
+        with self._lock:
+            conv = self._get(user, create=False)
+            return conv is not None and bool(conv.exchanges or conv.summary)
+
+    def add_turn(self, user: str, user_text: str, reply: str):
+        """Remember one finished exchange; the oldest goes to the summary when the ring is full."""
+        exchange = _Exchange(user_text, reply or "")
+        with self._lock:
+            conv = self._get(user)
+            if len(conv.exchanges) == conv.exchanges.maxlen:
+                self._compact(conv)
+                self._trim_summary(conv, self.summary_tokens)
+            conv.exchanges.append(exchange)
+            conv.turn_tokens += exchange.tokens
+            conv.raw_tokens += exchange.tokens
+
+    # ==========================
+    # Stats
+    # ==========================
+    @staticmethod
+    def _distribution(samples) -> dict:
+        ordered = sorted(samples)
+        out = {f"p{p}": percentile(ordered, p) for p in (50, 95, 99)}
+        out["max"] = ordered[-1] if ordered else 0
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "max_turns": self.max_turns,
+                "token_budget": self.token_budget,
+                "prompts": self.prompts,
+                "compactions": self.compactions,
+                "summary_drops": self.summary_drops,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "prompt_tokens_uncompacted": self._distribution(self._raw),
+                "prompt_tokens_sent": self._distribution(self._sent),
+            }
+
+
+# Shared instance used by the webhook and the Streamlit app
+conversation_memory = ConversationMemory()
@@ -0,0 +1,105 @@
+# dedup.py
+"""
+Idempotency for WhatsApp webhook deliveries.
+
+WhatsApp redelivers a message when our ack is slow, always with the same
+message `id`. SeenMessages remembers recent ids in a bounded TTL + LRU map
+so a redelivery is dropped before any LLM, tool or send work. With
+WEBHOOK_DEDUP_PATH set, ids are also recorded in SQLite so dedup survives a
+restart (and works across processes sharing the file).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "50000"))
+WEBHOOK_DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", str(24 * 3600)))
+WEBHOOK_DEDUP_PATH = os.getenv("WEBHOOK_DEDUP_PATH", "")
+
+
+class SeenMessages:
+    def __init__(self, max_entries: int = WEBHOOK_DEDUP_SIZE, ttl: float = WEBHOOK_DEDUP_TTL,
+                 path: str = WEBHOOK_DEDUP_PATH, prune_every: int = 1000):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._seen = OrderedDict()   # message id -> first seen at
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.checked = 0
+        self.duplicates = 0
+        self.evictions = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS seen_messages (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_seen_messages_seen_at ON seen_messages (seen_at)")
+
+    def first_time(self, message_id: str) -> bool:
+        """Record message_id; True the first time it is seen (within the TTL), False for duplicates."""
+        if not message_id:
+            return True
+        now = time.time()
+        with self._lock:
+            self.checked += 1
+
+            seen_at = self._seen.get(message_id)
+            if seen_at is not None and now - seen_at < self.ttl:
+                self._seen.move_to_end(message_id)
+                self.duplicates += 1
+                return False
+
+            if self._db is not None:
+                cur = self._db.execute(
+                    "INSERT INTO seen_messages (id, seen_at) VALUES (?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET seen_at = excluded.seen_at WHERE seen_at < ?",
+                    (message_id, now, now - self.ttl),
+                )
+                if cur.rowcount == 0:
+                    # another process (or a previous run) already took it
+                    self._remember(message_id, now)
+                    self.duplicates += 1
+                    return False
+                if self.checked % self.prune_every == 0:
+                    self._db.execute("DELETE FROM seen_messages WHERE seen_at < ?", (now - self.ttl,))
+
+            self._remember(message_id, now)
+            return True
+
+    def forget(self, message_id: str):
+        """Un-see an id we accepted but could not process, so WhatsApp's redelivery gets through."""
+        if not message_id:
+            return
+        with self._lock:
+            self._seen.pop(message_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM seen_messages WHERE id = ?", (message_id,))
+
+    def _remember(self, message_id, seen_at):
+        self._seen[message_id] = seen_at
+        self._seen.move_to_end(message_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked": len(self._seen),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "persistent": self._db is not None,
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "evictions": self.evictions,
+            }
+
+
+# Shared instance used by the webhook
+seen_messages = SeenMessages()
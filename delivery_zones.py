@@ -0,0 +1,287 @@
+# delivery_zones.py
+"""
+Delivery zones loaded from delivery_zones.json.
+
+Two ways to find a zone, both cheap enough to run on every message:
+
+- by name: zone names and aliases are normalized ("Model Town, near park"
+  -> "model town near park") and every word n-gram of the message is looked
+  up in a dict, longest first. Only when nothing matches exactly is each
+  unknown word swapped for the zone-name words one typo away from it and
+  the n-grams looked up again. Those words are found through a
+  single-deletion index (every vocab word stored under each of its
+  one-character deletions), so the cost does not grow with the zone count.
+- by coordinates (WhatsApp location pins): polygons are bucketed into a
+  uniform lat/lon grid, so a point is only tested against the few zones
+  whose bounding box overlaps its cell.
+
+Like menu_service, the file is re-read when its mtime changes or on reload().
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from matcher import edit_distance
+from menu_service import normalize_name
+
+ZONES_PATH = os.getenv(
+    "DELIVERY_ZONES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "delivery_zones.json")
+)
+GRID_CELL_DEG = float(os.getenv("DELIVERY_GRID_CELL_DEG", "0.01"))   # ~1.1 km
+
+# "31.4187, 73.0791" as typed by a customer or built from a location message
+COORDINATES = re.compile(r"^\s*(?P<lat>[-+]?\d{1,2}(?:\.\d+)?)\s*[, ]\s*(?P<lon>[-+]?\d{1,3}(?:\.\d+)?)\s*$")
+
+# Abbreviations folded into the spelling used in the data file
+AREA_VARIANTS = {
+    "rd": "road", "st": "street", "chk": "chowk", "chowck": "chowk", "centre": "center",
+    "ngr": "nagar", "mkt": "market", "blk": "block", "ext": "extension",
+}
+
+
+def normalize_area(text: str) -> str:
+    return " ".join(AREA_VARIANTS.get(tok, tok) for tok in normalize_name(text).split())
+
+
+def parse_coordinates(text: str):
+    """(lat, lon) if text is a coordinate pair, else None."""
+    m = COORDINATES.match(text or "")
+    if not m:
+        return None
+    lat, lon = float(m.group("lat")), float(m.group("lon"))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def _deletions(word: str):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _point_in_polygon(lat, lon, ring) -> bool:
+    """Even-odd ray casting on a [(lat, lon), ...] ring."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        yi, xi = ring[i]
+        yj, xj = ring[j]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _area(ring) -> float:
+    s = 0.0
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        s += (ring[j][1] + ring[i][1]) * (ring[j][0] - ring[i][0])
+        j = i
+    return abs(s) / 2
+
+
+class DeliveryZones:
+    def __init__(self, path: str = ZONES_PATH, check_interval: float = 1.0,
+                 cell_deg: float = GRID_CELL_DEG):
+        self.path = path
+        self.check_interval = check_interval
+        self.cell_deg = cell_deg
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._error = None
+
+        self.version = 0
+        self.defaults = {"fee": 70, "eta_min": 40, "free_above": None}
+        self.zones = []
+        self._by_name = {}         # normalized name/alias -> zone
+        self._vocab = set()        # every word used in a name
+        self._by_deletion = {}     # word or one-char deletion of it -> vocab words
+        self._longest_name = 1     # most words in any name, i.e. the longest n-gram worth trying
+        self._grid = {}            # (row, col) -> zones whose bbox touches the cell, smallest first
+
+        self.lookups = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    # ==========================
+    # Loading / invalidation
+    # ==========================
+    def _load(self, mtime):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self._error = "delivery zones file not found"
+            return
+        except Exception as e:
+            self._error = f"error reading delivery zones: {e}"
+            return
+
+        defaults = {**self.defaults, **data.get("defaults", {})}
+        zones, by_name, by_deletion, grid = [], {}, {}, {}
+        longest = 1
+
+        for raw in data.get("zones", []):
+            zone = {
+                "id": raw.get("id") or normalize_area(raw["name"]).replace(" ", "-"),
+                "name": raw["name"],
+                "fee": raw.get("fee", defaults["fee"]),
+                "eta_min": raw.get("eta_min", defaults["eta_min"]),
+                "free_above": raw.get("free_above", defaults["free_above"]),
+                "polygon": None,
+            }
+            zones.append(zone)
+
+            for name in [raw["name"], *raw.get("aliases", [])]:
+                key = normalize_area(name)
+                if key and key not in by_name:
+                    by_name[key] = zone
+                    words = key.split()
+                    longest = max(longest, len(words))
+                    for word in words:
+                        for variant in _deletions(word) | {word}:
+                            by_deletion.setdefault(variant, set()).add(word)
+
+            ring = [tuple(p) for p in raw.get("polygon") or []]
+            if len(ring) >= 3:
+                lats = [p[0] for p in ring]
+                lons = [p[1] for p in ring]
+                zone["polygon"] = ring
+                zone["bbox"] = (min(lats), min(lons), max(lats), max(lons))
+                zone["area"] = _area(ring)
+                r0, c0 = self._cell(zone["bbox"][0], zone["bbox"][1])
+                r1, c1 = self._cell(zone["bbox"][2], zone["bbox"][3])
+                for r in range(r0, r1 + 1):
+                    for c in range(c0, c1 + 1):
+                        grid.setdefault((r, c), []).append(zone)
+
+        # overlapping zones: the smaller (more specific) one wins
+        for bucket in grid.values():
+            bucket.sort(key=lambda z: z["area"])
+
+        self.defaults = defaults
+        self.zones = zones
+        self._by_name = by_name
+        self._by_deletion = by_deletion
+        self._vocab = {w for words in by_deletion.values() for w in words}
+        self._longest_name = longest
+        self._grid = grid
+        self._error = None
+        self._mtime = mtime
+        self.version += 1
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if force or mtime is None or mtime != self._mtime:
+                self._load(mtime)
+
+    def reload(self) -> dict:
+        """Force a re-read of the zones file (e.g. from an admin endpoint)."""
+        self._refresh(force=True)
+        return self.stats()
+
+    def _cell(self, lat, lon):
+        return int(lat // self.cell_deg), int(lon // self.cell_deg)
+
+    # ==========================
+    # Lookups
+    # ==========================
+    def find(self, text: str):
+        """Zone named anywhere in text ("delivery to model town near park"), or None."""
+        self._refresh()
+        self.lookups += 1
+        tokens = normalize_area(text).split()
+        if not tokens:
+            self.misses += 1
+            return None
+
+        zone = self._lookup_ngrams(tokens)
+        if zone is not None:
+            return zone
+
+        zone = self._lookup_with_typos(tokens)
+        if zone is None:
+            self.misses += 1
+        else:
+            self.fuzzy_hits += 1
+        return zone
+
+    def _lookup_ngrams(self, tokens):
+        by_name = self._by_name
+        for n in range(min(self._longest_name, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                zone = by_name.get(" ".join(tokens[i:i + n]))
+                if zone is not None:
+                    return zone
+        return None
+
+    def _lookup_with_typos(self, tokens):
+        for i, token in enumerate(tokens):
+            if token in self._vocab or len(token) < 4:
+                continue
+            for word in self._near_words(token):
+                zone = self._lookup_ngrams(tokens[:i] + [word] + tokens[i + 1:])
+                if zone is not None:
+                    return zone
+        return None
+
+    def _near_words(self, token: str):
+        """Vocab words one edit (substitution, insertion, deletion or swap) away from token."""
+        candidates = set()
+        for variant in _deletions(token) | {token}:
+            candidates |= self._by_deletion.get(variant, set())
+        return [w for w in candidates if edit_distance(token, w, 1) <= 1]
+
+    def locate(self, lat: float, lon: float):
+        """Zone whose polygon contains the point, or None."""
+        self._refresh()
+        self.lookups += 1
+        for zone in self._grid.get(self._cell(lat, lon), ()):
+            s, w, n, e = zone["bbox"]
+            if s <= lat <= n and w <= lon <= e and _point_in_polygon(lat, lon, zone["polygon"]):
+                return zone
+        self.misses += 1
+        return None
+
+    def resolve(self, text: str):
+        """Zone for a coordinate pair or an area name."""
+        point = parse_coordinates(text)
+        if point is not None:
+            return self.locate(*point)
+        return self.find(text)
+
+    def quote(self, zone: dict, subtotal: int = None) -> dict:
+        """Fee and ETA for a zone; free when the order subtotal reaches the zone's free_above."""
+        fee = zone["fee"]
+        if subtotal is not None and zone.get("free_above") is not None and subtotal >= zone["free_above"]:
+            fee = 0
+        return {"zone": zone["id"], "name": zone["name"], "fee": fee, "eta_min": zone["eta_min"]}
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "zones": len(self.zones),
+            "names": len(self._by_name),
+            "grid_cells": len(self._grid),
+            "lookups": self.lookups,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "error": self._error,
+        }
+
+
+# Shared instance used by the delivery tool and the API
+delivery_zones = DeliveryZones()
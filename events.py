@@ -0,0 +1,303 @@
+# events.py
+"""
+Live order, reservation and complaint events for dashboards.
+
+Every row handed to storage.Store is also published on `event_bus`, a
+bounded broadcast ring buffer. Producers only append to the ring and wake
+sleeping readers, so they never wait on a subscriber. Each subscriber keeps
+its own cursor into the ring:
+
+- GET /events streams the ring as Server-Sent Events. Event ids are
+  "<boot>-<n>", so a reconnect with Last-Event-ID resumes exactly where it
+  stopped, and an id from an earlier run of the server is recognised.
+- A subscriber whose cursor has been overwritten (it fell more than
+  `capacity` events behind) gets a single `reset` event and is disconnected.
+  It should reload a snapshot (GET /orders/latest) and reconnect.
+- After waking, a stream waits `linger` seconds so a burst of events goes
+  out as one write instead of one wake-up and write per event.
+
+SSERelay follows another server's /events from a thread and republishes into
+a local bus. The Streamlit dashboard uses it to show the webhook's live
+events.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from itertools import islice
+
+from log_utils import get_logger, log_event
+
+logger = get_logger("events")
+
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "2000"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "100"))
+EVENTS_HEARTBEAT_S = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+EVENTS_BATCH = int(os.getenv("EVENTS_BATCH", "200"))
+EVENTS_LINGER_S = float(os.getenv("EVENTS_LINGER_S", "0.05"))   # gather a burst into one write
+
+Event = namedtuple("Event", "seq kind data ts frame")
+
+
+class EventBus:
+    def __init__(self, capacity: int = EVENTS_BUFFER_SIZE, max_subscribers: int = EVENTS_MAX_SUBSCRIBERS):
+        self.capacity = max(1, capacity)
+        self.max_subscribers = max_subscribers
+        # new ids on every start, so a Last-Event-ID from a previous run is never mistaken for ours
+        self.boot = format(int(time.time() * 1000), "x")
+        self._events = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._async_waiters = {}   # event loop -> asyncio.Events of its sleeping SSE streams
+        self.last_seq = 0
+
+        self.published = 0
+        self.subscribers = 0
+        self.rejected = 0
+        self.resets = 0
+        self.dropped = 0
+
+    # ==========================
+    # Producers
+    # ==========================
+    def publish(self, kind: str, data: dict) -> int:
+        """Append one event and wake the readers; never blocks on a subscriber."""
+        ts = time.time()
+        payload = json.dumps({**data, "ts": ts}, ensure_ascii=False, default=str)
+        with self._changed:
+            self.last_seq += 1
+            seq = self.last_seq
+            # the SSE frame is built once here, not once per subscriber
+            frame = f"id: {self.event_id(seq)}\nevent: {kind}\ndata: {payload}\n\n"
+            self._events.append(Event(seq, kind, data, ts, frame))
+            self.published += 1
+            self._changed.notify_all()
+            waiters, self._async_waiters = self._async_waiters, {}
+        # one wake-up per event loop, however many streams sleep on it; streams that wake
+        # later pick up every event published in between
+        for loop, flags in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_set_all, flags)
+            except RuntimeError:
+                pass   # that loop is already closed
+        return seq
+
+    # ==========================
+    # Readers
+    # ==========================
+    def event_id(self, seq: int) -> str:
+        return f"{self.boot}-{seq}"
+
+    def parse_id(self, event_id: str):
+        """Seq for an id issued by this bus, or None if it is malformed or from another run."""
+        boot, _, seq = (event_id or "").strip().rpartition("-")
+        if boot != self.boot or not seq.isdigit() or int(seq) > self.last_seq:
+            return None
+        return int(seq)
+
+    def read(self, after: int, limit: int = EVENTS_BATCH):
+        """
+        Events with seq > `after`, oldest first, at most `limit`.
+        Returns (events, lagged). lagged=True means some events after `after` have been
+        overwritten already, so the reader has to reload a snapshot.
+        """
+        with self._lock:
+            if after >= self.last_seq:
+                return [], False
+            oldest = self._events[0].seq
+            if after < oldest - 1:
+                return [], True
+            start = after - oldest + 1
+            return list(islice(self._events, start, start + limit)), False
+
+    def wait(self, after: int, timeout: float = None) -> bool:
+        """Block a thread until an event newer than `after` exists."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.last_seq > after, timeout)
+
+    async def wait_async(self, after: int, timeout: float = None) -> bool:
+        """Same as wait(), without blocking the event loop."""
+        flag = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.last_seq > after:
+                return True
+            self._async_waiters.setdefault(loop, []).append(flag)
+        try:
+            await asyncio.wait_for(flag.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if not flag.is_set():
+                with self._lock:
+                    flags = self._async_waiters.get(loop)
+                    if flags is not None and flag in flags:
+                        flags.remove(flag)
+
+    # ==========================
+    # Server-Sent Events
+    # ==========================
+    def _reset_frame(self, reason: str) -> str:
+        data = json.dumps({"reason": reason, "last_id": self.event_id(self.last_seq)})
+        return f"id: {self.event_id(self.last_seq)}\nevent: reset\ndata: {data}\n\n"
+
+    def has_room(self) -> bool:
+        """Is there a subscriber slot free? Holds nothing; sse() takes the slot when it starts."""
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            return True
+
+    def try_subscribe(self) -> bool:
+        """Reserve a subscriber slot; False once max_subscribers streams are open."""
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            self.subscribers += 1
+            return True
+
+    async def sse(self, last_event_id: str = None, kinds=None, heartbeat: float = EVENTS_HEARTBEAT_S,
+                  linger: float = EVENTS_LINGER_S):
+        """
+        SSE frames for one subscriber. The subscriber slot is taken when the stream
+        starts and released when it ends, so a response that is never started holds
+        none. Without last_event_id the stream starts at the newest event. An id from an
+        earlier run gets a `reset` event first; one that is no longer buffered gets
+        `reset` and the stream ends (its id lets the client resume from there).
+        """
+        if not self.try_subscribe():
+            # the last slot went to another stream after has_room(): end at once, and the
+            # client reconnects after the retry delay
+            yield "retry: 3000\n\n"
+            return
+        try:
+            yield "retry: 3000\n\n"
+            cursor = self.last_seq
+            if last_event_id:
+                resumed = self.parse_id(last_event_id)
+                if resumed is None:
+                    self.resets += 1
+                    yield self._reset_frame("unknown_id")
+                else:
+                    cursor = resumed
+
+            while True:
+                events, lagged = self.read(cursor)
+                if lagged:
+                    # too slow to keep up with the ring: tell it to re-sync, then let it go
+                    self.dropped += 1
+                    yield self._reset_frame("lagged")
+                    return
+                if events:
+                    cursor = events[-1].seq
+                    frames = "".join(e.frame for e in events if kinds is None or e.kind in kinds)
+                    if frames:
+                        yield frames
+                    continue
+                if not await self.wait_async(cursor, heartbeat):
+                    yield ": keep-alive\n\n"
+                elif linger:
+                    await asyncio.sleep(linger)
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered": len(self._events),
+                "capacity": self.capacity,
+                "last_id": self.event_id(self.last_seq),
+                "published": self.published,
+                "subscribers": self.subscribers,
+                "rejected": self.rejected,
+                "resets": self.resets,
+                "dropped_slow": self.dropped,
+            }
+
+
+def _set_all(flags):
+    for flag in flags:
+        flag.set()
+
+
+# ==========================
+# Relay from a remote /events stream
+# ==========================
+class SSERelay:
+    """
+    Follows `url` (another server's /events) in a daemon thread and republishes every
+    event into `bus`. Reconnects with Last-Event-ID; a remote `reset` is passed on as-is.
+    """
+
+    def __init__(self, url: str, bus, reconnect_s: float = 3.0, name: str = "sse-relay"):
+        self.url = url
+        self.bus = bus
+        self.reconnect_s = reconnect_s
+        self.last_id = None
+        self.connected = False
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        import httpx   # only needed when a relay is configured
+
+        while not self._stop.is_set():
+            headers = {"Accept": "text/event-stream"}
+            if self.last_id:
+                headers["Last-Event-ID"] = self.last_id
+            try:
+                with httpx.stream("GET", self.url, headers=headers, timeout=httpx.Timeout(5.0, read=None)) as resp:
+                    resp.raise_for_status()
+                    self.connected = True
+                    self._consume(resp.iter_lines())
+            except Exception as e:
+                self.errors += 1
+                log_event(logger, "events.relay_failed", logging.WARNING, url=self.url, error=repr(e))
+            self.connected = False
+            self._stop.wait(self.reconnect_s)
+
+    def _consume(self, lines):
+        event_id, kind, data = None, "message", []
+        for line in lines:
+            if self._stop.is_set():
+                return
+            if line == "":
+                if data:
+                    self.bus.publish(kind, json.loads("\n".join(data)))
+                if event_id:
+                    self.last_id = event_id
+                event_id, kind, data = None, "message", []
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "id":
+                    event_id = value
+                elif field == "event":
+                    kind = value
+                elif field == "data":
+                    data.append(value)
+
+    def stats(self) -> dict:
+        return {"url": self.url, "connected": self.connected, "last_id": self.last_id, "errors": self.errors}
+
+
+# Shared instance used by storage.Store, app.py and streamlit_app.py
+event_bus = EventBus()
@@ -0,0 +1,189 @@
+# intent_router.py
+"""
+Deterministic fast path in front of the LLM.
+
+Obvious requests ("menu", "delivery to Model Town", "complaint ...",
+"2 chapli kebab order karna hai") are matched by compiled rules and sent
+straight to the tools in agents_tools, skipping the Groq round trip.
+Anything ambiguous or conversational returns None and goes to the LLM.
+
+When the LLM is unavailable (breaker open, deadline hit), `fallback()`
+answers every message locally: the same rules at any confidence, then
+looser keywords, then a short help text listing what works offline.
+"""
+
+import re
+import threading
+import time
+
+from agents_tools import call_tool
+from cart import CART_REMOVE, CART_SET, carts
+from delivery_zones import COORDINATES, delivery_zones
+from matcher import menu_matcher
+
+# (intent, pattern, confidence, argument group)
+RULES = [
+    ("menu", re.compile(
+        r"^\s*(?:show\s+(?:me\s+)?(?:the\s+)?|send\s+(?:me\s+)?(?:the\s+)?)?menu"
+        r"(?:\s+(?:card|please|plz|dikhao|dikhayen|dikha\s+do|bhejo|bhej\s+do|send\s+karo|kya\s+hai))?\s*[?!.]*\s*$"
+        r"|^\s*(?:what(?:'s|\s+is)\s+on\s+the\s+menu|kya\s+kya\s+(?:milta|available)\s+hai)\s*[?!.]*\s*$",
+        re.IGNORECASE), 0.97, None),
+    ("delivery", re.compile(
+        r"^\s*(?:is\s+)?(?:home\s+)?delivery\s+(?:to|in|at|for|available\s+(?:in|to|at))\s+(?P<area>[\w\s,.'-]{2,60}?)\s*[?!.]*\s*$"
+        r"|^\s*(?P<area2>[\w\s,.'-]{2,60}?)\s+(?:mein|me|main|tak)\s+delivery\s+(?:hoti\s+hai|hai|milegi|ho\s+jayegi|available\s+hai)?\s*[?!.]*\s*$",
+        re.IGNORECASE), 0.95, "area"),
+    # bare "lat,lon" (WhatsApp location pins arrive in this form)
+    ("delivery", COORDINATES, 0.97, None),
+    ("complaint", re.compile(
+        r"^\s*(?:complaint|complain|shikayat|shikayet)\b[\s:,-]*(?P<details>.*)$",
+        re.IGNORECASE | re.DOTALL), 0.95, "details"),
+    ("reserve", re.compile(
+        r"^\s*(?:please\s+)?(?:reserve\s+(?:a\s+)?table|book\s+(?:a\s+)?table|table\s+(?:book|reserve)\s+(?:kar\s+do|karni\s+hai|karna\s+hai|karo))\b"
+        r"|^\s*(?:is\s+(?:there\s+)?(?:a\s+)?)?table\s+for\s+\w+\b.*\b(?:free|available|khali|milegi)\b",
+        re.IGNORECASE), 0.93, None),
+    # bare cart commands: "confirm", "order confirm kar do", "mera cart dikhao", "cart clear"
+    ("order", re.compile(
+        r"^\s*(?:(?:my|mera|meri)\s+)?(?:(?:order|cart)\s+)?(?:confirm|checkout|check\s+out|pakka)"
+        r"(?:\s+(?:kar\s*do|karo|karein|please|plz))?\s*[?!.]*\s*$"
+        r"|^\s*(?:show\s+)?(?:(?:my|mera)\s+)?cart(?:\s+(?:dikhao|dikha\s+do|show|clear|khali\s+kar\s*do))?\s*[?!.]*\s*$",
+        re.IGNORECASE), 0.93, None),
+]
+
+# an order message needs an explicit ordering verb plus a resolvable menu item
+ORDER_VERBS = re.compile(
+    r"\b(?:order|chahiye|chahye|chaiye|bhej\s*do|bhejo|de\s*do|dedo|i\s+want|i'd\s+like|confirm)\b",
+    re.IGNORECASE,
+)
+
+
+# looser keyword rules, only used by fallback() when the LLM is down
+FALLBACK_KEYWORDS = [
+    ("menu", re.compile(r"\b(?:menu|price|prices|rate|rates|kya\s+milta|items?)\b", re.I)),
+    ("reserve", re.compile(r"\b(?:reserve|reservation|booking|book|table)\b", re.I)),
+    ("complaint", re.compile(r"\b(?:complaint|complain|shikayat|issue|problem|thanda|late|kharab)\b", re.I)),
+    ("delivery", re.compile(r"\b(?:deliver|delivery|charges?|area)\b", re.I)),
+    ("upsell", re.compile(r"\b(?:deal|deals|recommend|suggest|best|special)\b", re.I)),
+]
+
+FALLBACK_HELP = (
+    "🙏 Hamara assistant abhi thora busy hai, lekin yeh kaam abhi bhi ho sakte hain:\n"
+    "• 'menu' — menu dekhein\n"
+    "• '2 chicken karahi order' — cart mein add karein, phir 'confirm'\n"
+    "• 'table for 4 at 9pm' — table book karein\n"
+    "• 'delivery to Model Town' — delivery check karein\n"
+    "• 'complaint: ...' — shikayat darj karein"
+)
+
+
+class IntentRouter:
+    def __init__(self, rules=RULES, min_confidence: float = 0.9, default_llm_ms: float = 800.0):
+        self.rules = rules
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+
+        self.total = 0
+        self.hits = 0
+        self.by_intent = {}
+        self.route_time = 0.0
+        self.fallbacks = 0
+        self.fallback_by_intent = {}
+        # running average of real LLM latency, used to estimate time saved per hit
+        self.llm_avg_ms = default_llm_ms
+        self.llm_samples = 0
+
+    def classify(self, text: str, user: str = None):
+        """
+        Return (intent, confidence, argument) for a high-confidence match, else None.
+        With `user`, "naan hata do" / "sirf 1 karahi" count as orders while their cart is open.
+        """
+        if not text:
+            return None
+
+        for intent, pattern, confidence, group in self.rules:
+            m = pattern.search(text)
+            if not m:
+                continue
+            arg = text
+            if group:
+                arg = (m.group(group) or m.groupdict().get(f"{group}2") or text).strip()
+            return intent, confidence, arg
+
+        if ORDER_VERBS.search(text) or (
+                user is not None and (CART_REMOVE.search(text) or CART_SET.search(text)) and user in carts):
+            matches = menu_matcher.match(text)
+            if matches and all(m["confident"] for m in matches):
+                return "order", 0.9, text
+        return None
+
+    def route(self, text: str, user: str):
+        """Dispatch an obvious request straight to its tool. Returns the reply or None."""
+        started = time.perf_counter()
+        result = self.classify(text, user)
+        reply = None
+        if result and result[1] >= self.min_confidence:
+            intent, _, arg = result
+            # complaint/reserve tools want the full message, not just the captured part
+            reply = call_tool(intent, text if intent in ("complaint", "reserve", "order", "upsell") else arg, user)
+
+        with self._lock:
+            self.total += 1
+            self.route_time += time.perf_counter() - started
+            if reply is not None:
+                self.hits += 1
+                self.by_intent[result[0]] = self.by_intent.get(result[0], 0) + 1
+        return reply
+
+    def fallback(self, text: str, user: str) -> str:
+        """Rule-based answer for when the LLM cannot be reached. Always returns a reply."""
+        intent, arg = self._fallback_intent(text, user)
+        reply = None
+        if intent is not None:
+            reply = call_tool(intent, text if intent in ("complaint", "reserve", "order", "upsell") else arg, user)
+        with self._lock:
+            self.fallbacks += 1
+            key = intent if reply is not None else "help"
+            self.fallback_by_intent[key] = self.fallback_by_intent.get(key, 0) + 1
+        return reply if reply is not None else FALLBACK_HELP
+
+    def _fallback_intent(self, text: str, user: str = None):
+        result = self.classify(text, user)
+        if result is not None:
+            return result[0], result[2]
+        if menu_matcher.match(text):
+            # naming a dish without an ordering verb is a question about it, not an order
+            return ("order" if ORDER_VERBS.search(text) else "menu"), text
+        for intent, pattern in FALLBACK_KEYWORDS:
+            if pattern.search(text):
+                return intent, text
+        if delivery_zones.find(text) is not None:
+            return "delivery", text
+        return None, text
+
+    def record_llm_latency(self, seconds: float):
+        """Feed real Groq latencies so the 'time saved' estimate tracks reality."""
+        with self._lock:
+            self.llm_samples += 1
+            ms = seconds * 1000
+            if self.llm_samples == 1:
+                self.llm_avg_ms = ms
+            else:
+                self.llm_avg_ms += (ms - self.llm_avg_ms) * 0.1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "messages": self.total,
+                "fast_path_hits": self.hits,
+                "hit_rate": round(self.hits / self.total, 4) if self.total else 0.0,
+                "by_intent": dict(self.by_intent),
+                "llm_calls_saved": self.hits,
+                "avg_llm_ms": round(self.llm_avg_ms, 1),
+                "est_ms_saved": round(self.hits * self.llm_avg_ms, 1),
+                "avg_route_us": round(self.route_time / self.total * 1e6, 1) if self.total else 0.0,
+                "fallback_replies": self.fallbacks,
+                "fallback_by_intent": dict(self.fallback_by_intent),
+            }
+
+
+# Shared instance used by the webhook and the Streamlit UI
+intent_router = IntentRouter()
@@ -0,0 +1,164 @@
+# llm_cache.py
+"""
+Response cache in front of the Groq client, shared by app.py and
+streamlit_app.py.
+
+Keys are the normalized user text plus a hash of the system prompt and
+model, so editing the prompt or switching models never serves stale
+answers. Memory is bounded (LRU eviction) and every entry has a TTL. With
+LLM_CACHE_PATH set, entries are also written to a small SQLite file so the
+cache survives restarts and is shared between processes.
+
+Turns that carry per-user state (orders, reservations, complaints) bypass
+the cache entirely.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+_PUNCT = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACE = re.compile(r"\s+")
+
+# Messages that touch per-user state must always reach the model/tools
+STATEFUL = re.compile(
+    r"\b(?:order|cart|checkout|confirm|cancel|reserve|reservation|book|booking|table|complaint|complain|shikayat|"
+    r"my|mera|meri|mere)\b",
+    re.IGNORECASE,
+)
+
+# Tool calls whose replies depend on the user; never cache model output that triggers them
+STATEFUL_TOOL_CALL = re.compile(r"TOOL_CALL:\s*(?:order|reserve|complaint)\b")
+
+
+def normalize_text(text: str) -> str:
+    """'Menu??  ' and 'menu' share a cache entry."""
+    return _SPACE.sub(" ", _PUNCT.sub(" ", (text or "").lower())).strip()
+
+
+def prompt_version(system_prompt: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\0{system_prompt}".encode("utf-8")).hexdigest()[:12]
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, path: str = LLM_CACHE_PATH):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # drop rows that expired while the process was down
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+
+    @staticmethod
+    def make_key(text: str, version: str) -> str:
+        return hashlib.sha1(f"{version}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def should_bypass(text: str) -> bool:
+        return bool(STATEFUL.search(text or ""))
+
+    # ==========================
+    # Lookup / store
+    # ==========================
+    def get(self, text: str, version: str):
+        """Cached reply for this text, or None (miss, expired or stateful turn)."""
+        if self.should_bypass(text):
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        key = self.make_key(text, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, version: str, value: str):
+        if not value or self.should_bypass(text) or STATEFUL_TOOL_CALL.search(value):
+            return
+        key = self.make_key(text, version)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Shared instance used by the webhook and the Streamlit UI
+response_cache = ResponseCache()
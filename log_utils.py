@@ -0,0 +1,93 @@
+# log_utils.py
+"""
+Structured, sampled logging for the hot path.
+
+Records are formatted as one JSON object per line and written by a
+background QueueListener thread, so a request only pays for enqueueing a
+record. High-volume events are logged with sample=True and only a fraction
+(LOG_SAMPLE_RATE) of them is kept; warnings and errors are never sampled.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        extra = " ".join(f"{k}={v}" for k, v in fields.items())
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        return f"{stamp} {record.levelname:<7} {record.name}: {record.getMessage()} {extra}".rstrip()
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every WARNING+ record; keep sample=True records below that with probability `rate`."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, "sample", False):
+            return True
+        return random.random() < self.rate
+
+
+def _configure():
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    q = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(q)
+    # drop sampled-out records before they are even queued
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger("zk")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(q, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    _configure()
+    return logging.getLogger(f"zk.{name}")
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, sample: bool = False, **fields):
+    """logger.log with structured fields; sample=True marks high-volume events that may be dropped."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields, "sample": sample})
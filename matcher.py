@@ -0,0 +1,363 @@
+# matcher.py
+"""
+Fuzzy menu-item matcher.
+
+Resolves free-text messages such as "2 chapli kabab aur ek kabli pulao" to
+menu items with quantities and prices. The index is precomputed from
+menu_service and rebuilt only when the menu version changes:
+
+- every item name is normalized (Roman Urdu spelling variants folded to one
+  canonical token) and split into tokens weighted by IDF,
+- token -> item postings answer "which items contain this token",
+- character trigram -> token postings give typo candidates, which are then
+  rescored with a bounded edit distance.
+"""
+
+import math
+import re
+
+from menu_service import menu_service, normalize_name
+
+# Roman Urdu / common spelling variants -> canonical token
+VARIANTS = {
+    "kabab": "kebab", "kabob": "kebab", "kebob": "kebab", "kabap": "kebab", "kbab": "kebab",
+    "karai": "karahi", "karhai": "karahi", "kadai": "karahi", "kadhai": "karahi", "karahii": "karahi", "krahi": "karahi",
+    "tika": "tikka", "teeka": "tikka", "tikkah": "tikka",
+    "pulav": "pulao", "palao": "pulao", "pilau": "pulao", "pullao": "pulao", "pilaf": "pulao",
+    "nan": "naan", "nana": "naan",
+    "parata": "paratha", "parotha": "paratha", "prantha": "paratha", "paronta": "paratha", "parhata": "paratha",
+    "chiken": "chicken", "chikken": "chicken", "murgh": "chicken", "murgi": "chicken", "murghi": "chicken",
+    "gosht": "mutton", "mutten": "mutton", "bakra": "mutton",
+    "gaye": "beef", "gai": "beef",
+    "boti": "boti", "botti": "boti", "bothi": "boti",
+    "saji": "sajji", "sajjii": "sajji",
+    "namkeen": "namkeen", "namkin": "namkeen", "nimkeen": "namkeen", "namkeeen": "namkeen",
+    "peshawri": "peshawari", "pishawari": "peshawari", "peshaweri": "peshawari",
+    "afgani": "afghani", "afghanii": "afghani",
+    "kabli": "kabuli", "kaabuli": "kabuli",
+    "shinwri": "shinwari", "shinwary": "shinwari",
+    "kehwa": "kahwa", "qehwa": "kahwa", "qahwa": "kahwa", "kahva": "kahwa", "kawa": "kahwa",
+    "dodh": "doodh", "dudh": "doodh", "doodhpatti": "doodh", "pati": "patti",
+    "chai": "doodh",
+    "dal": "daal", "dhal": "daal",
+    "burgur": "burger", "burgar": "burger", "zingr": "zinger", "zingar": "zinger",
+    "fry": "fries", "chips": "fries",
+    "kulfee": "kulfi", "qulfi": "kulfi", "icecream": "ice",
+    "raitha": "raita", "rayta": "raita",
+    "salaad": "salad",
+    "coke": "drink", "pepsi": "drink", "sprite": "drink", "drinks": "drink", "soda": "drink",
+    "roll": "roll", "rol": "roll",
+    "dumbah": "dumba", "dumbaa": "dumba",
+    "pukhat": "pukht", "pukt": "pukht",
+}
+
+# Quantity words (English + Roman Urdu)
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "a": 1, "an": 1,
+    "ek": 1, "aik": 1, "do": 2, "teen": 3, "tin": 3, "char": 4, "chaar": 4,
+    "panch": 5, "paanch": 5, "chay": 6, "chhe": 6, "che": 6, "saat": 7, "sat": 7,
+    "aath": 8, "ath": 8, "nau": 9, "das": 10, "dus": 10,
+    "single": 1, "double": 2,
+}
+
+# Words that split a message into separate line items
+SEPARATORS = {"aur", "and", "or", "plus", "with", "sath", "saath", "bhi", "also", "n"}
+
+# Filler words that never name an item
+STOPWORDS = {
+    "order", "confirm", "please", "plz", "pls", "mujhe", "muje", "hamein", "humein", "chahiye",
+    "chahye", "chaiye", "dena", "dedo", "de", "kar", "karo", "kardo", "karna", "hai", "hain",
+    "ka", "ki", "ke", "i", "want", "would", "like", "to", "get", "me", "give", "the", "bhai",
+    "sir", "jee", "ji", "yar", "yaar", "send", "bhej", "bhejo", "dijiye", "for", "of", "wala",
+    "wali", "wale", "plate", "plates", "piece", "pieces", "pcs", "pc", "x", "add", "bhejdo",
+    "hata", "hatao", "nikal", "nikalo", "remove",
+}
+
+# "do" after these is the imperative ("bhej do", "de do", "hata do"), not the number two
+GIVE_VERBS = {"bhej", "de", "kar", "le", "dila", "laga", "hata", "nikal", "remove"}
+
+# A match is "confident" (added to the cart without asking) when it covers most of the
+# item name, or when it is the only candidate / clearly ahead of the runner-up ("burger"
+# -> Zinger Burger). Below MATCH_FLOOR it is a guess either way; "kebab" (Afghani Kabab
+# vs Chapli Kebab) stays ambiguous and OrderTool asks.
+CONFIDENT_SCORE = 0.75
+MATCH_FLOOR = 0.55
+MATCH_MARGIN = 0.15
+
+# Item-name tokens that carry no identity of their own
+ITEM_NOISE = {"pcs", "pc", "2", "1"}
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+_QTY_SUFFIX = re.compile(r"^(\d+)x$|^x(\d+)$")
+
+
+def edit_distance(a: str, b: str, max_dist: int = 2) -> int:
+    """Optimal-string-alignment distance with an early exit once it exceeds max_dist."""
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_dist:
+        return max_dist + 1
+
+    prev2 = None
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        row_min = cur[0]
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > max_dist:
+            return max_dist + 1
+        prev2, prev = prev, cur
+    return prev[lb]
+
+
+def _trigrams(token: str):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def canonical_tokens(text: str) -> list:
+    """Normalize text and fold spelling variants."""
+    return [VARIANTS.get(t, t) for t in _TOKEN.findall(normalize_name(text))]
+
+
+class MenuMatcher:
+    def __init__(self, menu=menu_service, min_score: float = 0.5, cache_size: int = 4096):
+        self.menu = menu
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self._version = None
+
+        self._items = []
+        self._item_tokens = []      # item id -> {token: weight}
+        self._item_weight = []      # item id -> total weight
+        self._postings = {}         # token -> [item ids]
+        self._trigram_index = {}    # trigram -> {vocab tokens}
+        self._idf = {}
+        self._resolve_cache = {}    # message token -> [(vocab token, similarity)]
+
+    # ==========================
+    # Index build
+    # ==========================
+    def _ensure_index(self):
+        items = self.menu.all_items()
+        if self._version == self.menu.version:
+            return
+
+        item_tokens = []
+        postings = {}
+        for item in items:
+            toks = [t for t in canonical_tokens(item["name"]) if t not in ITEM_NOISE]
+            item_tokens.append(toks)
+            for t in set(toks):
+                postings.setdefault(t, []).append(item["id"])
+
+        n = max(1, len(items))
+        idf = {t: math.log(1 + n / len(ids)) for t, ids in postings.items()}
+
+        trigram_index = {}
+        for t in postings:
+            for g in _trigrams(t):
+                trigram_index.setdefault(g, set()).add(t)
+
+        self._items = items
+        self._postings = postings
+        self._idf = idf
+        self._item_tokens = [{t: idf[t] for t in set(toks)} for toks in item_tokens]
+        self._item_weight = [sum(w.values()) or 1.0 for w in self._item_tokens]
+        self._trigram_index = trigram_index
+        self._resolve_cache = {}
+        self._version = self.menu.version
+
+    # ==========================
+    # Token resolution (exact, then trigram candidates + edit distance)
+    # ==========================
+    def _resolve(self, token: str) -> list:
+        cached = self._resolve_cache.get(token)
+        if cached is not None:
+            return cached
+
+        if token in self._postings:
+            result = [(token, 1.0)]
+        elif len(token) < 3 or token in STOPWORDS or token in SEPARATORS:
+            result = []
+        else:
+            grams = _trigrams(token)
+            counts = {}
+            for g in grams:
+                for cand in self._trigram_index.get(g, ()):
+                    counts[cand] = counts.get(cand, 0) + 1
+
+            max_dist = 1 if len(token) <= 5 else 2
+            result = []
+            for cand, shared in counts.items():
+                # a short word with one letter changed is another word ("roti"/"boti",
+                # "haan"/"naan"); only a dropped letter ("fris", "rata") counts as a typo
+                if len(token) <= 4 and len(cand) <= len(token):
+                    continue
+                # cheap filter before paying for the edit distance; short tokens share
+                # few trigrams after a single transposition, so only filter long ones
+                if len(token) > 6 and shared * 3 < len(grams):
+                    continue
+                d = edit_distance(token, cand, max_dist)
+                if d <= max_dist:
+                    result.append((cand, 1.0 - d / (max(len(token), len(cand)) + 1)))
+            result.sort(key=lambda r: -r[1])
+            result = result[:3]
+
+        if len(self._resolve_cache) >= self.cache_size:
+            self._resolve_cache.clear()
+        self._resolve_cache[token] = result
+        return result
+
+    # ==========================
+    # Matching
+    # ==========================
+    def _segments(self, text: str):
+        """Split a message into (quantity, tokens) chunks, one per requested item."""
+        segments = []
+        qty = None
+        current = []
+        prev = None
+        for raw in _TOKEN.findall(normalize_name(text)) + [","]:
+            tok = VARIANTS.get(raw, raw)
+            is_number = tok.isdigit() or tok in NUMBER_WORDS
+            if tok == "do" and prev in GIVE_VERBS:
+                # the verb, not the number two; and not part of an item name
+                prev = tok
+                continue
+            prev = tok
+            suffix = _QTY_SUFFIX.match(tok)
+
+            if (is_number or suffix) and current and qty is None:
+                # trailing quantity: "chapli kebab 2"
+                qty = int(suffix.group(1) or suffix.group(2)) if suffix else (
+                    int(tok) if tok.isdigit() else NUMBER_WORDS[tok])
+                segments.append((qty if 0 < qty <= 50 else 1, current))
+                current = []
+                qty = None
+                continue
+
+            if tok == "," or tok in SEPARATORS or ((is_number or suffix) and current):
+                if current:
+                    segments.append((qty or 1, current))
+                current = []
+                qty = None
+                if tok == "," or tok in SEPARATORS:
+                    continue
+
+            if suffix:
+                qty = int(suffix.group(1) or suffix.group(2))
+            elif is_number:
+                value = int(tok) if tok.isdigit() else NUMBER_WORDS[tok]
+                if 0 < value <= 50:
+                    qty = value
+            elif tok not in STOPWORDS:
+                current.append(tok)
+        return segments
+
+    def _score_segment(self, tokens: list):
+        scores = {}
+        query_weight = 0.0
+        for tok in tokens:
+            resolved = self._resolve(tok)
+            if not resolved:
+                query_weight += 0.5
+                continue
+            best_weight = 0.0
+            for vocab, sim in resolved:
+                w = self._idf[vocab] * sim
+                best_weight = max(best_weight, w)
+                for item_id in self._postings[vocab]:
+                    per_item = scores.setdefault(item_id, {})
+                    if per_item.get(vocab, 0.0) < w:
+                        per_item[vocab] = w
+            query_weight += best_weight
+
+        best = None
+        runner_up = 0.0
+        for item_id, matched in scores.items():
+            hit = sum(matched.values())
+            coverage = hit / self._item_weight[item_id]
+            precision = hit / query_weight if query_weight else 0.0
+            score = 0.7 * coverage + 0.3 * min(1.0, precision)
+            if best is None or score > best[1]:
+                if best is not None:
+                    runner_up = best[1]
+                best = (item_id, score)
+            elif score > runner_up:
+                runner_up = score
+        if best is None:
+            return None
+        return best[0], best[1], runner_up
+
+    @staticmethod
+    def _confident(score: float, runner_up: float) -> bool:
+        return score >= CONFIDENT_SCORE or (score >= MATCH_FLOOR and score - runner_up >= MATCH_MARGIN)
+
+    def match(self, text: str) -> list:
+        """Return [{id, item, qty, price, total, score, confident}] for every menu item found in text."""
+        self._ensure_index()
+        if not self._items or not text:
+            return []
+
+        found = {}
+        for qty, tokens in self._segments(text):
+            self._add_match(found, qty, tokens)
+        return list(found.values())
+
+    def match_names(self, entries) -> list:
+        """
+        Like match() for items that are already split out, e.g. tool-call arguments
+        [{"name": "chapli kabab", "qty": 2}]: each name is scored as one segment.
+        """
+        self._ensure_index()
+        if not self._items:
+            return []
+
+        found = {}
+        for entry in entries or ():
+            name = entry.get("name") if isinstance(entry, dict) else entry
+            try:
+                qty = int(entry.get("qty") or 1) if isinstance(entry, dict) else 1
+            except (TypeError, ValueError):
+                qty = 1
+            tokens = [t for t in (VARIANTS.get(raw, raw) for raw in _TOKEN.findall(normalize_name(name or "")))
+                      if t not in STOPWORDS and not t.isdigit()]
+            if tokens:
+                self._add_match(found, qty if 0 < qty <= 50 else 1, tokens)
+        return list(found.values())
+
+    def _add_match(self, found: dict, qty: int, tokens: list):
+        best = self._score_segment(tokens)
+        if not best or best[1] < self.min_score:
+            return
+        item = self._items[best[0]]
+        confident = self._confident(best[1], best[2])
+        if item["id"] in found:
+            found[item["id"]]["qty"] += qty
+            found[item["id"]]["total"] = found[item["id"]]["qty"] * item["price"]
+            found[item["id"]]["confident"] = found[item["id"]]["confident"] and confident
+            return
+        found[item["id"]] = {
+            "id": item["id"],
+            "item": item["name"],
+            "qty": qty,
+            "price": item["price"],
+            "total": qty * item["price"],
+            "score": round(best[1], 3),
+            "confident": confident,
+        }
+
+
+# Shared instance used by the webhook and OrderTool
+menu_matcher = MenuMatcher()
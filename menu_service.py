@@ -0,0 +1,142 @@
+# menu_service.py
+"""
+Cached, indexed view of menu.json shared by the menu, order, upsell and
+delivery code.
+
+The file is parsed once and re-parsed only when its mtime changes (checked at
+most every `check_interval` seconds) or when `reload()` is called. The
+rendered menu text and the name/category lookups are rebuilt together on each
+load, so readers only ever do dictionary lookups.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+MENU_PATH = os.getenv("MENU_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu.json"))
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace: 'Chapli Kebab (2 pcs)' -> 'chapli kebab 2 pcs'."""
+    return _NON_WORD.sub(" ", (name or "").lower()).strip()
+
+
+class MenuService:
+    def __init__(self, path: str = MENU_PATH, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._error = None
+
+        # bumped on every successful load so dependants (e.g. the matcher) know to rebuild
+        self.version = 0
+        self.categories = {}
+        self.items = []
+        self.text = ""
+        self._by_name = {}
+        self._by_category = {}
+
+    # ==========================
+    # Loading / invalidation
+    # ==========================
+    def _load(self, mtime):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self._error = "📋 Menu file not found. Please add menu.json in the project root."
+            return
+        except Exception as e:
+            self._error = f"📋 Error reading menu: {e}"
+            return
+
+        items = []
+        by_name = {}
+        by_category = {}
+        parts = ["📋 ZK Restaurant Menu\n\n"]
+        for cat, cat_items in data.items():
+            parts.append(f"🍽 {cat}\n")
+            bucket = by_category.setdefault(normalize_name(cat), [])
+            for i in cat_items:
+                item = {
+                    "id": len(items),
+                    "name": i.get("name"),
+                    "price": i.get("price"),
+                    "category": cat,
+                }
+                items.append(item)
+                bucket.append(item)
+                by_name[normalize_name(item["name"])] = item
+                parts.append(f"• {item['name']} — Rs {item['price']}\n")
+            parts.append("\n")
+
+        self.categories = data
+        self.items = items
+        self._by_name = by_name
+        self._by_category = by_category
+        self.text = "".join(parts)
+        self._error = None
+        self._mtime = mtime
+        self.version += 1
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if force or mtime is None or mtime != self._mtime:
+                self._load(mtime)
+
+    def reload(self) -> dict:
+        """Force a re-read of the menu file (e.g. from an admin endpoint)."""
+        self._refresh(force=True)
+        return self.stats()
+
+    # ==========================
+    # Lookups
+    # ==========================
+    def render(self) -> str:
+        """Precomputed menu text, or the load error message."""
+        self._refresh()
+        return self._error or self.text
+
+    def get_item(self, name: str):
+        """O(1) lookup by normalized item name. Returns None if unknown."""
+        self._refresh()
+        return self._by_name.get(normalize_name(name))
+
+    def price(self, name: str):
+        item = self.get_item(name)
+        return item["price"] if item else None
+
+    def by_category(self, category: str) -> list:
+        self._refresh()
+        return self._by_category.get(normalize_name(category), [])
+
+    def all_items(self) -> list:
+        self._refresh()
+        return self.items
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "items": len(self.items),
+            "categories": len(self.categories),
+            "error": self._error,
+        }
+
+
+# Shared instance used by tools and the API
+menu_service = MenuService()
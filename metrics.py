@@ -0,0 +1,188 @@
+# metrics.py
+"""
+Small, dependency-free helpers for latency and throughput numbers, plus a
+minimal Prometheus-style registry (counters, histograms, callback gauges)
+rendered by the /metrics endpoint.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class LatencyRecorder:
+    """
+    Keeps the most recent `size` samples (in seconds) so percentiles reflect
+    current behaviour, plus lifetime count/total for averages and rates.
+    """
+
+    def __init__(self, size: int = 2048):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.started = time.perf_counter()
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def rate(self) -> float:
+        """Samples per second since the recorder was created."""
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def summary(self, percentiles=(50, 95, 99)) -> dict:
+        ordered = sorted(self._samples)
+        out = {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+        }
+        for p in percentiles:
+            out[f"p{p}_ms"] = round(percentile(ordered, p) * 1000, 2)
+        return out
+
+
+# ==========================
+# Prometheus-style registry
+# ==========================
+# Upper bounds in seconds; covers sub-millisecond parsing up to slow LLM calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_label_str(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus three additions under a lock."""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_str(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "started")
+
+    def __init__(self, hist, labels):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._gauges = []   # (name, help, callback returning {labels tuple or (): value})
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, callback):
+        """Register a gauge whose value(s) are read from callback() at scrape time."""
+        with self._lock:
+            self._gauges.append((name, help_text, callback))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, help_text, callback in gauges:
+            try:
+                values = callback()
+            except Exception:
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in values.items():
+                lines.append(f"{name}{_label_str(key)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry scraped by GET /metrics
+registry = Registry()
@@ -0,0 +1,141 @@
+# offline_llm.py
+"""
+Stand-in for the ChatGroq client when there is no Groq access (LLM_OFFLINE=1,
+no GROQ_API_KEY, tests, local demos).
+
+OfflineLLM implements the calls the apps make, `generate()`, `invoke()` and
+`stream()`, and answers at once from keyword rules. The replies use the same
+"TOOL_CALL:<name>" lines as the real prompt, so the tool dispatch behaves the
+same as with Groq. When a call passes `tools=` (native function calling),
+every matching rule comes back as a tool call with empty arguments, and the
+tools read the message themselves. It never imports langchain.
+benchmarks/fake_llm.FakeLLM adds simulated latency and errors on top of it.
+"""
+
+import json
+import re
+import threading
+
+# keyword -> canned reply; checked in order against the user's text
+CANNED = [
+    (re.compile(r"\bmenu\b", re.I), "TOOL_CALL:menu"),
+    (re.compile(r"\bdeliver", re.I), "TOOL_CALL:delivery"),
+    (re.compile(r"\b(table|reserve|booking)\b", re.I), "TOOL_CALL:reserve"),
+    (re.compile(r"\border\b", re.I), "TOOL_CALL:order"),
+    (re.compile(r"\b(complaint|thanda|late)\b", re.I), "TOOL_CALL:complaint"),
+    (re.compile(r"\b(deal|recommend|best)\b", re.I), "TOOL_CALL:upsell"),
+]
+CHAT_REPLY = "Ji zaroor! ZK Restaurant mein khush aamdeed 🍽️ Aap kya order karna pasand karenge?"
+
+_USER_LINE = re.compile(r"User:\s*(.*?)\s*(?:\nAgent:|$)", re.S)
+_WORDS = re.compile(r"\S+\s*")
+
+
+class OfflineMessage:
+    """Just enough of langchain's HumanMessage / AIMessage for OfflineLLM."""
+
+    __slots__ = ("content", "tool_calls")
+
+    def __init__(self, content: str, tool_calls: list = None):
+        self.content = content
+        self.tool_calls = tool_calls or []
+
+
+class _Generation:
+    def __init__(self, text, tool_calls=None):
+        self.text = text
+        self.message = OfflineMessage(text, tool_calls)
+
+
+class _Result:
+    def __init__(self, text, prompt_tokens, completion_tokens, tool_calls=None):
+        self.generations = [[_Generation(text, tool_calls)]]
+        self.llm_output = {"token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }}
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+def approx_tokens(text: str) -> int:
+    """~4 characters per token, good enough for load-shape purposes."""
+    return max(1, len(text) // 4)
+
+
+class OfflineLLM:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @staticmethod
+    def _user_text(prompt: str) -> str:
+        # the newest "User:" line; earlier ones are conversation history
+        turns = _USER_LINE.findall(prompt)
+        return turns[-1] if turns else prompt
+
+    @classmethod
+    def reply_for(cls, prompt: str) -> str:
+        user_text = cls._user_text(prompt)
+        for pattern, reply in CANNED:
+            if pattern.search(user_text):
+                return reply
+        return CHAT_REPLY
+
+    @classmethod
+    def tool_calls_for(cls, prompt: str, tools) -> list:
+        """Native tool calls for every rule that matches, limited to the offered tools."""
+        offered = {t["function"]["name"] for t in tools}
+        user_text = cls._user_text(prompt)
+        calls = []
+        for pattern, reply in CANNED:
+            name = reply.split(":", 1)[1]
+            if name in offered and pattern.search(user_text):
+                calls.append({"name": name, "args": {}, "id": f"call_{len(calls)}", "type": "tool_call"})
+        return calls
+
+    @staticmethod
+    def _prompt_of(messages) -> str:
+        if messages and isinstance(messages[0], list):
+            messages = messages[0]
+        return "\n".join(getattr(m, "content", str(m)) for m in messages)
+
+    def _account(self, prompt, text):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += approx_tokens(prompt)
+            self.completion_tokens += approx_tokens(text)
+
+    def generate(self, batches, tools=None, **kwargs):
+        prompt = self._prompt_of(batches)
+        calls = self.tool_calls_for(prompt, tools) if tools else []
+        text = "" if calls else self.reply_for(prompt)
+        # tool definitions count as prompt tokens, tool calls as completion tokens
+        sent = prompt + json.dumps(tools) if tools else prompt
+        spoken = text or json.dumps([{"name": c["name"], "arguments": c["args"]} for c in calls])
+        self._account(sent, spoken)
+        return _Result(text, approx_tokens(sent), approx_tokens(spoken), calls)
+
+    def invoke(self, messages, **kwargs):
+        return _Chunk(self.generate([messages]).generations[0][0].text)
+
+    def stream(self, messages, **kwargs):
+        prompt = self._prompt_of(messages)
+        text = self.reply_for(prompt)
+        for word in _WORDS.findall(text) or [text]:
+            yield _Chunk(word)
+        self._account(prompt, text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
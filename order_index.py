@@ -0,0 +1,192 @@
+# order_index.py
+"""
+In-memory indexes behind GET /orders/latest.
+
+Orders get a monotonically increasing `seq`. The most recent `capacity`
+orders live in a fixed-size ring buffer, and each user / status has its own
+bounded window of the same order dicts. Every window is ordered by seq (and,
+in practice, by created_at), so a page is found with a binary search plus a
+slice: latest-N, per-user and per-status queries cost O(log n + page size)
+no matter how many orders arrived during the day.
+"""
+
+import hashlib
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+
+class Window:
+    """Fixed-capacity circular buffer, indexable oldest-first (so bisect works on it)."""
+
+    __slots__ = ("_buf", "_head", "_size", "capacity")
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._buf = [None] * self.capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._buf[(self._head + i) % self.capacity]
+
+    def append(self, item):
+        """Add at the newest end; returns the evicted oldest item (or None)."""
+        evicted = None
+        if self._size == self.capacity:
+            evicted = self._buf[self._head]
+            self._buf[self._head] = item
+            self._head = (self._head + 1) % self.capacity
+        else:
+            self._buf[(self._head + self._size) % self.capacity] = item
+            self._size += 1
+        return evicted
+
+    def popleft(self):
+        item = self._buf[self._head]
+        self._buf[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        return item
+
+    def oldest(self):
+        return self._buf[self._head] if self._size else None
+
+
+def _seq(order):
+    return order["seq"]
+
+
+def _created(order):
+    return order["created_at"]
+
+
+class OrderIndex:
+    def __init__(self, capacity: int = 10000, per_user: int = 200):
+        self.capacity = capacity
+        self.per_user = per_user
+        self._lock = threading.Lock()
+        self._recent = Window(capacity)
+        self._by_user = {}
+        self._by_status = {}
+        self.last_seq = 0
+
+    def add(self, order: dict) -> dict:
+        """Index an order dict in place (adds `seq` and `created_at`)."""
+        with self._lock:
+            self.last_seq += 1
+            order["seq"] = self.last_seq
+            order.setdefault("created_at", time.time())
+
+            evicted = self._recent.append(order)
+            self._window(self._by_user, order["user"], self.per_user).append(order)
+            self._window(self._by_status, order["status"], self.capacity).append(order)
+
+            if evicted is not None:
+                # the ring drops orders oldest-first, so they are the oldest in their windows too
+                self._drop(self._by_user, evicted["user"], evicted)
+                self._drop(self._by_status, evicted["status"], evicted)
+        return order
+
+    @staticmethod
+    def _window(index, key, capacity):
+        window = index.get(key)
+        if window is None:
+            window = index[key] = Window(capacity)
+        return window
+
+    @staticmethod
+    def _drop(index, key, order):
+        window = index.get(key)
+        if window is not None and window.oldest() is order:
+            window.popleft()
+            if not len(window):
+                del index[key]
+
+    def __len__(self):
+        return len(self._recent)
+
+    # ==========================
+    # Queries
+    # ==========================
+    def query(
+        self,
+        limit: int = 20,
+        cursor: int = None,
+        since: int = None,
+        user: str = None,
+        status: str = None,
+        start_time: float = None,
+        end_time: float = None,
+    ) -> dict:
+        """
+        Without `since`: newest first; pass `next_cursor` back as `cursor` for the next (older) page.
+        With `since`: orders with seq > since, oldest first; pass `next_since` back to keep polling.
+        """
+        limit = max(1, limit)
+        with self._lock:
+            if user is not None:
+                source = self._by_user.get(user)
+                extra = (lambda o: o["status"] == status) if status is not None else None
+            elif status is not None:
+                source = self._by_status.get(status)
+                extra = None
+            else:
+                source = self._recent
+                extra = None
+
+            page = []
+            more = False
+            if source is not None and len(source):
+                lo, hi = 0, len(source)
+                if cursor is not None:
+                    hi = min(hi, bisect_left(source, cursor, key=_seq))
+                if end_time is not None:
+                    hi = min(hi, bisect_right(source, end_time, key=_created))
+                if since is not None:
+                    lo = max(lo, bisect_right(source, since, key=_seq))
+                if start_time is not None:
+                    lo = max(lo, bisect_left(source, start_time, key=_created))
+
+                positions = range(lo, hi) if since is not None else range(hi - 1, lo - 1, -1)
+                for pos in positions:
+                    order = source[pos]
+                    if extra is not None and not extra(order):
+                        continue
+                    if len(page) == limit:
+                        more = True
+                        break
+                    page.append(order)
+            last_seq = self.last_seq
+
+        result = {"orders": page, "last_seq": last_seq}
+        if since is not None:
+            result["next_since"] = page[-1]["seq"] if page else since
+            result["has_more"] = more
+        else:
+            result["next_cursor"] = page[-1]["seq"] if page and more else None
+        return result
+
+    @staticmethod
+    def etag(params: dict, result: dict) -> str:
+        """Weak ETag from the query and the seqs on the page (orders are immutable once indexed)."""
+        digest = hashlib.sha1(repr((sorted(params.items()), [o["seq"] for o in result["orders"]],
+                                    result.get("next_cursor"), result.get("has_more"))).encode())
+        return f'W/"{digest.hexdigest()[:16]}"'
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "indexed": len(self._recent),
+                "capacity": self.capacity,
+                "users": len(self._by_user),
+                "statuses": {k: len(v) for k, v in self._by_status.items()},
+                "last_seq": self.last_seq,
+            }
@@ -1,6 +1,87 @@
 # order_state.py
-# Keeps track of current order/reservation per user (in-memory)
-# NOTE: This is in-memory. For production, use a proper database.
+# Keeps track of current order/reservation per user.
+# In-memory by default; with STATE_BACKEND=sqlite the dicts live in SQLite and are
+# shared by every worker process (see shared_state.py).
+# Each key is one user; the webhook pipeline runs a user's messages one at a time,
+# so tool updates for the same user never race.
 
-order_state = {}
-reservation_state = {}
+import threading
+from collections import OrderedDict
+
+from shared_state import STATE_BACKEND, SQLiteState
+
+
+class VersionedState(dict):
+    """
+    dict that stamps every write with an increasing version number, so readers
+    (e.g. each Streamlit session) can pull only the users changed since the
+    version they last saw instead of copying the whole dict.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self._changes = OrderedDict()   # key -> version of its last write, oldest first
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _touch(self, key):
+        self.version += 1
+        self._changes[key] = self.version
+        self._changes.move_to_end(key)
+        self._changed.notify_all()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self._touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self._touch(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            had = key in self
+            value = super().pop(key, *default)
+            if had:
+                self._touch(key)
+            return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def changes_since(self, version: int):
+        """
+        Returns (current_version, changed, removed): `changed` maps keys written after
+        `version` to their current value (oldest change first), `removed` lists deleted keys.
+        Cost is proportional to the number of changes, not the size of the dict.
+        """
+        with self._lock:
+            changed, removed = {}, []
+            for key in reversed(self._changes):
+                if self._changes[key] <= version:
+                    break
+                if key in self:
+                    changed[key] = self[key]
+                else:
+                    removed.append(key)
+            return self.version, dict(reversed(changed.items())), removed
+
+    def wait_for_change(self, version: int, timeout: float = None) -> bool:
+        """Block until a write moves the version past `version`. False on timeout."""
+        with self._lock:
+            return self._changed.wait_for(lambda: self.version > version, timeout)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": len(self), "version": self.version}
+
+
+if STATE_BACKEND == "sqlite":
+    order_state = SQLiteState("order_state")
+    reservation_state = SQLiteState("reservation_state")
+else:
+    order_state = VersionedState()
+    reservation_state = VersionedState()
@@ -0,0 +1,50 @@
+# orders.py
+"""
+Confirmed orders.
+
+save_order() is the one place an order is recorded: it goes into the
+recent-orders index behind /orders/latest and is persisted to storage
+(which publishes the "order" event). The index is bounded (full history
+lives in storage); in-memory per process, or shared by all workers with
+STATE_BACKEND=sqlite.
+"""
+
+import os
+import time
+
+from log_utils import get_logger, log_event
+from metrics import registry
+from shared_state import make_order_index
+from storage import store
+
+logger = get_logger("orders")
+
+ORDER_SAVE_SECONDS = registry.histogram("zk_order_save_seconds", "Time to index and persist an order")
+
+orders_db = make_order_index(
+    capacity=int(os.getenv("ORDERS_INDEX_SIZE", "10000")),
+    per_user=int(os.getenv("ORDERS_PER_USER", "200")),
+)
+
+
+def save_order(user_id: str, item: str, status="confirmed", qty: int = 1, price=None, total=None, details=None):
+    """
+    Index and persist one order. `price` is a unit price for a single-item order;
+    `total` (e.g. a cart with its delivery fee) wins over qty * price when given.
+    """
+    started = time.perf_counter()
+    if total is None and price is not None:
+        total = qty * price
+    order = {
+        "user": user_id,
+        "item": item,
+        "qty": qty,
+        "price": price,
+        "total": total,
+        "status": status
+    }
+    orders_db.add(order)
+    store.add_order(user_id, item, qty=qty, total=total, status=status, details=details)
+    ORDER_SAVE_SECONDS.observe(time.perf_counter() - started)
+    log_event(logger, "order.saved", user=user_id, item=item, qty=qty, seq=order["seq"])
+    return order
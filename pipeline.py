@@ -0,0 +1,200 @@
+# pipeline.py
+"""
+Bounded async worker pool for the WhatsApp webhook.
+
+The webhook only parses the payload and calls `submit()` for each message,
+which returns straight away. A fixed pool of workers runs the slow part
+(LLM -> tool dispatch -> send).
+
+Jobs are grouped per user into mailboxes: different users are processed
+concurrently, but one user's messages always run one at a time and in
+arrival order, so tools that update that user's order/reservation state
+never race with each other.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from log_utils import get_logger, log_event
+
+logger = get_logger("pipeline")
+
+# more workers than LLM slots (admission.LLM_GATE_CONCURRENCY): the spare ones keep
+# answering fast-path and cached messages while LLM-bound ones queue by priority
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "16"))
+
+
+class PipelineStopped(Exception):
+    """Set on a job's `done` future when stop() gave up on it before it finished."""
+
+
+class WebhookPipeline:
+    def __init__(self, handler, workers: int = 4, max_queue: int = 500, max_turns: int = 8):
+        """
+        handler: async callable that receives one job dict and does the work.
+        workers: number of concurrent worker tasks.
+        max_queue: jobs allowed to wait before submit() starts rejecting.
+        max_turns: jobs a worker runs for one user before yielding to other users.
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.max_turns = max(1, max_turns)
+
+        self._ready = None          # user keys with work waiting and no worker on them
+        self._mailboxes = {}        # user key -> deque of jobs, present while the user has work
+        self._idle = None
+        self._tasks = []
+        self._running = False
+        self.pending = 0
+
+        # backpressure / throughput counters
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy = 0
+        self.high_watermark = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    # ==========================
+    # Lifecycle
+    # ==========================
+    async def start(self):
+        if self._running:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float = 30.0):
+        """
+        Stop accepting jobs, let queued jobs finish (up to timeout), then cancel workers.
+        Jobs still queued or running at that point fail with PipelineStopped.
+        """
+        if not self._running:
+            return
+        self._running = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            log_event(logger, "pipeline.drain_timeout", logging.WARNING, dropped=self.pending)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # whoever awaits a queued job's future must not wait forever
+        for box in self._mailboxes.values():
+            for job in box:
+                self._abandon(job)
+        self._mailboxes.clear()
+        self.pending = 0
+        self._idle.set()
+
+    # ==========================
+    # Producer side
+    # ==========================
+    def submit(self, job: dict) -> bool:
+        """
+        Queue a job (keyed by job["user"]) without waiting.
+        Returns False when the pipeline is full or stopped.
+        """
+        if not self._running or self.pending >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        job["enqueued_at"] = time.perf_counter()
+        key = job.get("user")
+        box = self._mailboxes.get(key)
+        if box is None:
+            self._mailboxes[key] = deque([job])
+            self._ready.put_nowait(key)
+        else:
+            box.append(job)
+
+        self.pending += 1
+        self._idle.clear()
+        self.submitted += 1
+        self.high_watermark = max(self.high_watermark, self.pending)
+        return True
+
+    # ==========================
+    # Consumer side
+    # ==========================
+    async def _worker(self, index: int):
+        while True:
+            key = await self._ready.get()
+            box = self._mailboxes[key]
+            turns = 0
+            while box and turns < self.max_turns:
+                await self._run(box.popleft(), index)
+                turns += 1
+
+            if box:
+                # let other users in; this user's remaining jobs keep their order
+                self._ready.put_nowait(key)
+            else:
+                del self._mailboxes[key]
+
+    async def _run(self, job: dict, index: int):
+        started = time.perf_counter()
+        self._wait_total += started - job.get("enqueued_at", started)
+        self.busy += 1
+        done = job.get("done")
+        try:
+            result = await self.handler(job)
+            self.processed += 1
+            if done is not None and not done.done():
+                done.set_result(result)
+        except asyncio.CancelledError:
+            # stop() cancelled the worker mid-job
+            self._abandon(job)
+            raise
+        except Exception as e:
+            self.failed += 1
+            log_event(logger, "pipeline.job_failed", logging.ERROR, worker=index, user=job.get("user"), error=repr(e))
+            if done is not None and not done.done():
+                done.set_exception(e)
+        finally:
+            self.busy -= 1
+            self.pending -= 1
+            self._run_total += time.perf_counter() - started
+            if self.pending == 0:
+                self._idle.set()
+
+    def _abandon(self, job: dict):
+        self.dropped += 1
+        done = job.get("done")
+        if done is not None and not done.done():
+            done.set_exception(PipelineStopped("pipeline stopped before the job finished"))
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            "running": self._running,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "queue_depth": self.pending - self.busy,
+            "active_users": len(self._mailboxes),
+            "max_queue": self.max_queue,
+            "high_watermark": self.high_watermark,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(self._wait_total / done * 1000, 2) if done else 0.0,
+            "avg_run_ms": round(self._run_total / done * 1000, 2) if done else 0.0,
+        }
@@ -0,0 +1,141 @@
+# rate_limit.py
+"""
+Token bucket used to keep outbound (and inbound) traffic under a rate limit,
+and KeyedRateLimiter: one bucket per key (e.g. per WhatsApp sender) in
+bounded memory.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        """
+        rate: tokens added per second.
+        burst: bucket size, i.e. how many tokens can be spent at once.
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_take(self, n: float = 1.0) -> bool:
+        """Spend n tokens if available. Never blocks."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= n:
+                self.tokens -= n
+                return True
+            return False
+
+    def wait_time(self, n: float = 1.0) -> float:
+        """Seconds until n tokens would be available (0 if they already are)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = n - self.tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+
+class KeyedRateLimiter:
+    """
+    A token bucket per key, e.g. per WhatsApp sender.
+
+    Buckets are plain [tokens, updated, notified_at] lists in one LRU under a
+    single lock. A bucket idle for `idle_s` (by default the time it takes to
+    refill) is full again, so it is dropped: forgetting it changes nothing.
+    Beyond `max_keys` the least recently seen bucket goes too. Memory stays
+    bounded however many senders write.
+    """
+
+    def __init__(self, rate: float, burst: float = None, max_keys: int = 50000,
+                 idle_s: float = None, notice_interval: float = 60.0):
+        """
+        rate: tokens added per second, per key.
+        burst: bucket size per key.
+        notice_interval: notify() says yes at most once per this many seconds per key.
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.max_keys = max(1, max_keys)
+        self.idle_s = idle_s if idle_s is not None else (self.capacity / self.rate if self.rate > 0 else 3600.0)
+        self.notice_interval = notice_interval
+        self._buckets = OrderedDict()   # key -> [tokens, updated, notified_at], least recently used first
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.limited = 0
+        self.idle_evictions = 0
+        self.lru_evictions = 0
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] > self.idle_s:
+                self.idle_evictions += 1
+            elif len(buckets) > self.max_keys:
+                self.lru_evictions += 1
+            else:
+                break
+            del buckets[key]
+
+    def allow(self, key, n: float = 1.0) -> bool:
+        """Spend n tokens from key's bucket if it has them. Never blocks."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now, float("-inf")]
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            self._evict(now)
+            if bucket[0] >= n:
+                bucket[0] -= n
+                self.allowed += 1
+                return True
+            self.limited += 1
+            return False
+
+    def notify(self, key) -> bool:
+        """True when a limited key should be told so (once per notice_interval); False otherwise."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[2] < self.notice_interval:
+                return False
+            bucket[2] = now
+            return True
+
+    def retry_after(self, key, n: float = 1.0) -> float:
+        """Seconds until key could spend n tokens (0 if it already can)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            return max(0.0, (n - tokens) / self.rate) if self.rate > 0 else float("inf")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "rate": self.rate,
+                "burst": self.capacity,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "idle_evictions": self.idle_evictions,
+                "lru_evictions": self.lru_evictions,
+            }
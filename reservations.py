@@ -0,0 +1,492 @@
+# reservations.py
+"""
+Table inventory and booking engine behind the reserve tool.
+
+Tables (seats, section) and opening hours come from tables.json. Every table
+keeps its bookings as two parallel sorted lists (start, end minute); bookings
+on one table never overlap, so both lists stay sorted and "is this table free
+from s to e" is a single bisect plus two comparisons. A query for a party
+walks the tables big enough for it, smallest first, so answering "is a table
+for 6 free at 9pm" costs O(tables * log bookings) no matter how many months
+are booked ahead.
+
+Checking and inserting happen under one lock, so two webhooks asking for the
+last free table at the same time cannot both get it. Each user's bookings are
+also indexed by end time, so "my booking" is the newest one still ahead, and
+book() prunes bookings that are over every RESERVATION_PRUNE_MIN minutes.
+
+Bookings are written to the reservations table as JSON details (status
+"reserved", and a second row with status "cancelled" on cancellation). With
+the default in-memory state they are replayed into the index on startup, and
+the book belongs to one process. With STATE_BACKEND=sqlite, every worker books
+through shared_state.SQLiteBookingLog instead: a booking checks and appends in
+one SQLite write transaction after replaying the other workers' rows, so the
+table holds across workers and booking ids stay unique.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from matcher import NUMBER_WORDS
+from shared_state import STATE_BACKEND, SQLiteBookingLog
+from storage import store
+
+TABLES_PATH = os.getenv("TABLES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables.json"))
+# how far back to replay stored bookings on startup (covers bookings made well in advance)
+RESERVATION_RESTORE_DAYS = float(os.getenv("RESERVATION_RESTORE_DAYS", "180"))
+# book() drops bookings that are already over at most this often (minutes)
+RESERVATION_PRUNE_MIN = int(os.getenv("RESERVATION_PRUNE_MIN", "15"))
+
+# ==========================
+# Request parsing
+# ==========================
+_NUM = "|".join(sorted((w for w in NUMBER_WORDS if w not in ("a", "an", "single", "double")), key=len, reverse=True))
+PARTY_PATTERNS = [
+    re.compile(rf"\b(?P<n>\d{{1,2}}|{_NUM})\s*(?:people|persons?|pax|guests?|log|logon|logo|loag|afraad|members?|adults?|bande|bandon)\b", re.I),
+    re.compile(rf"\b(?:table|booking|reservation|seats?)\s+for\s+(?P<n>\d{{1,2}}|{_NUM})\b", re.I),
+    re.compile(rf"\bparty\s+of\s+(?P<n>\d{{1,2}}|{_NUM})\b", re.I),
+    re.compile(rf"\b(?P<n>\d{{1,2}}|{_NUM})\s+(?:ka|ki|ke)\s+(?:table|liye)\b", re.I),
+]
+
+TIME_PATTERNS = [
+    # 9pm, 9:30 pm, 9.30 p.m.
+    re.compile(r"\b(?P<h>\d{1,2})(?:[:.](?P<m>\d{2}))?\s*(?P<ap>[ap])\.?\s*m\b\.?", re.I),
+    # raat 9 baje, 9:30 baje, 8 o'clock
+    re.compile(r"\b(?P<h>\d{1,2})(?:[:.](?P<m>\d{2}))?\s*(?:baje|bajay|bje|o'?clock)\b", re.I),
+    # 21:00
+    re.compile(r"\b(?P<h>[01]?\d|2[0-3]):(?P<m>[0-5]\d)\b"),
+    # at 9, @ 8:30
+    re.compile(r"(?:\bat|@)\s*(?P<h>\d{1,2})(?:[:.](?P<m>\d{2}))?\b(?!\s*(?:people|persons?|log|pax|guests?))", re.I),
+]
+MORNING = re.compile(r"\b(?:subah|morning|breakfast)\b", re.I)
+
+DAY_OFFSETS = [
+    (re.compile(r"\b(?:day\s+after\s+tomorrow|parson|parso|parsoon)\b", re.I), 2),
+    (re.compile(r"\b(?:tomorrow|kal)\b", re.I), 1),
+    (re.compile(r"\b(?:today|tonight|aaj|aj)\b", re.I), 0),
+]
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "peer": 0, "somwar": 0, "pir": 0,
+    "tuesday": 1, "tue": 1, "mangal": 1,
+    "wednesday": 2, "wed": 2, "budh": 2,
+    "thursday": 3, "thu": 3, "jumeraat": 3, "jumerat": 3,
+    "friday": 4, "fri": 4, "juma": 4, "jumma": 4,
+    "saturday": 5, "sat": 5, "hafta": 5, "hafte": 5,
+    "sunday": 6, "sun": 6, "itwar": 6, "itwaar": 6,
+}
+WEEKDAY_RE = re.compile(r"\b(?P<d>" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r")\b", re.I)
+DATE_RE = re.compile(r"\b(?P<d>[0-3]?\d)[/-](?P<mo>[01]?\d)(?:[/-](?P<y>\d{2,4}))?\b")
+
+CHECK_ONLY = re.compile(r"\b(?:free|available|khali|milegi|mil\s+sakti|hai\s+kya|kya\s+hai)\b|\?\s*$", re.I)
+BOOKING_VERBS = re.compile(r"\b(?:book|reserve|confirm|kar\s*do|kardo|karni\s+hai|karna\s+hai|karo)\b", re.I)
+CANCEL = re.compile(r"\b(?:cancel|cancle|radd|khatam)\b", re.I)
+
+
+def _number(word: str):
+    word = word.lower()
+    return int(word) if word.isdigit() else NUMBER_WORDS.get(word)
+
+
+def parse_party(text: str):
+    for pattern in PARTY_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            n = _number(m.group("n"))
+            if n:
+                return n
+    return None
+
+
+def parse_time(text: str, now: datetime):
+    """
+    Returns (start, day_given); start is None when no time is named. Hours
+    without am/pm are read as afternoon/evening (the restaurant opens at
+    noon) unless "subah" is used.
+    """
+    hour = minute = None
+    for pattern in TIME_PATTERNS:
+        m = pattern.search(text)
+        if not m:
+            continue
+        hour, minute = int(m.group("h")), int(m.group("m") or 0)
+        ap = (m.groupdict().get("ap") or "").lower()
+        if ap == "p" and hour < 12:
+            hour += 12
+        elif ap == "a" and hour == 12:
+            hour = 0
+        elif not ap and 1 <= hour <= 11 and not MORNING.search(text):
+            hour += 12
+        break
+    if re.search(r"\bnoon\b|\bdopahar\s+12\b", text, re.I) and hour is None:
+        hour, minute = 12, 0
+
+    day = None
+    m = DATE_RE.search(text)
+    if m:
+        year = int(m.group("y")) if m.group("y") else now.year
+        if year < 100:
+            year += 2000
+        try:
+            day = datetime(year, int(m.group("mo")), int(m.group("d")))
+        except ValueError:
+            day = None
+        if day is not None and not m.group("y") and day.date() < now.date():
+            day = day.replace(year=year + 1)
+    if day is None:
+        for pattern, offset in DAY_OFFSETS:
+            if pattern.search(text):
+                day = now + timedelta(days=offset)
+                break
+    if day is None:
+        m = WEEKDAY_RE.search(text)
+        if m:
+            ahead = (WEEKDAYS[m.group("d").lower()] - now.weekday()) % 7
+            day = now + timedelta(days=ahead)
+
+    if hour is None or hour > 23 or minute > 59:
+        return None, day is not None
+    day_given = day is not None
+    start = (day or now).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if not day_given and start < now:
+        # "9pm" after 9pm means tomorrow
+        start += timedelta(days=1)
+    return start, day_given
+
+
+def _hhmm(value: str) -> int:
+    h, m = value.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _minutes(dt: datetime) -> int:
+    return int(dt.timestamp() // 60)
+
+
+def _start_min(booking: dict) -> int:
+    return _minutes(datetime.strptime(booking["start"], "%Y-%m-%d %H:%M"))
+
+
+def format_time(dt: datetime) -> str:
+    return dt.strftime("%a %d %b, %I:%M %p").replace(" 0", " ")
+
+
+# ==========================
+# Per-table interval index
+# ==========================
+class TableSchedule:
+    """Non-overlapping bookings of one table as parallel sorted lists."""
+
+    __slots__ = ("table", "starts", "ends", "ids")
+
+    def __init__(self, table: dict):
+        self.table = table
+        self.starts = []
+        self.ends = []
+        self.ids = []
+
+    def is_free(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return False
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def insert(self, start: int, end: int, booking_id: str):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, booking_id)
+
+    def remove(self, start: int, booking_id: str) -> bool:
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == booking_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                return True
+            i += 1
+        return False
+
+    def prune(self, before: int) -> int:
+        """Drop bookings that ended before `before`; returns how many."""
+        i = bisect_right(self.ends, before)
+        if i:
+            del self.starts[:i], self.ends[:i], self.ids[:i]
+        return i
+
+
+class ReservationBook:
+    def __init__(self, tables: list, opening: str = "12:00", last_seating: str = "23:00",
+                 duration_min: int = 90, slot_step_min: int = 30, log=None):
+        self.open_min = _hhmm(opening)
+        self.last_seating_min = _hhmm(last_seating)
+        self.duration = duration_min
+        self.step = slot_step_min
+        self._lock = threading.Lock()
+
+        # smallest tables first (file order within a size), so the first free one is the best fit
+        self._schedules = [TableSchedule(t) for t in sorted(tables, key=lambda t: t["seats"])]
+        self._seats = [s.table["seats"] for s in self._schedules]
+        self._by_table = {s.table["id"]: s for s in self._schedules}
+        self.sections = sorted({t.get("section", "") for t in tables if t.get("section")})
+        self.max_party = self._seats[-1] if self._seats else 0
+
+        self.log = log          # SQLiteBookingLog shared by all workers, or None for this process only
+        self._log_seq = 0       # last log row replayed into this book
+        self.bookings = {}      # booking id -> booking dict (active only)
+        self._by_user = {}      # user -> {booking id: end minute}, oldest booking first
+        self._seq = 0
+        self._pruned_at = 0
+        self.queries = 0
+        self.booked = 0
+        self.rejected = 0
+        self.pruned = 0
+
+    @classmethod
+    def from_file(cls, path: str = TABLES_PATH, log=None):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["tables"],
+            opening=data.get("opening", "12:00"),
+            last_seating=data.get("last_seating", "23:00"),
+            duration_min=data.get("duration_min", 90),
+            slot_step_min=data.get("slot_step_min", 30),
+            log=log,
+        )
+
+    def section_in(self, text: str):
+        lowered = (text or "").lower()
+        for section in self.sections:
+            if section in lowered or section.split()[0] in lowered.split():
+                return section
+        return None
+
+    def hours_text(self) -> str:
+        def fmt(m):
+            return datetime(2000, 1, 1, m // 60, m % 60).strftime("%I:%M %p").lstrip("0")
+        return f"{fmt(self.open_min)} se {fmt(self.last_seating_min)}"
+
+    def within_hours(self, start: datetime) -> bool:
+        minute_of_day = start.hour * 60 + start.minute
+        return self.open_min <= minute_of_day <= self.last_seating_min
+
+    # ==========================
+    # Index upkeep (lock held)
+    # ==========================
+    def _hold(self, booking: dict, start: int) -> bool:
+        schedule = self._by_table.get(booking["table"])
+        end = start + booking["duration_min"]
+        if schedule is None or not schedule.is_free(start, end):
+            return False
+        schedule.insert(start, end, booking["id"])
+        self.bookings[booking["id"]] = booking
+        self._by_user.setdefault(booking["user"], {})[booking["id"]] = end
+        return True
+
+    def _drop(self, booking_id: str):
+        booking = self.bookings.pop(booking_id, None)
+        if booking is None:
+            return None
+        self._by_table[booking["table"]].remove(_start_min(booking), booking_id)
+        self._forget(booking["user"], booking_id)
+        return booking
+
+    def _forget(self, user: str, booking_id: str):
+        mine = self._by_user.get(user)
+        if mine is not None:
+            mine.pop(booking_id, None)
+            if not mine:
+                del self._by_user[user]
+
+    def _replay(self, rows: list):
+        """Apply booking_log rows (from this worker or another) to the index."""
+        now_min = _minutes(datetime.now())
+        for seq, kind, booking_id, end_min, data in rows:
+            self._log_seq = seq
+            if kind == "cancel":
+                self._drop(booking_id)
+            elif end_min > now_min:
+                booking = {"id": f"R{seq}", **json.loads(data)}
+                self._hold(booking, end_min - booking["duration_min"])
+
+    def _sync(self):
+        if self.log is not None:
+            self._replay(self.log.since(self._log_seq))
+
+    def _prune(self, now_min: int) -> int:
+        dropped = 0
+        for schedule in self._schedules:
+            for booking_id in schedule.ids[:bisect_right(schedule.ends, now_min)]:
+                booking = self.bookings.pop(booking_id, None)
+                if booking is not None:
+                    self._forget(booking["user"], booking_id)
+            dropped += schedule.prune(now_min)
+        if self.log is not None:
+            self.log.prune(now_min)
+        self._pruned_at = now_min
+        self.pruned += dropped
+        return dropped
+
+    # ==========================
+    # Queries
+    # ==========================
+    def _find(self, party: int, start: int, end: int, section: str = None):
+        for schedule in self._schedules[bisect_left(self._seats, party):]:
+            if section and schedule.table.get("section") != section:
+                continue
+            if schedule.is_free(start, end):
+                return schedule
+        return None
+
+    def available(self, party: int, start: datetime, section: str = None):
+        """Best-fit free table for party at start, or None."""
+        s = _minutes(start)
+        with self._lock:
+            self._sync()
+            self.queries += 1
+            schedule = self._find(party, s, s + self.duration, section)
+        return schedule.table if schedule else None
+
+    def alternatives(self, party: int, start: datetime, section: str = None, limit: int = 3, now: datetime = None):
+        """Nearest other start times (same day, within hours) that have a table free."""
+        now = now or datetime.now()
+        found = []
+        with self._lock:
+            self._sync()
+            for k in range(1, 8):
+                for sign in (-1, 1):
+                    candidate = start + timedelta(minutes=sign * k * self.step)
+                    if candidate < now or candidate.date() != start.date() or not self.within_hours(candidate):
+                        continue
+                    s = _minutes(candidate)
+                    if self._find(party, s, s + self.duration, section):
+                        found.append(candidate)
+                        if len(found) == limit:
+                            return sorted(found)
+        return sorted(found)
+
+    def latest_for(self, user: str, now: datetime = None):
+        """The user's most recently made booking that has not ended yet, or None."""
+        now_min = _minutes(now or datetime.now())
+        with self._lock:
+            self._sync()
+            for booking_id, end in reversed(self._by_user.get(user, {}).items()):
+                if end > now_min:
+                    return self.bookings[booking_id]
+        return None
+
+    # ==========================
+    # Booking
+    # ==========================
+    def _new_booking(self, user: str, schedule: TableSchedule, party: int, start: datetime) -> dict:
+        return {
+            "user": user,
+            "table": schedule.table["id"],
+            "section": schedule.table.get("section"),
+            "seats": schedule.table["seats"],
+            "party": party,
+            "start": start.strftime("%Y-%m-%d %H:%M"),
+            "duration_min": self.duration,
+        }
+
+    def book(self, user: str, party: int, start: datetime, section: str = None):
+        """Atomically pick and hold a table. Returns the booking dict, or None when full."""
+        s = _minutes(start)
+        now_min = _minutes(datetime.now())
+        with self._lock:
+            if now_min - self._pruned_at >= RESERVATION_PRUNE_MIN:
+                self._prune(now_min)
+
+            if self.log is None:
+                schedule = self._find(party, s, s + self.duration, section)
+                booking = None
+                if schedule is not None:
+                    self._seq += 1
+                    booking = {"id": f"R{self._seq}", **self._new_booking(user, schedule, party, start)}
+                    self._hold(booking, s)
+            else:
+                def decide():
+                    schedule = self._find(party, s, s + self.duration, section)
+                    if schedule is None:
+                        return None
+                    return "book", None, s + self.duration, json.dumps(self._new_booking(user, schedule, party, start))
+
+                row = self.log.append(self._log_seq, self._replay, decide)
+                if row is not None:
+                    self._replay([row])
+                booking = self.bookings.get(f"R{row[0]}") if row else None
+
+            if booking is None:
+                self.rejected += 1
+                return None
+            self.booked += 1
+        return booking
+
+    def cancel(self, booking_id: str):
+        """Free a booking's table. Returns the cancelled booking, or None if unknown."""
+        with self._lock:
+            if self.log is None:
+                return self._drop(booking_id)
+
+            def decide():
+                booking = self.bookings.get(booking_id)
+                if booking is None:
+                    return None
+                return "cancel", booking_id, _start_min(booking) + booking["duration_min"], None
+
+            row = self.log.append(self._log_seq, self._replay, decide)
+            if row is None:
+                return None
+            booking = self.bookings[booking_id]
+            self._replay([row])
+        return booking
+
+    def restore(self, rows: list, now: datetime = None) -> int:
+        """Replay stored reservation rows (oldest first); returns how many bookings are active."""
+        now_min = _minutes(now or datetime.now())
+        with self._lock:
+            for row in rows:
+                try:
+                    booking = json.loads(row["details"])
+                    booking_id = booking["id"]
+                except (ValueError, TypeError, KeyError):
+                    continue   # free-text rows from before the engine
+                self._seq = max(self._seq, int(booking_id[1:]))
+                if row["status"] == "cancelled":
+                    self._drop(booking_id)
+                elif booking_id not in self.bookings and _start_min(booking) + booking["duration_min"] > now_min:
+                    self._hold(booking, _start_min(booking))
+            return len(self.bookings)
+
+    def prune(self, now: datetime = None) -> int:
+        """Forget bookings that are already over (book() also does this every RESERVATION_PRUNE_MIN)."""
+        with self._lock:
+            return self._prune(_minutes(now or datetime.now()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._sync()
+            return {
+                "tables": len(self._schedules),
+                "sections": self.sections,
+                "max_party": self.max_party,
+                "shared": self.log is not None,
+                "active_bookings": len(self.bookings),
+                "users_with_bookings": len(self._by_user),
+                "queries": self.queries,
+                "booked": self.booked,
+                "rejected_full": self.rejected,
+                "pruned": self.pruned,
+            }
+
+
+# Shared instance used by the reserve tool. With STATE_BACKEND=sqlite every worker
+# books through the shared log; otherwise the book lives in this process and is
+# rebuilt from the stored reservation rows.
+reservation_book = ReservationBook.from_file(log=SQLiteBookingLog() if STATE_BACKEND == "sqlite" else None)
+if reservation_book.log is None:
+    reservation_book.restore(store.reservations_since(time.time() - RESERVATION_RESTORE_DAYS * 86400))
@@ -0,0 +1,378 @@
+# resilient_llm.py
+"""
+Deadline, circuit breaker and hedging around the Groq client.
+
+ResilientLLM exposes the same `generate()` / `stream()` calls as ChatGroq, so
+app.py and streamlit_app.py keep their call sites:
+
+- every generate() has a deadline budget; the caller gets LLMUnavailable when
+  it runs out instead of waiting for the HTTP client's own timeout,
+- a CircuitBreaker counts errors and slow calls over a rolling window and,
+  once either rate crosses its threshold, rejects calls immediately for
+  `open_seconds` before letting a single probe through (half-open),
+- optionally, a call still running after `hedge_after` seconds gets a second,
+  identical request; whichever answers first wins. Hedges are capped to a
+  fraction of calls so a slow Groq is not sent double the load.
+
+Callers treat LLMUnavailable as "answer without the LLM" (see
+IntentRouter.fallback). The wrapped client can be given as a factory; it is
+then built on first use (or by ensure_client() in a startup hook), so
+importing the app does not pay for the Groq SDK.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "8"))
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "0"))      # 0 disables hedging
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))      # max hedges per call
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_S = float(os.getenv("LLM_BREAKER_SLOW_S", "5"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer in time (breaker open, deadline hit, overloaded or failed)."""
+
+    def __init__(self, reason: str, cause: Exception = None):
+        super().__init__(reason if cause is None else f"{reason}: {cause!r}")
+        self.reason = reason
+        self.cause = cause
+
+
+# ==========================
+# Circuit breaker
+# ==========================
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        slow_call_s: float = LLM_BREAKER_SLOW_S,
+        slow_rate: float = LLM_BREAKER_SLOW_RATE,
+        open_seconds: float = LLM_BREAKER_OPEN_S,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=max(1, window))   # (failed, slow) per finished call
+        self._failed = 0
+        self._slow = 0
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probe_out = False
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """May a call go out now? In half-open state only one probe is let through."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probe_out = False
+            if self.state == HALF_OPEN:
+                if self._probe_out:
+                    self.rejected += 1
+                    return False
+                self._probe_out = True
+            return True
+
+    def record(self, ok: bool, elapsed: float):
+        slow = elapsed >= self.slow_call_s
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_out = False
+                if ok and not slow:
+                    self._reset(CLOSED)
+                else:
+                    self._trip()
+                return
+
+            if len(self._window) == self._window.maxlen:
+                old_failed, old_slow = self._window[0]
+                self._failed -= old_failed
+                self._slow -= old_slow
+            self._window.append((not ok, slow))
+            self._failed += not ok
+            self._slow += slow
+
+            calls = len(self._window)
+            if self.state == CLOSED and calls >= self.min_calls and (
+                self._failed / calls >= self.error_rate or self._slow / calls >= self.slow_rate
+            ):
+                self._trip()
+
+    def release(self):
+        """A call went out but ended without an outcome (e.g. a stream dropped unread): free the probe slot."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_out = False
+
+    def _trip(self):
+        self._reset(OPEN)
+        self.opened_at = time.monotonic()
+        self.trips += 1
+
+    def _reset(self, state):
+        self.state = state
+        self._window.clear()
+        self._failed = self._slow = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = len(self._window)
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "window_calls": calls,
+                "window_error_rate": round(self._failed / calls, 3) if calls else 0.0,
+                "window_slow_rate": round(self._slow / calls, 3) if calls else 0.0,
+                "open_for_s": round(max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1)
+                if self.state == OPEN else 0.0,
+            }
+
+
+# ==========================
+# Client wrapper
+# ==========================
+class _GuardedStream:
+    """
+    Iterator over a client stream that reports the call's outcome exactly once:
+    when the stream ends or fails, when the caller closes it early, or when it
+    is dropped. It does not rely on the caller iterating, so a half-open probe
+    is always given back.
+    """
+
+    def __init__(self, llm, stream, started: float):
+        self._llm = llm
+        self._stream = stream
+        self._chunks = iter(stream)
+        self._started = started
+        self._read = False
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._finish(True)
+            raise
+        except BaseException:
+            self._finish(False)
+            raise
+        self._read = True
+        return chunk
+
+    def close(self):
+        # caller stopped early (e.g. at a TOOL_CALL): the call worked if anything came back;
+        # a stream closed unread says nothing about Groq either way
+        self._finish(True if self._read else None)
+
+    __del__ = close
+
+    def _finish(self, ok):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            if ok is None:
+                self._llm.breaker.release()
+            else:
+                self._llm._record(ok, self._started)
+
+
+class ResilientLLM:
+    def __init__(
+        self,
+        client=None,
+        breaker: CircuitBreaker = None,
+        deadline: float = LLM_DEADLINE_S,
+        hedge_after: float = LLM_HEDGE_AFTER_S,
+        hedge_budget: float = LLM_HEDGE_BUDGET,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        client_factory=None,
+    ):
+        self.client = client
+        self.client_factory = client_factory
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.hedge_budget = hedge_budget
+        self.max_concurrency = max(1, max_concurrency)
+        # calls that outlive their deadline keep a thread until the HTTP client gives up,
+        # so the pool is sized for that and new calls are refused once it is full
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._inflight = 0
+
+        self.calls = 0
+        self.ok = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.overloaded = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    def ensure_client(self):
+        """Build the client from client_factory if that has not happened yet."""
+        if self.client is None:
+            with self._lock:
+                if self.client is None:
+                    self.client = self.client_factory()
+        return self.client
+
+    def _client(self):
+        try:
+            return self.ensure_client()
+        except Exception as e:
+            # e.g. missing SDK or bad settings: same as any other failed call
+            self._record(False, time.monotonic())
+            raise LLMUnavailable("error", e)
+
+    def _submit(self, call):
+        with self._lock:
+            if self._inflight >= self.max_concurrency:
+                return None
+            self._inflight += 1
+        future = self._pool.submit(call)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._inflight -= 1
+
+    def generate(self, messages, deadline: float = None, **kwargs):
+        """client.generate(messages) within `deadline` seconds, or LLMUnavailable."""
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit_open")
+        budget = self.deadline if deadline is None else deadline
+        started = time.monotonic()
+        with self._lock:
+            self.calls += 1
+
+        call = partial(self._client().generate, messages, **kwargs)
+        primary = self._submit(call)
+        if primary is None:
+            # our own pool is full; that says nothing about Groq, so the breaker only
+            # gets its half-open probe back
+            with self._lock:
+                self.overloaded += 1
+            self.breaker.release()
+            raise LLMUnavailable("overloaded")
+        pending = {primary}
+        hedge = None
+        hedge_at = started + self.hedge_after if self.hedge_after > 0 else None
+
+        error = None
+        while pending:
+            now = time.monotonic()
+            remaining = budget - (now - started)
+            if remaining <= 0:
+                break
+            if hedge_at is not None and now >= hedge_at:
+                # one hedge per call, and only while under the hedge budget
+                hedge_at = None
+                with self._lock:
+                    under_budget = self.hedged < self.hedge_budget * self.calls
+                if under_budget:
+                    hedge = self._submit(call)
+                    if hedge is not None:
+                        with self._lock:
+                            self.hedged += 1
+                        pending.add(hedge)
+            wait_for = remaining if hedge_at is None else min(remaining, hedge_at - now)
+
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                self._record(True, started)
+                return result
+
+        self._record(False, started, timed_out=bool(pending))
+        if pending:
+            raise LLMUnavailable("deadline", error)
+        raise LLMUnavailable("error", error)
+
+    def stream(self, messages, **kwargs):
+        """client.stream() guarded by the breaker; outcome is recorded when the stream ends."""
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit_open")
+        with self._lock:
+            self.calls += 1
+        client = self._client()
+        started = time.monotonic()
+        try:
+            stream = client.stream(messages, **kwargs)
+        except Exception as e:
+            self._record(False, started)
+            raise LLMUnavailable("error", e)
+        return _GuardedStream(self, stream, started)
+
+    def _record(self, ok: bool, started: float, timed_out: bool = False):
+        with self._lock:
+            if ok:
+                self.ok += 1
+            elif timed_out:
+                self.timeouts += 1
+            else:
+                self.errors += 1
+        self.breaker.record(ok, time.monotonic() - started)
+
+    def record_fallback(self):
+        """Count a turn answered by the rule-based responder instead of the LLM."""
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self) -> dict:
+        turns = self.calls + self.breaker.rejected
+        return {
+            "breaker": self.breaker.stats(),
+            "deadline_s": self.deadline,
+            "hedge_after_s": self.hedge_after,
+            "inflight": self._inflight,
+            "calls": self.calls,
+            "ok": self.ok,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "overloaded": self.overloaded,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": round(self.fallbacks / turns, 4) if turns else 0.0,
+        }
@@ -0,0 +1,398 @@
+# shared_state.py
+"""
+Shared-state backends for running several workers (uvicorn --workers N, more
+than one replica on a host, or the Streamlit dashboard next to the webhook).
+
+STATE_BACKEND picks the implementation used by order_state.py and app.py:
+
+- "memory" (default): VersionedState dicts and the in-memory OrderIndex.
+  Fastest, but every process has its own copy.
+- "sqlite": SQLiteState, SQLiteOrderIndex and SQLiteBookingLog on
+  STATE_DB_PATH (WAL mode), so every process on the host reads and writes the
+  same state, order seqs and table bookings.
+
+Both kinds of state expose the same calls: dict-style access, `version`,
+`changes_since(version)` and `wait_for_change(version, timeout)`. ChangeFeed
+turns the last two into callbacks, which is how dashboards and other workers
+follow updates without rescanning everything. For SQLite, waiting is a poll
+of one indexed row, since SQLite has no cross-process notify.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from log_utils import get_logger, log_event
+from order_index import OrderIndex
+
+logger = get_logger("shared_state")
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_DB_PATH = os.getenv(
+    "STATE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "zk_state.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv_seq (
+    ns TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kv_state (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,                -- NULL marks a deleted key
+    version INTEGER NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS idx_kv_state_ns_version ON kv_state (ns, version);
+
+CREATE TABLE IF NOT EXISTS order_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_order_log_user_seq ON order_log (user, seq);
+CREATE INDEX IF NOT EXISTS idx_order_log_status_seq ON order_log (status, seq);
+CREATE INDEX IF NOT EXISTS idx_order_log_created ON order_log (created_at);
+
+CREATE TABLE IF NOT EXISTS booking_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,        -- "book" or "cancel"
+    booking_id TEXT,           -- NULL for "book": that booking's id is R<seq>
+    end_min INTEGER NOT NULL,  -- when the booking ends (minutes since the epoch)
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_booking_log_end ON booking_log (end_min);
+"""
+
+
+class _SQLiteBase:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+
+# ==========================
+# Key/value state with versions
+# ==========================
+class SQLiteState(_SQLiteBase):
+    """
+    VersionedState with the same interface, stored in SQLite so every process
+    sees the same data. Each write bumps the namespace version in the same
+    transaction, so changes_since() is a range scan on (ns, version).
+    """
+
+    def __init__(self, namespace: str, path: str = STATE_DB_PATH, poll_interval: float = 0.05):
+        super().__init__(path)
+        self.namespace = namespace
+        self.poll_interval = poll_interval
+
+    @property
+    def version(self) -> int:
+        row = self._conn().execute("SELECT version FROM kv_seq WHERE ns = ?", (self.namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def _write(self, key, value):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute(
+                "INSERT INTO kv_seq (ns, version) VALUES (?, 1) "
+                "ON CONFLICT(ns) DO UPDATE SET version = version + 1 RETURNING version",
+                (self.namespace,),
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO kv_state (ns, key, value, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value, version = excluded.version",
+                (self.namespace, key, value, version),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM kv_state WHERE ns = ? AND key = ? AND value IS NOT NULL", (self.namespace, key)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    # dict interface used by the tools and the UI
+    def __setitem__(self, key, value):
+        self._write(key, json.dumps(value, ensure_ascii=False))
+
+    def __getitem__(self, key):
+        value = self._read(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._read(key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self._read(key) is not None
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._write(key, None)
+
+    def pop(self, key, *default):
+        value = self._read(key)
+        if value is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._write(key, None)
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __len__(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM kv_state WHERE ns = ? AND value IS NOT NULL", (self.namespace,)
+        ).fetchone()[0]
+
+    def items(self):
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv_state WHERE ns = ? AND value IS NOT NULL ORDER BY version", (self.namespace,)
+        )
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def changes_since(self, version: int):
+        """Same contract as VersionedState.changes_since: (current_version, changed, removed)."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            current = conn.execute("SELECT version FROM kv_seq WHERE ns = ?", (self.namespace,)).fetchone()
+            rows = conn.execute(
+                "SELECT key, value FROM kv_state WHERE ns = ? AND version > ? ORDER BY version",
+                (self.namespace, version),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        changed, removed = {}, []
+        for key, value in rows:
+            if value is None:
+                removed.append(key)
+            else:
+                changed[key] = json.loads(value)
+        return (current[0] if current else 0), changed, removed
+
+    def wait_for_change(self, version: int, timeout: float = None) -> bool:
+        """Block until the version moves past `version` (another process may write it)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.version <= version:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "namespace": self.namespace,
+                "keys": len(self), "version": self.version}
+
+
+# ==========================
+# Order index shared between processes
+# ==========================
+class SQLiteOrderIndex(_SQLiteBase):
+    """
+    Same add()/query()/etag() contract as order_index.OrderIndex, but seqs come
+    from one SQLite table so they are unique across workers. Only the newest
+    `capacity` orders are kept (the full history lives in storage.Store).
+    """
+
+    etag = staticmethod(OrderIndex.etag)
+
+    def __init__(self, path: str = STATE_DB_PATH, capacity: int = 10000, prune_every: int = 1000):
+        super().__init__(path)
+        self.capacity = capacity
+        self.prune_every = prune_every
+        self._added = 0
+
+    def add(self, order: dict) -> dict:
+        order.setdefault("created_at", time.time())
+        conn = self._conn()
+        cur = conn.execute(
+            "INSERT INTO order_log (user, status, created_at, data) VALUES (?, ?, ?, ?)",
+            (order["user"], order["status"], order["created_at"], json.dumps(order, ensure_ascii=False)),
+        )
+        order["seq"] = cur.lastrowid
+        self._added += 1
+        if self._added % self.prune_every == 0:
+            conn.execute("DELETE FROM order_log WHERE seq <= ?", (order["seq"] - self.capacity,))
+        return order
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM order_log").fetchone()[0]
+
+    def query(self, limit: int = 20, cursor: int = None, since: int = None, user: str = None,
+              status: str = None, start_time: float = None, end_time: float = None) -> dict:
+        limit = max(1, limit)
+        where, params = [], []
+        for clause, value in (("user = ?", user), ("status = ?", status), ("seq < ?", cursor),
+                              ("seq > ?", since), ("created_at >= ?", start_time), ("created_at <= ?", end_time)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        sql = "SELECT seq, data FROM order_log"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += (" ORDER BY seq ASC" if since is not None else " ORDER BY seq DESC") + " LIMIT ?"
+        params.append(limit + 1)
+
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM order_log").fetchone()[0]
+        finally:
+            conn.execute("COMMIT")
+
+        more = len(rows) > limit
+        page = []
+        for seq, data in rows[:limit]:
+            order = json.loads(data)
+            order["seq"] = seq
+            page.append(order)
+
+        result = {"orders": page, "last_seq": last_seq}
+        if since is not None:
+            result["next_since"] = page[-1]["seq"] if page else since
+            result["has_more"] = more
+        else:
+            result["next_cursor"] = page[-1]["seq"] if page and more else None
+        return result
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM order_log GROUP BY status").fetchall())
+        return {
+            "backend": "sqlite",
+            "indexed": sum(statuses.values()),
+            "capacity": self.capacity,
+            "users": conn.execute("SELECT COUNT(DISTINCT user) FROM order_log").fetchone()[0],
+            "statuses": statuses,
+            "last_seq": conn.execute("SELECT COALESCE(MAX(seq), 0) FROM order_log").fetchone()[0],
+        }
+
+
+# ==========================
+# Table bookings shared between processes
+# ==========================
+class SQLiteBookingLog(_SQLiteBase):
+    """
+    Append-only log of table bookings and cancellations for reservations.py.
+    Each worker replays the log into its own ReservationBook; append() catches
+    up and decides inside one BEGIN IMMEDIATE transaction, so two workers can
+    never hold the same table, and booking ids (R<seq>) are unique across them.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH):
+        super().__init__(path)
+
+    def _rows(self, conn, after: int) -> list:
+        return conn.execute(
+            "SELECT seq, kind, booking_id, end_min, data FROM booking_log WHERE seq > ? ORDER BY seq", (after,)
+        ).fetchall()
+
+    def since(self, after: int) -> list:
+        """(seq, kind, booking_id, end_min, data) rows logged after seq `after`, oldest first."""
+        return self._rows(self._conn(), after)
+
+    def append(self, after: int, catch_up, decide):
+        """
+        Under the write lock: catch_up(rows logged after `after`), then decide(),
+        which returns (kind, booking_id, end_min, data) to log, or None to log
+        nothing. Returns the logged row, or None.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            catch_up(self._rows(conn, after))
+            entry = decide()
+            if entry is None:
+                conn.execute("COMMIT")
+                return None
+            seq = conn.execute(
+                "INSERT INTO booking_log (kind, booking_id, end_min, data) VALUES (?, ?, ?, ?)", entry
+            ).lastrowid
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return (seq, *entry)
+
+    def prune(self, before_min: int) -> int:
+        """Delete rows of bookings that ended before `before_min`."""
+        return self._conn().execute("DELETE FROM booking_log WHERE end_min < ?", (before_min,)).rowcount
+
+
+# ==========================
+# Change notifications
+# ==========================
+class ChangeFeed:
+    """
+    Background thread that follows a state's version and hands every batch of
+    changes to callback(version, changed, removed). Works with VersionedState
+    and SQLiteState alike.
+    """
+
+    def __init__(self, state, callback, since: int = None, name: str = "state-feed"):
+        self.state = state
+        self.callback = callback
+        self.version = state.version if since is None else since
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.state.wait_for_change(self.version, timeout=0.5):
+                continue
+            version, changed, removed = self.state.changes_since(self.version)
+            self.version = version
+            if changed or removed:
+                try:
+                    self.callback(version, changed, removed)
+                except Exception as e:
+                    log_event(logger, "state_feed.callback_failed", logging.ERROR, error=repr(e))
+
+
+def make_order_index(capacity: int = 10000, per_user: int = 200):
+    """Order index on the configured backend (per_user only applies to the in-memory one)."""
+    if STATE_BACKEND == "sqlite":
+        return SQLiteOrderIndex(capacity=capacity)
+    return OrderIndex(capacity=capacity, per_user=per_user)
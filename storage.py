@@ -0,0 +1,293 @@
+# storage.py
+"""
+Durable store for orders, reservations and complaints (SQLite in WAL mode).
+
+Writes are queued and committed by a single writer thread in batches
+(group commit): a burst of webhooks becomes one transaction and one fsync
+instead of one per row. Each accepted row is also published on
+events.event_bus for live dashboards. Readers use their own per-thread connections, which
+WAL lets run alongside the writer. All SQL is kept in module constants so
+sqlite3's per-connection statement cache reuses the prepared statements.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from events import event_bus
+from log_utils import get_logger, log_event
+
+logger = get_logger("storage")
+
+ZK_DB_PATH = os.getenv("ZK_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "zk_restaurant.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    item TEXT NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 1,
+    total INTEGER,
+    status TEXT NOT NULL,
+    details TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user, created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at);
+
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    details TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_user_created ON reservations (user, created_at);
+CREATE INDEX IF NOT EXISTS idx_reservations_status_created ON reservations (status, created_at);
+
+CREATE TABLE IF NOT EXISTS complaints (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints (user, created_at);
+CREATE INDEX IF NOT EXISTS idx_complaints_status_created ON complaints (status, created_at);
+"""
+
+INSERT_SQL = {
+    "orders": "INSERT INTO orders (user, item, qty, total, status, details, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "reservations": "INSERT INTO reservations (user, details, status, created_at) VALUES (?, ?, ?, ?)",
+    "complaints": "INSERT INTO complaints (user, text, status, created_at) VALUES (?, ?, ?, ?)",
+}
+
+COLUMNS = {
+    "orders": ("id", "user", "item", "qty", "total", "status", "details", "created_at"),
+    "reservations": ("id", "user", "details", "status", "created_at"),
+    "complaints": ("id", "user", "text", "status", "created_at"),
+}
+
+_FLUSH = object()
+
+
+class Store:
+    def __init__(self, path: str = ZK_DB_PATH, batch_size: int = 500, flush_interval: float = 0.05):
+        """
+        batch_size: max rows committed in one transaction.
+        flush_interval: how long the writer waits to gather more rows after the first one.
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._closed = True
+        self._writer = None
+        self._lifecycle = threading.Lock()
+
+        self.rows_written = 0
+        self.commits = 0
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.open()
+
+    def open(self):
+        """Start the writer thread; after close() this reopens the store (e.g. a second app lifespan)."""
+        with self._lifecycle:
+            if not self._closed:
+                return
+            if self._writer is not None:
+                # a close() that timed out may still be committing its last batch
+                self._writer.join()
+            self._closed = False
+            self._writer = threading.Thread(target=self._write_loop, name="store-writer", daemon=True)
+            self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # ==========================
+    # Writer thread (group commit)
+    # ==========================
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            rows = {}
+            waiters = []
+            for entry in batch:
+                if entry is None:
+                    continue
+                if entry[0] is _FLUSH:
+                    waiters.append(entry[1])
+                else:
+                    rows.setdefault(entry[0], []).append(entry[1])
+
+            if rows:
+                try:
+                    conn.execute("BEGIN")
+                    for table, values in rows.items():
+                        conn.executemany(INSERT_SQL[table], values)
+                    conn.execute("COMMIT")
+                    self.commits += 1
+                    self.rows_written += sum(len(v) for v in rows.values())
+                except Exception as e:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass    # BEGIN itself failed: there is nothing to roll back
+                    log_event(logger, "store.write_failed", logging.ERROR,
+                              rows=sum(len(v) for v in rows.values()), error=repr(e))
+
+            for event in waiters:
+                event.set()
+            if stop:
+                break
+        conn.close()
+
+    def _enqueue(self, table: str, values: tuple):
+        if self._closed:
+            raise RuntimeError("Store is closed")
+        self._queue.put((table, values))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is committed."""
+        if self._closed:
+            return True
+        event = threading.Event()
+        self._queue.put((_FLUSH, event))
+        return event.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Commit what is queued and stop the writer; open() starts it again."""
+        with self._lifecycle:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    # ==========================
+    # Writes
+    # ==========================
+    def add_order(self, user: str, item: str, qty: int = 1, total=None, status: str = "confirmed", details=None) -> dict:
+        created_at = time.time()
+        self._enqueue("orders", (
+            user, item, qty, total, status,
+            json.dumps(details, ensure_ascii=False) if details is not None else None,
+            created_at,
+        ))
+        row = {"user": user, "item": item, "qty": qty, "total": total, "status": status, "created_at": created_at}
+        event_bus.publish("order", row)
+        return row
+
+    def add_reservation(self, user: str, details: str, status: str = "reserved") -> dict:
+        created_at = time.time()
+        self._enqueue("reservations", (user, details, status, created_at))
+        row = {"user": user, "details": details, "status": status, "created_at": created_at}
+        event_bus.publish("reservation", row)
+        return row
+
+    def add_complaint(self, user: str, text: str, status: str = "open") -> dict:
+        created_at = time.time()
+        self._enqueue("complaints", (user, text, status, created_at))
+        row = {"user": user, "text": text, "status": status, "created_at": created_at}
+        event_bus.publish("complaint", row)
+        return row
+
+    # ==========================
+    # Reads (latest-N, served by the (user|status, created_at) indexes)
+    # ==========================
+    def latest(self, table: str, limit: int = 20, user: str = None, status: str = None) -> list:
+        if table not in COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        where, params = [], []
+        if user is not None:
+            where.append("user = ?")
+            params.append(user)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        sql = f"SELECT {', '.join(COLUMNS[table])} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        cols = COLUMNS[table]
+        return [dict(zip(cols, row)) for row in self._reader().execute(sql, params)]
+
+    def latest_orders(self, limit: int = 20, user: str = None, status: str = None) -> list:
+        rows = self.latest("orders", limit, user, status)
+        for row in rows:
+            if row["details"]:
+                row["details"] = json.loads(row["details"])
+        return rows
+
+    def reservations_since(self, created_after: float) -> list:
+        """Every reservation row written after created_after, oldest first (for replaying bookings)."""
+        cols = COLUMNS["reservations"]
+        sql = f"SELECT {', '.join(cols)} FROM reservations WHERE created_at > ? ORDER BY created_at, id"
+        return [dict(zip(cols, row)) for row in self._reader().execute(sql, (created_after,))]
+
+    def order_items_between(self, created_after: float, created_before: float, status: str = "confirmed"):
+        """Item lists (the stored `details`) of orders in (created_after, created_before), oldest first."""
+        sql = ("SELECT details FROM orders WHERE status = ? AND created_at > ? AND created_at < ? "
+               "AND details IS NOT NULL ORDER BY created_at, id")
+        for (details,) in self._reader().execute(sql, (status, created_after, created_before)):
+            yield json.loads(details)
+
+    def count(self, table: str) -> int:
+        if table not in COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        return self._reader().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending_writes": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "rows_per_commit": round(self.rows_written / self.commits, 1) if self.commits else 0.0,
+        }
+
+
+# Shared instance used by the tools and the API
+store = Store()
+atexit.register(store.close)
@@ -1,27 +1,80 @@
 # streamlit_app.py
 import os
+import time
 from collections import deque
+from itertools import islice
 
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
-from langchain_groq import ChatGroq
 
-from agents_tools import tools
+from agents_tools import (
+    TOOL_LOOKUP as _TOOL_LOOKUP, format_tool_calls, parse_tool_calls, run_tool_calls, tool_calls_of, tool_schemas,
+)
+from conversation import conversation_memory
+from events import SSERelay, event_bus
+from intent_router import intent_router
+from llm_cache import prompt_version, response_cache
+from offline_llm import OfflineLLM, OfflineMessage
 from order_state import order_state, reservation_state
+from resilient_llm import LLM_DEADLINE_S, LLMUnavailable, ResilientLLM
+from storage import store
 
 # ==========================
 # Environment & LLM setup
 # ==========================
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Streamlit re-executes this script on every interaction; everything below that is
+# expensive to build is cached once per server process with st.cache_resource.
 GROQ_MODEL = "llama-3.1-8b-instant"
+# e.g. http://localhost:8000/events to also show orders coming in through the webhook
+EVENTS_URL = os.getenv("EVENTS_URL", "")
+LIVE_REFRESH_S = float(os.getenv("LIVE_REFRESH_S", "2"))     # poll the shared state at least this often
+LIVE_WAKE_S = float(os.getenv("LIVE_WAKE_S", "0.5"))         # check the event bus for a wake-up this often
+# "native": blocking replies use Groq function calling; streamed replies keep the TOOL_CALL: lines
+TOOL_MODE = os.getenv("TOOL_MODE", "native").lower()
+SNAPSHOT_SIZE = 50
 
-if not GROQ_API_KEY:
-    st.error("GROQ_API_KEY is missing. Please set it in your .env file.")
-    st.stop()
 
-llm = ChatGroq(api_key=GROQ_API_KEY, model=GROQ_MODEL, temperature=0.2)
+@st.cache_resource(show_spinner=False)
+def load_settings() -> dict:
+    load_dotenv()
+    api_key = os.getenv("GROQ_API_KEY")
+    offline = os.getenv("LLM_OFFLINE", "0").lower() in ("1", "true", "yes") or not api_key
+    return {"GROQ_API_KEY": api_key, "LLM_OFFLINE": offline}
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm(api_key: str, offline: bool):
+    # one breaker per server process, shared by every session
+    if offline:
+        return ResilientLLM(OfflineLLM())
+    from langchain_groq import ChatGroq
+
+    return ResilientLLM(ChatGroq(
+        api_key=api_key, model=GROQ_MODEL, temperature=0.2, timeout=LLM_DEADLINE_S + 2, max_retries=0,
+    ))
+
+
+@st.cache_resource(show_spinner=False)
+def get_tool_lookup() -> dict:
+    return dict(_TOOL_LOOKUP)
+
+
+SETTINGS = load_settings()
+GROQ_API_KEY = SETTINGS["GROQ_API_KEY"]
+LLM_OFFLINE = SETTINGS["LLM_OFFLINE"]
+
+llm = get_llm(GROQ_API_KEY, LLM_OFFLINE)
+
+
+def human_message(prompt: str):
+    if LLM_OFFLINE:
+        return OfflineMessage(prompt)
+    from langchain_core.messages import HumanMessage
+
+    return HumanMessage(content=prompt)
+
+
+TOOL_LOOKUP = get_tool_lookup()
 
 system_prompt = """
 You are ZK Restaurant AI Agent — a friendly, helpful, and professional virtual assistant
@@ -49,18 +102,88 @@ Your personality:
 - Use emojis lightly when appropriate (🍽️✨🔥).
 """
 
-TOOLS_REQUIRING_USER = {"order", "reserve", "complaint"}
-# Convert tools (ToolWrapper instances) into lookup mapping
-TOOL_LOOKUP = {tool.name: tool for tool in tools}
+# cache entries are tied to this exact prompt + model
+CACHE_VERSION = prompt_version(system_prompt, GROQ_MODEL)
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_relay(url: str):
+    # one relay per server process; it republishes the webhook server's events locally
+    return SSERelay(url, event_bus).start()
+
+
+if EVENTS_URL:
+    get_event_relay(EVENTS_URL)
+
+
+def _pull_changes(state, history_key: str, version_key: str):
+    """Apply only the records changed since this session's last sync (most recent moved last)."""
+    seen = st.session_state.get(version_key, 0)
+    if seen == state.version:
+        return
+    version, changed, removed = state.changes_since(seen)
+    history = st.session_state[history_key]
+    for key in removed:
+        history.pop(key, None)
+    for key, value in changed.items():
+        history.pop(key, None)
+        history[key] = value
+    st.session_state[version_key] = version
+
+
+def _apply_complaint(row: dict):
+    """Keep one (latest) complaint per user, most recent moved last."""
+    history = st.session_state.complaint_history
+    history.pop(row["user"], None)
+    history[row["user"]] = dict(row)
+
+
+def _load_complaints():
+    """Complaints have no shared state; rebuild them from the store, which every worker writes to."""
+    st.session_state.complaint_history = {}
+    for row in reversed(store.latest("complaints", limit=SNAPSHOT_SIZE)):
+        _apply_complaint(row)
 
 
 def sync_session_state_from_globals():
     """
-    Copy the latest shared tool state into the user's Streamlit session.
-    Call this after any operation that may modify the global order/reservation dicts.
+    Bring the shared order/reservation state and new complaints into the user's Streamlit session.
+
+    order_state and reservation_state are the source: their change feed also covers
+    writes from other workers when STATE_BACKEND=sqlite. The event bus is only a
+    wake-up; a new local (or relayed) event makes this poll the shared state right
+    away instead of waiting for LIVE_REFRESH_S.
     """
-    st.session_state.order_history = dict(order_state)
-    st.session_state.reservation_history = dict(reservation_state)
+    cursor = st.session_state.get("events_cursor")
+    now = time.monotonic()
+    woken = cursor is None or event_bus.last_seq != cursor
+    if not woken and now - st.session_state.get("state_polled", 0.0) < LIVE_REFRESH_S:
+        return
+
+    _pull_changes(order_state, "order_history", "order_state_version")
+    _pull_changes(reservation_state, "reservation_history", "reservation_state_version")
+    st.session_state.state_polled = now
+
+    reload = not woken
+    if cursor is not None:
+        while not reload:
+            events, lagged = event_bus.read(cursor)
+            if lagged or any(e.kind == "reset" for e in events):
+                reload = True
+                break
+            if not events:
+                break
+            for event in events:
+                if event.kind == "complaint":
+                    # the row may not be committed yet; apply it from the event
+                    _apply_complaint(event.data)
+            cursor = events[-1].seq
+    if cursor is None or reload:
+        # take the cursor first: events racing the snapshot are applied again, which is harmless
+        cursor = event_bus.last_seq
+        _load_complaints()
+    st.session_state.events_cursor = cursor
+
 
 def fallback_intent_handler(user_text: str, user_id: str):
     """Very lightweight keyword fallback when the LLM forgets to call a tool."""
@@ -87,38 +210,150 @@ def fallback_intent_handler(user_text: str, user_id: str):
 # ==========================
 # Helper functions
 # ==========================
-def run_agent(user_text: str, user_id: str):
-    """Run the same logic as the FastAPI webhook for the Streamlit UI."""
-    prompt = f"{system_prompt}\nUser: {user_text}\nAgent:"
+def generate_ai_text(user_text: str, user_id: str):
+    """Call the LLM for one turn and cache successful replies. None when the LLM is unavailable."""
+    context_free = not conversation_memory.has_history(user_id)
+    prompt, _, _ = conversation_memory.build_prompt(user_id, system_prompt, user_text)
+    started = time.perf_counter()
     try:
-        response = llm.generate([[HumanMessage(content=prompt)]])
+        tool_kwargs = {"tools": tool_schemas(), "tool_choice": "auto"} if TOOL_MODE == "native" else {}
+        response = llm.generate([[human_message(prompt)]], **tool_kwargs)
+        intent_router.record_llm_latency(time.perf_counter() - started)
         ai_text = ""
         if hasattr(response, "generations"):
             gens = response.generations
             if isinstance(gens, list) and len(gens) and isinstance(gens[0], list):
-                ai_text = gens[0][0].text
-            elif isinstance(gens, list) and len(gens) and hasattr(gens[0], "text"):
-                ai_text = gens[0].text
+                gens = gens[0]
+            if isinstance(gens, list) and len(gens) and hasattr(gens[0], "text"):
+                calls = tool_calls_of(gens[0])
+                ai_text = format_tool_calls(calls) if calls else gens[0].text
         if not ai_text:
             ai_text = "Sorry, I cannot respond right now."
+        elif context_free:
+            response_cache.put(user_text, CACHE_VERSION, ai_text)
+    except LLMUnavailable:
+        ai_text = None
+    return ai_text
+
+
+TOOL_CALL_PREFIX = "TOOL_CALL:"
+
+
+def _held_back(text: str) -> int:
+    """Length of the tail of text that could still grow into "TOOL_CALL:" (kept off screen)."""
+    for k in range(min(len(text), len(TOOL_CALL_PREFIX) - 1), 0, -1):
+        if TOOL_CALL_PREFIX.startswith(text[-k:]):
+            return k
+    return 0
+
+
+def stream_ai_text(user_text: str, user_id: str, placeholder):
+    """
+    Stream Groq tokens into `placeholder` as they arrive.
+    As soon as a "TOOL_CALL:<name>" is recognised the stream is closed, so the tool
+    can run without waiting for the rest of the completion.
+    Returns (ai_text, timing); ai_text is None when the LLM is unavailable.
+    """
+    context_free = not conversation_memory.has_history(user_id)
+    prompt, _, _ = conversation_memory.build_prompt(user_id, system_prompt, user_text)
+    started = time.perf_counter()
+    timing = {"mode": "stream", "ttft_ms": None, "total_ms": None, "chunks": 0, "stopped_at_tool_call": False}
+    buf = ""
+    stream = None
+    try:
+        stream = llm.stream([human_message(prompt)])
+        for chunk in stream:
+            piece = getattr(chunk, "content", "") or ""
+            if not piece:
+                continue
+            if timing["ttft_ms"] is None:
+                timing["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            timing["chunks"] += 1
+            buf += piece
+
+            marker = buf.find(TOOL_CALL_PREFIX)
+            if marker != -1:
+                rest = buf[marker + len(TOOL_CALL_PREFIX):].lstrip()
+                name = rest.split()[0] if rest.split() else ""
+                # tool names are unique and none is a prefix of another, so a known name is final
+                if name in TOOL_LOOKUP or (name and len(rest) > len(name)):
+                    buf = buf[:marker] + TOOL_CALL_PREFIX + name
+                    timing["stopped_at_tool_call"] = True
+                    break
+                placeholder.markdown(buf[:marker] + "▌")
+                continue
+
+            placeholder.markdown(buf[:len(buf) - _held_back(buf)] + "▌")
+
+        ai_text = buf or "Sorry, I cannot respond right now."
+        if buf:
+            intent_router.record_llm_latency(time.perf_counter() - started)
+            if context_free:
+                response_cache.put(user_text, CACHE_VERSION, ai_text)
     except Exception as e:
-        ai_text = f"Sorry, I cannot respond right now. ({e})"
+        # breaker open (LLMUnavailable) or the stream broke part-way: fall back to local rules
+        ai_text = None
+        timing["error"] = repr(e)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    timing["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return ai_text, timing
+
+
+def run_agent(user_text: str, user_id: str, placeholder=None):
+    """
+    Run the same logic as the FastAPI webhook for the Streamlit UI.
+    With a placeholder (and streaming enabled) the LLM reply is rendered token by token.
+    """
+    started = time.perf_counter()
+    # Fast path: obvious intents go straight to the tools without an LLM call
+    routed = intent_router.route(user_text, user_id)
+    if routed is not None:
+        conversation_memory.add_turn(user_id, user_text, routed)
+        sync_session_state_from_globals()
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        st.session_state.last_timing = {"mode": "fast_path", "ttft_ms": elapsed, "total_ms": elapsed}
+        return routed, "(fast path: handled without LLM call)"
+
+    # Repeated FAQ-style questions are answered from the shared response cache, only
+    # to users without history (the same rule as the cache writes)
+    ai_text = None
+    if not conversation_memory.has_history(user_id):
+        ai_text = response_cache.get(user_text, CACHE_VERSION)
+    if ai_text is not None:
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        timing = {"mode": "cache", "ttft_ms": elapsed, "total_ms": elapsed}
+    elif placeholder is not None and st.session_state.get("stream_replies", True):
+        ai_text, timing = stream_ai_text(user_text, user_id, placeholder)
+    else:
+        ai_text = generate_ai_text(user_text, user_id)
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        timing = {"mode": "blocking", "ttft_ms": elapsed, "total_ms": elapsed}
+
+    if ai_text is None:
+        # Groq down or the breaker is open: answer from the local rules
+        llm.record_fallback()
+        reply = intent_router.fallback(user_text, user_id)
+        conversation_memory.add_turn(user_id, user_text, reply)
+        timing["mode"] = "fallback"
+        timing["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        st.session_state.last_timing = timing
+        sync_session_state_from_globals()
+        return reply, "(fallback: LLM unavailable, answered by local rules)"
 
     handled_by_tool = False
     reply = ai_text
-    if "TOOL_CALL:" in ai_text:
-        tool_name = ai_text.split("TOOL_CALL:")[1].splitlines()[0].strip()
-        tool = TOOL_LOOKUP.get(tool_name)
-
-        if tool:
-            if tool_name in TOOLS_REQUIRING_USER:
-                reply = tool.func(user_text, user_id)
-            else:
-                try:
-                    reply = tool.func(user_text)
-                except TypeError:
-                    reply = tool.func()
+    if TOOL_CALL_PREFIX in ai_text:
+        calls = parse_tool_calls(ai_text)
+        tool_reply = run_tool_calls(calls, user_id, user_text)
+
+        if tool_reply is not None:
+            reply = tool_reply
             handled_by_tool = True
+            timing["tool"] = ", ".join(name for name, _ in calls)
         else:
             reply = "❌ Invalid tool found."
 
@@ -127,6 +362,12 @@ def run_agent(user_text: str, user_id: str):
         if fallback_reply:
             reply = fallback_reply
 
+    conversation_memory.add_turn(user_id, user_text, reply)
+
+    # latency as the user sees it, including tool dispatch
+    timing["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    st.session_state.last_timing = timing
+
     # Sync the in-memory globals back into session state so UI shows updated info
     sync_session_state_from_globals()
     return reply, ai_text
@@ -139,20 +380,21 @@ def render_state(title: str, state_dict: dict):
         return
 
     max_history = 5
-    items = list(state_dict.items())[::-1]
-    for idx, (user_id, details) in enumerate(items):
-        if idx >= max_history:
-            break
+    # newest entries are at the end; walk backwards without copying the dict
+    for user_id, details in islice(reversed(state_dict.items()), max_history):
         st.markdown(f"**User:** `{user_id}`")
         st.write(details)
         st.divider()
 
+
 # ==========================
 # Streamlit page layout
 # ==========================
 st.set_page_config(page_title="ZK Restaurant Agents", page_icon="🍽️", layout="wide")
 st.title("🍽️ ZK Restaurant Agents")
 st.caption("Interact with the AI agent, preview menu info, and inspect recent orders/reservations.")
+if LLM_OFFLINE:
+    st.warning("Offline mode: replies come from local rules, not Groq. Set GROQ_API_KEY in .env to use the LLM.")
 
 # initialize session state keys
 if "chat_history" not in st.session_state:
@@ -171,6 +413,12 @@ if "order_history" not in st.session_state:
 if "reservation_history" not in st.session_state:
     st.session_state.reservation_history = {}
 
+if "complaint_history" not in st.session_state:
+    st.session_state.complaint_history = {}
+
+if "last_timing" not in st.session_state:
+    st.session_state.last_timing = {}
+
 # make sure session sees latest global state on load
 sync_session_state_from_globals()
 
@@ -180,6 +428,7 @@ with st.sidebar:
     st.text_input("Session User ID", value=st.session_state.user_id, key="sidebar_user_id")
     # update user id immediately so actions use it
     st.session_state.user_id = st.session_state.sidebar_user_id or "demo-user"
+    st.checkbox("Stream replies", value=True, key="stream_replies")
 
     if st.button("Show Menu"):
         menu_tool = TOOL_LOOKUP.get("menu")
@@ -202,7 +451,7 @@ with st.sidebar:
     if st.button("Upsell Suggestion"):
         upsell_tool = TOOL_LOOKUP.get("upsell")
         if upsell_tool:
-            st.session_state.upsell_text = upsell_tool.func("")
+            st.session_state.upsell_text = upsell_tool.func("", st.session_state.user_id)
             sync_session_state_from_globals()
         else:
             st.session_state.upsell_text = "Upsell tool not available."
@@ -230,9 +479,8 @@ with st.form("chat_form", clear_on_submit=True):
 
     if submitted and user_message.strip():
         st.session_state.chat_history.append(("user", user_message))
-        reply, raw_ai = run_agent(user_message.strip(), st.session_state.user_id)
-        st.session_state.chat_history.append(("assistant", reply))
-        st.session_state.last_ai_raw = raw_ai
+        # answered below the chat history so the reply can stream into its own bubble
+        st.session_state.pending_message = user_message.strip()
 
 # Render chat
 chat_container = st.container()
@@ -243,13 +491,44 @@ with chat_container:
         else:
             st.chat_message("assistant").write(content)
 
+    pending = st.session_state.pop("pending_message", None)
+    if pending:
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            reply, raw_ai = run_agent(pending, st.session_state.user_id, placeholder)
+            placeholder.write(reply)
+        st.session_state.chat_history.append(("assistant", reply))
+        st.session_state.last_ai_raw = raw_ai
+
 if st.session_state.last_ai_raw:
     with st.expander("Debug: Raw LLM output", expanded=False):
         st.write(st.session_state.last_ai_raw)
-
-# Display order/reservation state (from session_state)
-col1, col2 = st.columns(2)
-with col1:
-    render_state("Latest Orders", st.session_state.order_history)
-with col2:
-    render_state("Latest Reservations", st.session_state.reservation_history)
+        if st.session_state.last_timing:
+            st.caption("Last turn latency (time-to-first-token / total, ms)")
+            st.json(st.session_state.last_timing)
+        st.caption("Fast-path router")
+        st.json(intent_router.stats())
+        st.caption("LLM response cache")
+        st.json(response_cache.stats())
+        st.caption("Groq circuit breaker / fallback")
+        st.json(llm.stats())
+        st.caption("Live events")
+        st.json(event_bus.stats())
+
+
+def live_panels():
+    """Latest orders/reservations/complaints, kept current from the shared state."""
+    sync_session_state_from_globals()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        render_state("Latest Orders", st.session_state.order_history)
+    with col2:
+        render_state("Latest Reservations", st.session_state.reservation_history)
+    with col3:
+        render_state("Latest Complaints", st.session_state.complaint_history)
+
+
+# refresh just these panels on a timer where Streamlit supports fragments
+if hasattr(st, "fragment"):
+    live_panels = st.fragment(run_every=min(LIVE_WAKE_S, LIVE_REFRESH_S))(live_panels)
+live_panels()
@@ -2,7 +2,20 @@
 import json
 from datetime import datetime
 
+from cart import CART_CLEAR, CART_CONFIRM, CART_REMOVE, CART_SET, CART_VIEW, carts
+from delivery_zones import delivery_zones, parse_coordinates
+from matcher import menu_matcher
+from menu_service import menu_service
 from order_state import order_state, reservation_state
+from orders import save_order
+from reservations import (
+    BOOKING_VERBS, CANCEL, CHECK_ONLY, format_time, parse_party, parse_time, reservation_book,
+)
+from storage import store
+from upsell import upsell_recommender
+
+EMPTY_CART_REPLY = "🛒 Aap ka cart khali hai. Menu se item ka naam likhein (e.g. 2 Chapli Kebab)."
+
 
 # -------------------------------
 # MENU TOOL
@@ -10,23 +23,14 @@ from order_state import order_state, reservation_state
 class MenuTool:
     name = "menu"
     description = "Show the restaurant menu."
+    parameters = {"type": "object", "properties": {}}
     
     def func(self, query=""):
-        try:
-            with open("menu.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            return "📋 Menu file not found. Please add menu.json in the project root."
-        except Exception as e:
-            return f"📋 Error reading menu: {e}"
-
-        text = "📋 ZK Restaurant Menu\n\n"
-        for cat, items in data.items():
-            text += f"🍽 {cat}\n"
-            for i in items:
-                text += f"• {i.get('name')} — Rs {i.get('price')}\n"
-            text += "\n"
-        return text
+        # Loaded once and re-read only when menu.json changes
+        return menu_service.render()
+
+    def call(self, args, user=None, text=""):
+        return self.func()
 
 
 # -------------------------------
@@ -34,34 +38,134 @@ class MenuTool:
 # -------------------------------
 class OrderTool:
     name = "order"
-    description = "Place a new food order."
+    description = "Add items to the user's cart, change or remove them, show the cart, or confirm it as an order."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": ["add", "remove", "set", "view", "clear", "confirm"],
+                       "description": "set changes an item's quantity; confirm places the order"},
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}, "qty": {"type": "integer"}},
+                    "required": ["name"],
+                },
+            },
+        },
+        "required": ["action"],
+    }
 
     def func(self, query, user):
         """
-        Handles user order.
-        Expected input: food item text.
+        Handles order messages against the user's cart.
+        Expected input: free text naming one or more menu items, e.g. "2 chapli kebab aur ek naan",
+        or a change to the cart: "naan hata do", "sirf 1 karahi", "order confirm".
         """
-        item = (
-            query.lower()
-            .replace("order", "")
-            .replace("confirm", "")
-            .replace("please", "")
-            .strip()
-        )
+        query = query or ""
+        matches = menu_matcher.match(query)
+        return self._handle(user, self._action(query, matches), matches, bool(CART_CONFIRM.search(query)))
+
+    def call(self, args, user=None, text=""):
+        # items already split out by the model; the raw message only when it sent none
+        items = args.get("items")
+        matches = menu_matcher.match_names(items) if items else menu_matcher.match(text)
+        action = args.get("action")
+        if action is None:
+            return self._handle(user, self._action(text or "", matches), matches, bool(CART_CONFIRM.search(text or "")))
+        return self._handle(user, action, matches, action == "confirm")
+
+    @staticmethod
+    def _action(text, matches):
+        if CART_CLEAR.search(text):
+            return "clear"
+        if CART_REMOVE.search(text):
+            return "remove"
+        if CART_SET.search(text):
+            return "set"
+        return "add" if matches or not CART_VIEW.search(text) else "view"
+
+    def _handle(self, user, action, matches, confirm=False):
+        if action == "clear":
+            return "🗑️ Aap ka cart khali kar diya gaya hai." if carts.clear(user) else EMPTY_CART_REPLY
+        if action == "remove":
+            cart, removed = carts.remove(user, matches)
+            if cart is None:
+                return EMPTY_CART_REPLY
+            if not removed:
+                return "Yeh item aap ke cart mein nahi hai.\n\n" + self._render(cart)
+            head = f"➖ {', '.join(removed)} cart se hata diya gaya."
+            return f"{head}\n\n{self._render(cart)}" if cart.lines else f"{head} Aap ka cart ab khali hai."
+
+        # a guess or an ambiguous name ("kebab": Afghani or Chapli?) is asked about, never added
+        unsure = [m for m in matches if not m["confident"]]
+        matches = [m for m in matches if m["confident"]]
+        ask = ""
+        if unsure:
+            ask = (f"❓ Kya aap ka matlab {' / '.join(m['item'] for m in unsure)} hai? Add karne ke liye poora "
+                   f"naam likhein (e.g. '{unsure[0]['qty']} {unsure[0]['item']}').")
+
+        if matches and action in ("add", "set", "confirm"):
+            cart, changed = (carts.set_qty if action == "set" else carts.add)(user, matches)
+            if confirm and not unsure:
+                return self._confirm(user)
+            reply = f"🛒 Cart update ho gaya!\n{self._render(cart)}"
+            if len(changed) < len(matches):
+                reply += f"\n(Ek order mein {carts.max_lines} se zyada items nahi ho sakte.)"
+            if ask:
+                return f"{reply}\n{ask}"
+            return reply + "\nOrder confirm karne ke liye 'confirm' likhein, ya item ka naam likh kar aur add karein."
+        if ask:
+            return ask
+        if confirm:
+            return self._confirm(user)
 
-        if not item:
-            return "Kripya bataen ke aap kya order karna chahte hain."
+        cart = carts.get(user)
+        if cart is not None:
+            return self._render(cart) + "\nOrder confirm karne ke liye 'confirm' likhein."
+        if action == "view":
+            return EMPTY_CART_REPLY
+        return "Kripya menu se item ka naam bataen jo aap order karna chahte hain (e.g. 2 Chapli Kebab)."
+
+    @staticmethod
+    def _render(cart):
+        lines = ["🛒 Aap ka cart:"]
+        lines.extend(f"• {line.qty} x {line.name} — Rs {line.qty * line.price}" for line in cart.lines)
+        lines.append(f"Subtotal: Rs {cart.subtotal}")
+        quote = cart.quote()
+        if quote is not None:
+            lines.append(f"Delivery ({quote['name']}): Rs {quote['fee']}")
+        lines.append(f"Total: Rs {cart.subtotal + (quote['fee'] if quote else 0)}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _confirm(user):
+        cart = carts.checkout(user)
+        if cart is None:
+            return EMPTY_CART_REPLY
 
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        item = cart.describe()
+        details = cart.details()
+        quote = cart.quote()
+        total = cart.total()
 
         # Save order into global state
+        upsell_recommender.record([line.name for line in cart.lines])
         order_state[user] = {
             "item": item,
+            "items": details,
+            "subtotal": cart.subtotal,
+            "delivery": quote,
+            "total": total,
             "time": now,
             "status": "confirmed"
         }
+        save_order(user, item, qty=cart.count, total=total, details=details)
 
-        return f"🛒 Aapka order confirm ho gaya hai!\nItem: {item}\nTime: {now}\nShukriya ZK Restaurant choose karne ka! 🍽️"
+        delivery = f"Delivery: {quote['name']} — Rs {quote['fee']} (~{quote['eta_min']} min)\n" if quote else ""
+        return (f"🛒 Aapka order confirm ho gaya hai!\nItem: {item}\n{delivery}Total: Rs {total}\nTime: {now}\n"
+                "Shukriya ZK Restaurant choose karne ka! 🍽️")
 
 
 # -------------------------------
@@ -70,18 +174,125 @@ class OrderTool:
 class ReservationTool:
     name = "reserve"
     description = "Reserve a table."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": ["book", "check", "cancel"]},
+            "party_size": {"type": "integer"},
+            "time": {"type": "string", "description": "e.g. 21:00"},
+            "date": {"type": "string", "description": "YYYY-MM-DD; omit for today"},
+            "section": {"type": "string"},
+        },
+        "required": ["action"],
+    }
 
     def func(self, query, user):
-        details = query.strip() or "Table reservation"
-        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        # "book a table for 6 at 9pm", "kal raat 8 baje 4 log", "is a table for 6 free at 9pm?"
+        query = (query or "").strip()
+        now = datetime.now()
+
+        if CANCEL.search(query):
+            return self._cancel(user)
+
+        party = parse_party(query)
+        start, _ = parse_time(query, now)
+        section = reservation_book.section_in(query)
+        check_only = CHECK_ONLY.search(query) and not BOOKING_VERBS.search(query)
+        return self._handle(user, party, start, section, check_only, query, now)
+
+    def call(self, args, user=None, text=""):
+        text = (text or "").strip()
+        now = datetime.now()
+        action = args.get("action") or "book"
+        if action == "cancel":
+            return self._cancel(user)
+
+        # models send "4" as often as 4
+        try:
+            party = int(args.get("party_size"))
+        except (TypeError, ValueError):
+            party = None
+        if party is None or party < 1:
+            party = parse_party(text)
+        start = self._start(args.get("time"), args.get("date"), now)
+        if start is None:
+            start, _ = parse_time(text, now)
+        section = reservation_book.section_in(args.get("section") or text)
+        return self._handle(user, party, start, section, action == "check", text, now)
+
+    @staticmethod
+    def _start(time_text, date_text, now):
+        """datetime from the model's time ("21:00", "9pm") and date ("2025-06-01", "kal") arguments."""
+        if not time_text:
+            return None
+        day = None
+        if date_text:
+            try:
+                day = datetime.strptime(date_text.strip(), "%Y-%m-%d")
+            except ValueError:
+                pass
+        start, _ = parse_time(f"{'' if day else date_text or ''} {time_text}", now)
+        if start is not None and day is not None:
+            start = start.replace(year=day.year, month=day.month, day=day.day)
+        return start
 
+    def _handle(self, user, party, start, section, check_only, query, now):
+        if party is None and start is None:
+            return "📅 Kitne logon ke liye aur kis waqt table chahiye? (e.g. 'table for 4 at 9pm')"
+        if party is None:
+            return f"📅 {format_time(start)} ke liye kitne log honge?"
+        if start is None:
+            return f"📅 {party} logon ke liye table kis waqt chahiye? (e.g. 'aaj raat 9 baje')"
+        if party > reservation_book.max_party:
+            return f"😔 {party} logon ki party ke liye please restaurant ko call karein, hum arrangement kar denge."
+        if start < now:
+            return "⏰ Yeh waqt guzar chuka hai, please koi aur time batayein."
+        if not reservation_book.within_hours(start):
+            return f"⏰ Hum {reservation_book.hours_text()} tak reservations lete hain. Please is ke darmiyan koi time batayein."
+
+        if check_only:
+            table = reservation_book.available(party, start, section)
+            if table is not None:
+                return (f"✅ Haan, {format_time(start)} par {party} logon ke liye table available hai"
+                        f" ({table['section']}).\nBook karne ke liye likhein: 'book table for {party} at "
+                        f"{start.strftime('%I:%M %p').lstrip('0')}'")
+            return self._full_reply(party, start, section, now)
+
+        booking = reservation_book.book(user, party, start, section)
+        if booking is None:
+            return self._full_reply(party, start, section, now)
+
+        store.add_reservation(user, json.dumps(booking), status="reserved")
         reservation_state[user] = {
-            "details": details,
-            "time": now,
-            "status": "reserved"
+            "details": query or "Table reservation",
+            "booking_id": booking["id"],
+            "table": booking["table"],
+            "party": party,
+            "time": booking["start"],
+            "status": "reserved",
         }
+        return (
+            f"📅 Aapki table reserve ho gayi hai!\n"
+            f"Table: {booking['table']} ({booking['section']}, {booking['seats']} seats)\n"
+            f"Log: {party}\nTime: {format_time(start)} ✨\nBooking ID: {booking['id']}"
+        )
 
-        return f"📅 Aapki table reserve ho gayi hai!\nDetails: {details}\nTime: {now} ✨"
+    @staticmethod
+    def _full_reply(party, start, section, now):
+        others = reservation_book.alternatives(party, start, section, now=now)
+        reply = f"😔 {format_time(start)} par {party} logon ke liye table available nahi hai."
+        if others:
+            reply += "\nYeh waqt available hain: " + ", ".join(t.strftime("%I:%M %p").lstrip("0") for t in others)
+        return reply
+
+    @staticmethod
+    def _cancel(user):
+        booking = reservation_book.latest_for(user)
+        if booking is None or reservation_book.cancel(booking["id"]) is None:
+            return "Aap ki koi active reservation nahi mili."
+        store.add_reservation(user, json.dumps(booking), status="cancelled")
+        reservation_state[user] = {**reservation_state.get(user, {}), "status": "cancelled"}
+        return f"❌ Reservation {booking['id']} cancel kar di gayi hai."
 
 
 # -------------------------------
@@ -90,21 +301,39 @@ class ReservationTool:
 class DeliveryTool:
     name = "delivery"
     description = "Check delivery availability."
+    parameters = {
+        "type": "object",
+        "properties": {"location": {"type": "string", "description": "Area or 'lat,lon'"}},
+        "required": ["location"],
+    }
 
-    def func(self, location):
-        location = (location or "").strip()
-        areas = [
-            "City Center", "Millat Road", "College Road", "Model Town",
-            "Shahbaz Nagar", "Hospital Chowk", "Green Market Area"
-        ]
+    def call(self, args, user=None, text=""):
+        return self.func(args.get("location") or text, user)
 
+    def func(self, location, user=None):
+        # Area name ("model town, near park") or a "lat,lon" pin from a location message;
+        # an open cart is set to deliver there
+        location = (location or "").strip()
         if not location:
-            return "Please provide your delivery area (e.g. City Center)."
-        if location in areas:
-            return f"🚚 Delivery is available to {location}.\nDelivery Charges: Rs 70."
-        else:
+            return "Please provide your delivery area (e.g. City Center) or share your location 📍."
+
+        zone = delivery_zones.resolve(location)
+        if zone is None:
+            if parse_coordinates(location):
+                return "❌ Sorry, aap ki location hamare delivery area mein nahi hai."
             return f"❌ Sorry, delivery is not available in {location}."
 
+        cart = carts.set_zone(user, zone) if user else None
+        quote = cart.quote() if cart is not None else delivery_zones.quote(zone)
+        reply = (
+            f"🚚 Delivery is available to {quote['name']}.\n"
+            f"Delivery Charges: Rs {quote['fee']}.\n"
+            f"Estimated time: ~{quote['eta_min']} min."
+        )
+        if cart is not None:
+            reply += f"\nAap ke cart ka total (delivery ke saath): Rs {cart.total()}"
+        return reply
+
 
 # -------------------------------
 # UPSELL TOOL
@@ -112,9 +341,41 @@ class DeliveryTool:
 class UpsellTool:
     name = "upsell"
     description = "Suggest an addon."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "items": {"type": "array", "items": {"type": "string"}, "description": "Omit for the current cart"},
+        },
+    }
 
-    def func(self, query=""):
-        return "🔥 Recommendation: Add a chilled 1.5L drink to your order for just Rs 190!"
+    def func(self, query="", user=None):
+        """
+        Add-ons that are often ordered with the items in the message, or with the
+        user's last order when the message names none.
+        """
+        cart = [m["item"] for m in menu_matcher.match(query)] if query else []
+        return self._suggest(cart, user)
+
+    def call(self, args, user=None, text=""):
+        items = args.get("items")
+        return self._suggest([m["item"] for m in menu_matcher.match_names(items)] if items else [], user)
+
+    @staticmethod
+    def _suggest(cart, user):
+        if not cart and user:
+            # the open cart, else the last confirmed order
+            open_cart = carts.get(user)
+            if open_cart is not None:
+                cart = [line.name for line in open_cart.lines]
+            else:
+                cart = [m["item"] for m in (order_state.get(user) or {}).get("items", [])]
+
+        picks = upsell_recommender.recommend(cart)
+        if not picks:
+            return "🔥 Hamara menu dekhein aur apni pasand ka item order karein!"
+        title = "🔥 Aksar log is ke saath yeh bhi lete hain:" if cart else "🔥 Hamare customers ki pasand:"
+        lines = [f"• {p['item']} — Rs {p['price']}" for p in picks]
+        return "\n".join([title, *lines, "Add karne ke liye item ka naam likh dein! 🍽️"])
 
 
 # -------------------------------
@@ -123,7 +384,16 @@ class UpsellTool:
 class ComplaintTool:
     name = "complaint"
     description = "Register customer complaints."
+    parameters = {
+        "type": "object",
+        "properties": {"details": {"type": "string"}},
+        "required": ["details"],
+    }
+
+    def call(self, args, user=None, text=""):
+        return self.func(args.get("details") or text, user)
 
     def func(self, query, user):
         text = query.strip() or "No details provided"
+        store.add_complaint(user, text)
         return "🙏 Aapki complaint receive ho gayi hai. Humari team bohat jald aap se contact karegi."
@@ -0,0 +1,235 @@
+# upsell.py
+"""
+Add-on suggestions learned from what customers actually order together.
+
+UpsellRecommender keeps a square NumPy count matrix indexed by menu item id.
+counts[a, b] is the number of confirmed orders containing both a and b, and
+the diagonal holds the number of orders containing a. Each confirmed order is
+one vectorised update of its pairs. Each item also keeps a short list of its
+best partners, ordered by count. Only the entries whose count changed are
+moved within that list, so nothing is recomputed from scratch.
+
+Suggestions read those lists, which costs O(k) per cart item. A candidate's
+score is the confidence P(candidate | cart item), summed over the cart.
+Pairs seen fewer than `min_support` times are ignored. Until there is enough
+history, the best sellers stand in, then the cheapest drinks and extras.
+
+On first use the matrix is replayed from the order history in the store.
+When menu.json changes, the matrix is remapped by item name.
+"""
+
+import heapq
+import os
+import threading
+import time
+
+import numpy as np
+
+from menu_service import menu_service, normalize_name
+from storage import store
+
+UPSELL_TOP_K = int(os.getenv("UPSELL_TOP_K", "3"))
+UPSELL_RANK_SIZE = int(os.getenv("UPSELL_RANK_SIZE", "16"))      # partners kept per item
+UPSELL_MIN_SUPPORT = int(os.getenv("UPSELL_MIN_SUPPORT", "3"))   # orders before a pair counts
+UPSELL_HISTORY_DAYS = float(os.getenv("UPSELL_HISTORY_DAYS", "180"))
+
+# cold start: cheap add-ons from these categories, in this order
+DEFAULT_CATEGORIES = ("Kahwa & Drinks", "Bread & Extras")
+
+
+class UpsellRecommender:
+    def __init__(self, menu=menu_service, store=None, rank_size: int = UPSELL_RANK_SIZE,
+                 min_support: int = UPSELL_MIN_SUPPORT, history_days: float = UPSELL_HISTORY_DAYS):
+        self.menu = menu
+        self.store = store
+        self.rank_size = max(1, rank_size)
+        self.min_support = max(1, min_support)
+        self.history_days = history_days
+        # orders before this moment are replayed from the store, later ones arrive via record()
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+        self._loaded = store is None
+        self._version = None
+
+        self._items = []
+        self._index = {}                                  # normalized name -> item id
+        self._counts = np.zeros((0, 0), dtype=np.uint32)
+        # ranked lists carry their counts as plain ints so suggestions never touch the matrix
+        self._ranked = []                                 # item id -> [partner ids], best first
+        self._ranked_counts = []                          # item id -> [pair counts], same order
+        self._support = []                                # item id -> orders containing it
+        self._popular = []                                # item ids by order count, best first
+        self._popular_counts = []
+
+        self.orders = 0
+        self.replayed = 0
+        self.skipped_items = 0
+
+    # ==========================
+    # Menu sync / history replay
+    # ==========================
+    def _sync(self):
+        """Called with the lock held: follow menu.json changes, then replay history once."""
+        items = self.menu.all_items()
+        if self._version != self.menu.version:
+            self._remap(items)
+        if not self._loaded:
+            self._loaded = True
+            since = self.created_at - self.history_days * 86400
+            for details in self.store.order_items_between(since, self.created_at):
+                self._add([d.get("item") for d in details if isinstance(d, dict)])
+                self.replayed += 1
+
+    def _remap(self, items):
+        index = {normalize_name(item["name"]): item["id"] for item in items}
+        counts = np.zeros((len(items), len(items)), dtype=np.uint32)
+        # carry counts over for items that kept their name
+        keep = [(old, index[name]) for name, old in self._index.items() if name in index]
+        if keep:
+            old_ids, new_ids = (np.array(ids) for ids in zip(*keep))
+            counts[np.ix_(new_ids, new_ids)] = self._counts[np.ix_(old_ids, old_ids)]
+
+        self._items = items
+        self._index = index
+        self._counts = counts
+        # one full ranking per menu change; incremental from here on
+        self._ranked, self._ranked_counts = [], []
+        for a in range(len(items)):
+            row = counts[a].astype(np.int64)
+            row[a] = 0
+            top = [int(b) for b in np.argsort(-row, kind="stable")[: self.rank_size] if row[b]]
+            self._ranked.append(top)
+            self._ranked_counts.append([int(row[b]) for b in top])
+        self._support = counts.diagonal().tolist()
+        diagonal = np.array(self._support, dtype=np.int64)
+        self._popular = [int(a) for a in np.argsort(-diagonal, kind="stable")[: self.rank_size] if diagonal[a]]
+        self._popular_counts = [self._support[a] for a in self._popular]
+        self._version = self.menu.version
+
+    # ==========================
+    # Incremental updates
+    # ==========================
+    def record(self, item_names):
+        """Count one confirmed order (menu item names; unknown names are ignored)."""
+        with self._lock:
+            self._sync()
+            self._add(item_names)
+
+    def _add(self, item_names):
+        ids = sorted({self._index[key] for key in map(normalize_name, item_names) if key in self._index})
+        self.skipped_items += len(item_names) - len(ids)
+        if not ids:
+            return
+        cells = np.ix_(ids, ids)
+        block = self._counts[cells] + 1
+        self._counts[cells] = block
+        block = block.tolist()
+        for i, a in enumerate(ids):
+            self._support[a] = block[i][i]
+            self._promote(self._popular, self._popular_counts, a, block[i][i])
+            ranked, ranked_counts = self._ranked[a], self._ranked_counts[a]
+            for j, b in enumerate(ids):
+                if j != i:
+                    self._promote(ranked, ranked_counts, b, block[i][j])
+        self.orders += 1
+
+    def _promote(self, ranked: list, counts: list, b: int, c: int):
+        """
+        b's count just went up by one, to c: move it up `ranked` (best first, at most
+        rank_size long). Counts only ever grow by one, so an item outside the list can
+        never outrank its last entry without first tying it; checking the tail is enough.
+        """
+        try:
+            i = ranked.index(b)
+            counts[i] = c
+        except ValueError:
+            if len(ranked) < self.rank_size:
+                ranked.append(b)
+                counts.append(c)
+            elif c > counts[-1]:
+                ranked[-1], counts[-1] = b, c
+            else:
+                return
+            i = len(ranked) - 1
+        while i and counts[i - 1] < c:
+            ranked[i - 1], ranked[i] = ranked[i], ranked[i - 1]
+            counts[i - 1], counts[i] = counts[i], counts[i - 1]
+            i -= 1
+
+    # ==========================
+    # Suggestions
+    # ==========================
+    def recommend(self, cart=(), k: int = UPSELL_TOP_K) -> list:
+        """
+        Up to k add-ons for a cart of menu item names, best first:
+        [{item, price, category, score, reason}], reason being "together", "popular" or "default".
+        """
+        with self._lock:
+            self._sync()
+            in_cart = {self._index[key] for key in map(normalize_name, cart) if key in self._index}
+            picks = self._together(in_cart, k)
+            seen = in_cart | {b for b, _ in picks}
+            for a, count in zip(self._popular, self._popular_counts):
+                if len(picks) >= k or count < self.min_support:
+                    break
+                if a not in seen:
+                    picks.append((a, None))
+                    seen.add(a)
+            result = [self._describe(b, score, "together" if score is not None else "popular") for b, score in picks]
+
+        if len(result) < k:
+            cart_keys = {normalize_name(name) for name in cart}
+            taken = {normalize_name(r["item"]) for r in result}
+            for category in DEFAULT_CATEGORIES:
+                for item in sorted(self.menu.by_category(category), key=lambda i: i["price"]):
+                    key = normalize_name(item["name"])
+                    if len(result) < k and key not in cart_keys and key not in taken:
+                        result.append({"item": item["name"], "price": item["price"], "category": item["category"],
+                                       "score": None, "reason": "default"})
+                        taken.add(key)
+        return result
+
+    def _together(self, in_cart, k):
+        if len(in_cart) == 1:
+            # single item: its ranked list already is the answer
+            (a,) = in_cart
+            support = self._support[a]
+            picks = []
+            for b, count in zip(self._ranked[a], self._ranked_counts[a]):
+                if count < self.min_support or len(picks) == k:
+                    break
+                picks.append((b, round(count / support, 4)))
+            return picks
+
+        scores = {}
+        for a in in_cart:
+            support = self._support[a]
+            for b, count in zip(self._ranked[a], self._ranked_counts[a]):
+                if count < self.min_support:
+                    break
+                if b not in in_cart:
+                    scores[b] = scores.get(b, 0.0) + count / support
+        best = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+        return [(b, round(score, 4)) for b, score in best]
+
+    def _describe(self, b, score, reason):
+        item = self._items[b]
+        return {"item": item["name"], "price": item["price"], "category": item["category"],
+                "score": score, "reason": reason}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "orders": self.orders,
+                "replayed": self.replayed,
+                "skipped_items": self.skipped_items,
+                "matrix_bytes": int(self._counts.nbytes),
+                "rank_size": self.rank_size,
+                "min_support": self.min_support,
+                "history_loaded": self._loaded,
+            }
+
+
+# Shared instance used by UpsellTool and OrderTool
+upsell_recommender = UpsellRecommender(store=store)
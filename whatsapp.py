@@ -0,0 +1,202 @@
+# whatsapp.py
+"""
+Pooled async WhatsApp Cloud API sender.
+
+One long-lived httpx.AsyncClient (keep-alive connection pool) is shared by a
+small set of sender tasks that drain an outbound queue concurrently. Every
+send passes through a token bucket sized to the Graph API throughput limit,
+and 429/5xx/transport errors are retried with exponential backoff.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from log_utils import get_logger, log_event
+from metrics import LatencyRecorder, registry
+from rate_limit import TokenBucket
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = get_logger("whatsapp")
+
+SEND_SECONDS = registry.histogram("zk_whatsapp_send_seconds", "WhatsApp send time including retries, by result")
+SEND_ATTEMPTS = registry.counter("zk_whatsapp_send_attempts_total", "Graph API calls by HTTP status")
+
+
+class WhatsAppSender:
+    def __init__(
+        self,
+        token: str,
+        phone_id: str,
+        base_url: str = "https://graph.facebook.com",
+        api_version: str = "v18.0",
+        concurrency: int = 8,
+        max_queue: int = 1000,
+        rate: float = 80.0,
+        burst: float = None,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: float = 10.0,
+    ):
+        self.url = f"{base_url.rstrip('/')}/{api_version}/{phone_id}/messages"
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(1, max_queue)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+
+        self._client = None
+        self._queue = None
+        self._tasks = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+        self.latency = LatencyRecorder()
+
+    # ==========================
+    # Lifecycle
+    # ==========================
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._sender(), name=f"wa-sender-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self, timeout: float = 30.0):
+        """Flush queued replies (up to timeout), then close the connection pool."""
+        if self._client is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            log_event(logger, "whatsapp.drain_timeout", logging.WARNING, dropped=self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._client.aclose()
+        self._client = None
+
+    # ==========================
+    # Outbound queue
+    # ==========================
+    def enqueue(self, to: str, text: str) -> bool:
+        """Queue a reply for the sender tasks. Returns False if the queue is full."""
+        if self._queue is None:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((to, text))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log_event(logger, "whatsapp.queue_full", logging.WARNING, to=to)
+            return False
+
+    async def _sender(self):
+        while True:
+            to, text = await self._queue.get()
+            try:
+                await self.send(to, text)
+            except Exception as e:
+                # send() handles HTTP errors itself; anything else is a bug, and must not
+                # end this task and leave the queue to fill up with nobody sending
+                self.failed += 1
+                log_event(logger, "whatsapp.sender_error", logging.ERROR, to=to, error=repr(e))
+            finally:
+                self._queue.task_done()
+
+    # ==========================
+    # Single send with rate limit + retries
+    # ==========================
+    async def _acquire(self):
+        while not self.bucket.try_take():
+            await asyncio.sleep(self.bucket.wait_time())
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def send(self, to: str, text: str) -> bool:
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "text": {"body": text},
+        }
+        started = time.perf_counter()
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            retry_after = None
+            try:
+                r = await self._client.post(self.url, json=payload)
+                SEND_ATTEMPTS.inc(status=r.status_code)
+                if r.status_code < 400:
+                    elapsed = time.perf_counter() - started
+                    self.sent += 1
+                    self.latency.record(elapsed)
+                    SEND_SECONDS.observe(elapsed, result="sent")
+                    return True
+                if r.status_code not in RETRY_STATUSES:
+                    log_event(logger, "whatsapp.send_error", logging.WARNING,
+                              to=to, status=r.status_code, body=r.text[:200])
+                    break
+                retry_after = r.headers.get("Retry-After")
+                error = f"HTTP {r.status_code}"
+            except httpx.HTTPError as e:
+                SEND_ATTEMPTS.inc(status="transport_error")
+                error = repr(e)
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+            else:
+                log_event(logger, "whatsapp.send_gave_up", logging.WARNING,
+                          to=to, attempts=attempt + 1, error=error)
+
+        self.failed += 1
+        SEND_SECONDS.observe(time.perf_counter() - started, result="failed")
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "concurrency": self.concurrency,
+            "rate_limit_per_sec": self.bucket.rate,
+            "sends_per_sec": round(self.latency.rate(), 2),
+            "latency": self.latency.summary(),
+        }